@@ -3,6 +3,13 @@ from flask_wtf.csrf import CSRFProtect
 from .config import Config
 from flask_login import LoginManager
 from .utils.db_utils import init_db, load_user
+from .utils.notifications import SmsDispatcher, load_manager_numbers
+from .utils.pubsub import broker
+from .utils.write_behind import WriteBehindBuffer
+from .utils.spool import Spool, SpoolReplayer
+from .utils.db_utils import database_unavailable, validate_reading
+from .utils import metrics
+import atexit
 import logging
 
 app = Flask(__name__)
@@ -18,10 +25,58 @@ login_manager.user_loader(load_user)
 try:
     # Initialize services
     app.twilio_client = Config.init_twilio()
+    app.sms_dispatcher = SmsDispatcher(
+        app.twilio_client,
+        app.config['TWILIO_PHONE_NUMBER'],
+        load_manager_numbers,
+        workers=app.config['SMS_WORKERS'],
+        coalesce_window=app.config['SMS_COALESCE_WINDOW'],
+        rate_limit=app.config['SMS_RATE_LIMIT'],
+        max_retries=app.config['SMS_MAX_RETRIES'],
+        recipient_ttl=app.config['SMS_RECIPIENT_TTL']
+    )
+    atexit.register(app.sms_dispatcher.stop)
+    broker.max_queue = app.config['SSE_QUEUE_SIZE']
     init_db(app)
 except Exception as e:
     logging.error(f"Failed to initialize application: {str(e)}")
     raise
 
+if app.config['METRICS_ENABLED']:
+    # Before the routes' login check, so its redirects are timed as well
+    metrics.init_app(app)
+
 # Import routes after app is fully configured to avoid circular imports
-from . import routes
\ No newline at end of file
+from . import routes, commands
+
+app.ingest_buffer = WriteBehindBuffer(
+    routes.flush_ingest_buffer,
+    max_queue=app.config['INGEST_QUEUE_SIZE'],
+    batch_size=app.config['INGEST_FLUSH_SIZE'],
+    flush_interval=app.config['INGEST_FLUSH_INTERVAL']
+)
+app.spool = None
+app.spool_replayer = None
+if app.config['INGEST_SPOOL_DIR']:
+    app.spool = Spool(
+        app.config['INGEST_SPOOL_DIR'],
+        max_bytes=app.config['INGEST_SPOOL_MAX_BYTES'],
+        segment_bytes=app.config['INGEST_SPOOL_SEGMENT_BYTES']
+    )
+    app.spool_replayer = SpoolReplayer(
+        app.spool,
+        routes.commit_readings,
+        database_unavailable,
+        retry_interval=app.config['INGEST_SPOOL_RETRY_INTERVAL'],
+        batch_size=app.config['INGEST_FLUSH_SIZE'],
+        validate=validate_reading
+    )
+    atexit.register(app.spool.close)
+    atexit.register(app.spool_replayer.stop)
+    if app.spool.pending():
+        # Readings spooled before the last shutdown
+        app.spool_replayer.notify()
+
+# Registered after the SMS dispatcher and spool, so it runs first and a final flush can still
+# spool or send alerts
+atexit.register(app.ingest_buffer.stop)
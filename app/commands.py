@@ -0,0 +1,117 @@
+from datetime import datetime
+import click
+from app import app
+from app.utils.db_utils import db_connection, set_user_role
+from app.utils import migrations, partitions
+from app.utils.rollups import rebuild_rollups
+from app.utils.export import export_readings, FORMATS
+from app.routes import parse_history_bound
+
+
+def require_mysql():
+    if app.config['DB_BACKEND'] != 'mysql':
+        raise click.ClickException("Only available with DB_BACKEND=mysql; SQLite creates its schema on startup")
+
+
+@app.cli.command('rollup-rebuild')
+@click.option('--start', required=True, help='First day to rebuild (YYYY-MM-DD)')
+@click.option('--end', required=True, help='Last day to rebuild (YYYY-MM-DD)')
+def rollup_rebuild(start, end):
+    """Recompute minute/hour/day rollups from raw sensor_readings."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        rebuild_rollups(cursor, datetime.strptime(start, '%Y-%m-%d'), datetime.strptime(end, '%Y-%m-%d'))
+        conn.commit()
+    click.echo(f"Rebuilt rollups for {start} to {end}")
+
+
+@app.cli.command('export-readings')
+@click.option('--start', required=True, help='First day or ISO datetime to export')
+@click.option('--end', required=True, help='Last day to export (inclusive), or an exclusive ISO datetime')
+@click.option('--zone', 'zones', multiple=True, help='Only this greenhouse zone; repeat for several')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='csv', show_default=True)
+@click.option('--output', type=click.File('wb'), default='-', help='File to write; default stdout')
+def export_readings_command(start, end, zones, fmt, output):
+    """Stream raw sensor readings out in constant memory."""
+    try:
+        start, end = parse_history_bound(start, None), parse_history_bound(end, None, inclusive_day=True)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    written = 0
+    with db_connection() as conn:
+        for part in export_readings(conn, fmt, start, end, list(zones) or None, app.config['EXPORT_CHUNK_SIZE']):
+            output.write(part)
+            written += len(part)
+    click.echo(f"Exported {written} bytes", err=True)
+
+
+@app.cli.command('db-upgrade')
+@click.option('--to', 'target', type=int, help='Stop after this migration version')
+@click.option('--mark-applied', type=int, help='Record a version as applied without running it')
+def db_upgrade(target, mark_applied):
+    """Apply pending schema migrations from migrations/."""
+    require_mysql()
+    with db_connection() as conn:
+        if mark_applied is not None:
+            migrations.mark_applied(conn, mark_applied)
+            click.echo(f"Marked migration {mark_applied:03d} as applied")
+            return
+        applied = migrations.migrate(conn, target=target, log=click.echo)
+    if not applied:
+        click.echo("Schema is up to date")
+
+
+@app.cli.command('db-status')
+def db_status():
+    """List migrations and whether each has been applied."""
+    require_mysql()
+    with db_connection() as conn:
+        applied = migrations.applied_versions(conn.cursor())
+    for version, name, _ in migrations.discover():
+        click.echo(f"{'applied' if version in applied else 'pending':<8} {version:03d}_{name}")
+
+
+@app.cli.command('db-check-plans')
+def db_check_plans():
+    """EXPLAIN the hot queries and fail if any falls back to a full table scan."""
+    require_mysql()
+    with db_connection() as conn:
+        problems = migrations.check_query_plans(conn)
+    for name, issues in problems.items():
+        for issue in issues:
+            click.echo(f"{name}: {issue}", err=True)
+    if problems:
+        raise SystemExit(1)
+    click.echo("All hot queries use an index")
+
+
+@app.cli.command('partitions-maintain')
+@click.option('--dry-run', is_flag=True, help='Only report what would be created or dropped')
+def partitions_maintain(dry_run):
+    """Create upcoming monthly sensor_readings partitions and apply the retention policy."""
+    require_mysql()
+    now = datetime.now()
+    retention = app.config['READINGS_RETENTION_MONTHS']
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        if dry_run:
+            if retention:
+                for name, start, end in partitions.expired_partitions(cursor, now, retention):
+                    click.echo(f"Would archive and drop {name} ({start:%Y-%m-%d} to {end:%Y-%m-%d})")
+            return
+        created = partitions.ensure_partitions(cursor, now, app.config['PARTITION_MONTHS_AHEAD'])
+        if created:
+            click.echo(f"Created partitions {', '.join(created)}")
+        if retention:
+            partitions.apply_retention(conn, now, retention, app.config['READINGS_ARCHIVE_DIR'] or None,
+                                       log=click.echo)
+
+
+@app.cli.command('user-set-role')
+@click.argument('user_id', type=int)
+@click.argument('role', type=click.Choice(['Employee', 'Manager']))
+def user_set_role(user_id, role):
+    """Change a user's role. Running workers pick it up within USER_CACHE_TTL seconds."""
+    if not set_user_role(user_id, role):
+        raise click.ClickException(f"No user with id {user_id}")
+    click.echo(f"User {user_id} is now {role}")
@@ -11,18 +11,100 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
 
     # Database Configuration
+    DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql')  # 'mysql' or 'sqlite' (embedded, single box)
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', 'greenhouse.db')  # ':memory:' for a throwaway database (a temp file)
+    SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 8))
     MYSQL_HOST = os.environ.get('MYSQL_HOST', 'localhost')
     MYSQL_USER = os.environ.get('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', '')
     MYSQL_DB = os.environ.get('MYSQL_DB', 'greenhouse_db')
     MYSQL_PORT = int(os.environ.get('MYSQL_PORT', 3306))
     MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 5))
+    MYSQL_POOL_TIMEOUT = float(os.environ.get('MYSQL_POOL_TIMEOUT', 5))  # seconds to wait for a free connection
+    MYSQL_POOL_PING = os.environ.get('MYSQL_POOL_PING', 'true').lower() == 'true'  # health-check on borrow
+    # Apply pending migrations/*.sql at startup; otherwise run `flask db-upgrade`
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', 'false').lower() == 'true'
+    # Refuse to start when the database lacks tables or columns the code needs
+    SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK', 'true').lower() == 'true'
+
+    # Ingest Configuration
+    INGEST_MAX_BATCH = int(os.environ.get('INGEST_MAX_BATCH', 5000))
+    THRESHOLD_CACHE_TTL = int(os.environ.get('THRESHOLD_CACHE_TTL', 30))
+    ROLLUP_AT_INGEST = os.environ.get('ROLLUP_AT_INGEST', 'true').lower() == 'true'
+    # Seconds before cached latest readings are re-read from MySQL, so a worker shows readings another worker
+    # took; 0 never re-reads, which is only right when one process does all the ingest
+    LATEST_CACHE_REFRESH = int(os.environ.get('LATEST_CACHE_REFRESH', 0))
+    # Write-behind ingest: answer 202 and group-commit from a background thread (readings in the
+    # queue are lost if the process dies before they are flushed)
+    INGEST_WRITE_BEHIND = os.environ.get('INGEST_WRITE_BEHIND', 'false').lower() == 'true'
+    INGEST_QUEUE_SIZE = int(os.environ.get('INGEST_QUEUE_SIZE', 10000))  # readings; beyond this ingest answers 429
+    INGEST_FLUSH_SIZE = int(os.environ.get('INGEST_FLUSH_SIZE', 500))  # readings per group commit
+    INGEST_FLUSH_INTERVAL = float(os.environ.get('INGEST_FLUSH_INTERVAL', 0.05))  # seconds a batch may wait to fill
+    # Readings the database cannot take are spooled here and replayed in order once it is back; empty disables
+    INGEST_SPOOL_DIR = os.environ.get('INGEST_SPOOL_DIR', 'spool')
+    INGEST_SPOOL_MAX_BYTES = int(os.environ.get('INGEST_SPOOL_MAX_BYTES', 256 * 1024 * 1024))  # disk quota, dead letters included
+    INGEST_SPOOL_SEGMENT_BYTES = int(os.environ.get('INGEST_SPOOL_SEGMENT_BYTES', 8 * 1024 * 1024))
+    INGEST_SPOOL_RETRY_INTERVAL = float(os.environ.get('INGEST_SPOOL_RETRY_INTERVAL', 5))  # seconds between replay attempts
+
+    # Raw Reading Retention (see `flask partitions-maintain`)
+    PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+    READINGS_RETENTION_MONTHS = int(os.environ.get('READINGS_RETENTION_MONTHS', 0))  # 0 keeps raw readings forever
+    READINGS_ARCHIVE_DIR = os.environ.get('READINGS_ARCHIVE_DIR', 'archive')  # empty drops without archiving
+
+    # Live Dashboard Stream Configuration
+    SSE_HEARTBEAT = int(os.environ.get('SSE_HEARTBEAT', 15))  # seconds between keep-alive comments
+    SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', 100))  # buffered events per subscriber
+
+    # History API Configuration
+    HISTORY_DEFAULT_POINTS = int(os.environ.get('HISTORY_DEFAULT_POINTS', 500))
+    HISTORY_MAX_POINTS = int(os.environ.get('HISTORY_MAX_POINTS', 5000))
+    HISTORY_MAX_SOURCE_BUCKETS = int(os.environ.get('HISTORY_MAX_SOURCE_BUCKETS', 20000))
+
+    # Raw Reading Export Configuration
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 5000))  # rows fetched and encoded at a time
+
+    # Alert Lifecycle Configuration
+    ALERT_HYSTERESIS = float(os.environ.get('ALERT_HYSTERESIS', 0.02))  # fraction of the optimal range
+    ALERT_MIN_DWELL = int(os.environ.get('ALERT_MIN_DWELL', 300))  # seconds back in range before resolving
+
+    # Anomaly Detection Configuration (drift and spike alerts from per zone/parameter running statistics)
+    ANOMALY_DETECTION = os.environ.get('ANOMALY_DETECTION', 'true').lower() == 'true'
+    ANOMALY_WINDOW = int(os.environ.get('ANOMALY_WINDOW', 500))  # readings the baseline mean/variance remembers
+    ANOMALY_EWMA_ALPHA = float(os.environ.get('ANOMALY_EWMA_ALPHA', 0.1))
+    ANOMALY_DRIFT_LIMIT = float(os.environ.get('ANOMALY_DRIFT_LIMIT', 4.0))  # EWMA control limit, in sigmas
+    ANOMALY_SPIKE_LIMIT = float(os.environ.get('ANOMALY_SPIKE_LIMIT', 6.0))  # single-reading limit, in sigmas
+    ANOMALY_MIN_SAMPLES = int(os.environ.get('ANOMALY_MIN_SAMPLES', 50))  # readings before a series can alert
+
+    # Forecast API Configuration
+    FORECAST_HALF_LIFE = float(os.environ.get('FORECAST_HALF_LIFE', 6))  # hours until a reading's weight halves
+    FORECAST_HORIZON = int(os.environ.get('FORECAST_HORIZON', 24))  # default hours ahead
+    FORECAST_MAX_HORIZON = int(os.environ.get('FORECAST_MAX_HORIZON', 168))
+    FORECAST_HISTORY_HOURS = int(os.environ.get('FORECAST_HISTORY_HOURS', 72))  # hourly rollups read to prime the trends
+    # Seconds before trends are rebuilt from the hourly rollups; with several workers each only folds in its
+    # own readings between rebuilds. 0 primes once at first use
+    FORECAST_REFRESH = int(os.environ.get('FORECAST_REFRESH', 0))
+
+    # Metrics Configuration (/metrics in the Prometheus text format)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'  # request and query timing
+    # Bearer token a scraper presents; without one, /metrics is only served to logged-in managers
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Logged-in User Cache Configuration
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))  # seconds another worker may serve a stale role
 
     # Twilio Configuration
     TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER')
 
+    # Alert SMS Dispatch Configuration
+    SMS_WORKERS = int(os.environ.get('SMS_WORKERS', 2))
+    SMS_COALESCE_WINDOW = float(os.environ.get('SMS_COALESCE_WINDOW', 30))  # seconds
+    SMS_RATE_LIMIT = float(os.environ.get('SMS_RATE_LIMIT', 1))  # messages per second
+    SMS_MAX_RETRIES = int(os.environ.get('SMS_MAX_RETRIES', 3))
+    SMS_RECIPIENT_TTL = int(os.environ.get('SMS_RECIPIENT_TTL', 300))  # seconds
+
     @classmethod
     def validate(cls):
         """Check critical config before app starts"""
@@ -22,4 +22,7 @@ class AddGreenhouseForm(FlaskForm):
     submit = SubmitField('Add Greenhouse')
 
 class AlertSettingsForm(FlaskForm):
-    submit = SubmitField('Save Changes')
\ No newline at end of file
+    submit = SubmitField('Save Changes')
+
+class AssignmentsForm(FlaskForm):
+    submit = SubmitField('Update Assignments')
\ No newline at end of file
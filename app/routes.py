@@ -1,17 +1,35 @@
 from random import randint
 from datetime import datetime, timedelta
+from collections import Counter
 from functools import wraps
+import hmac
 import re
-from flask import render_template, request, redirect, url_for, flash, session, current_app, jsonify
+from flask import render_template, request, redirect, url_for, flash, session, current_app, jsonify, \
+    Response, stream_with_context
 import mysql.connector
 from werkzeug.security import generate_password_hash, check_password_hash
 import sys
 from itsdangerous import URLSafeTimedSerializer
 from twilio.base.exceptions import TwilioRestException
-from flask_login import current_user, login_required
+from flask_login import current_user, login_required, login_user, logout_user
 from app import app
-from app.utils.db_utils import get_db_connection, insert_sensor_data, simulate_sensor_data
-from app.forms import LoginForm, RegistrationForm, AddGreenhouseForm, AlertSettingsForm
+from app.utils.db_utils import request_connection, release_request_connection, get_db_connection, pool_stats, database_unavailable, AnonymousUser, load_access, set_assignments, insert_sensor_data, simulate_sensor_data, validate_reading, insert_sensor_batch, \
+    write_readings, get_historical_data, get_latest_readings, get_forecast_history, SENSOR_PARAMETERS
+from app.utils.threshold_cache import threshold_cache, bump_version, assign_zone, save_range, delete_range
+from app.utils.alert_lifecycle import alert_tracker
+from app.utils.rollups import choose_granularity, get_series
+from app.utils.downsample import downsample, METHODS as DOWNSAMPLE_METHODS
+from app.utils.latest_cache import latest_cache
+from app.utils.forecast import forecaster
+from app.utils.metrics import registry, readings_ingested, alert_transitions, MIMETYPE as METRICS_MIMETYPE
+from app.utils.pubsub import broker, encode
+from app.utils.alerts_utils import list_alerts, count_alerts, decode_cursor
+from app.utils.export import export_readings, FORMATS as EXPORT_FORMATS
+from app.utils.packed import decode_packed, MIMETYPE as PACKED_MIMETYPE
+from app.utils.user_cache import user_cache
+from app.utils.storage import DatabaseError
+from app.utils.write_behind import FlushRefused
+from app.forms import LoginForm, RegistrationForm, AddGreenhouseForm, AlertSettingsForm, AssignmentsForm
 from twilio.rest import Client
 import json
 import requests
@@ -24,10 +42,9 @@ def require_role(roles):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if not is_logged_in():  # Fixed function name
+            if not is_logged_in():
                 return redirect(url_for('login'))
-            current_user_role = session.get('role')
-            if current_user_role in roles:
+            if current_user.role in roles:
                 return f(*args, **kwargs)
             return "Unauthorized Access", 403
         return decorated_function
@@ -35,22 +52,42 @@ def require_role(roles):
 
 def is_admin():
     """Check if current user is admin"""
-    return session.get('role') == 'Manager'
+    return is_logged_in() and current_user.role == 'Manager'
 
 def is_logged_in():
-    """Check if user is logged in"""
-    return 'user_id' in session
+    """Check if user is logged in; the user comes from the user cache, not the database"""
+    return current_user.is_authenticated
 
 def validate_phone(phone_number):
     """Validate phone number format"""
     return re.match(r'^\+?[0-9]{10,15}$', phone_number)
 
+def zone_scope(zones=None):
+    """Zones a read is limited to, or None for every zone.
+
+    An employee only sees the zones of their assigned greenhouses, from the
+    access set cached with the user. ?greenhouse=<id> limits it to that
+    greenhouse's zones; zones (e.g. from ?zone=) narrows it further. Zones are
+    looked up in the threshold cache's in-memory index.
+    """
+    greenhouse_id = request.args.get('greenhouse', type=int)
+    if current_user.sees_all_greenhouses:
+        if greenhouse_id is None:
+            return zones or None
+        greenhouse_ids = [greenhouse_id]
+    else:
+        allowed = current_user.greenhouse_ids or frozenset()
+        greenhouse_ids = sorted(allowed) if greenhouse_id is None else [greenhouse_id] if greenhouse_id in allowed else []
+    owned = threshold_cache.zones(lambda: request_connection().cursor(dictionary=True), greenhouse_ids)
+    return [zone for zone in zones if zone in owned] if zones else owned
+
 
 # MIDDLEWARE
 @app.before_request
 def require_login():
     """Ensure user is logged in for protected routes"""
-    if request.endpoint in ['login', 'register', 'static', 'reset_password_request', 'verify_otp', 'reset_password']:
+    if request.endpoint in ['login', 'register', 'static', 'reset_password_request', 'verify_otp', 'reset_password',
+                            'metrics']:
         return None
     if not is_logged_in():
         return redirect(url_for('login'))
@@ -60,7 +97,6 @@ def require_login():
 # AUTHENTICATION ROUTES
 @app.route('/register', methods=['GET', 'POST'])
 def register():
-    global cursor
     form = RegistrationForm()
     if form.validate_on_submit():
 
@@ -69,9 +105,8 @@ def register():
         phone_number = form.phone_number.data
         password = form.password.data
 
-        conn = None
         try:
-            conn = get_db_connection()
+            conn = request_connection()
             cursor = conn.cursor(dictionary=True)
 
             # Check if user already exists
@@ -95,18 +130,9 @@ def register():
             return redirect(url_for('login'))
 
         except Exception as e:
-            conn.rollback()
             app.logger.error(f"Registration error: {e}")
             flash('Registration failed. Please try again.', 'error')
             return render_template('register.html', form=form)
-
-        finally:
-            if conn and conn.is_connected():
-                cursor.close()
-                conn.close()
-
-            print(sys.path)
-            return None
     return render_template('register.html', form=form)
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -117,10 +143,8 @@ def login():
         identifier = form.identifier.data
         password = form.password.data
 
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            cursor = request_connection().cursor(dictionary=True)
             cursor.execute("""
                         SELECT id, username, password_hash, role
                         FROM users
@@ -129,9 +153,11 @@ def login():
             user = cursor.fetchone()
 
             if user and check_password_hash(user['password_hash'], password):
-                session['user_id'] = user['id']
-                session['username'] = user['username']
-                session['role'] = user['role']
+                logged_in = AnonymousUser(user['id'], user['username'], user['role'],
+                                          load_access(cursor, user['id'], user['role']))
+                # Prime the cache so the requests that follow never query users or assignments
+                user_cache.put(logged_in)
+                login_user(logged_in)
                 flash('Login successful!', 'success')
                 return redirect(url_for('dashboard'))
 
@@ -139,14 +165,11 @@ def login():
         except Exception as e:
             app.logger.error(f"Login error: {e}")
             flash('Login failed. Please try again.', 'error')
-        finally:
-            if conn and conn.is_connected():
-                cursor.close()
-                conn.close()
     return render_template('login.html', form=form)
 
 @app.route('/logout')
 def logout():
+    logout_user()
     session.clear()
     flash('Logged out successfully.', 'info')
     return redirect(url_for('login'))
@@ -162,16 +185,15 @@ def reset_password_request():
             flash('Invalid phone number format', 'error')
             return redirect(url_for('reset_password_request'))
 
-        conn = None
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
+            cursor = request_connection().cursor(dictionary=True)
             cursor.execute("SELECT id FROM users WHERE phone_number = %s", (phone_number,))
             user = cursor.fetchone()
             if user:
                 otp = randint(100000, 999999)
                 session['reset_otp'] = str(otp)
                 session['reset_phone'] = phone_number
+                session['reset_user_id'] = user['id']
                 session['otp_expiry'] = datetime.now() + timedelta(minutes=10)
                 try:
                     message = current_app.twilio_client.messages.create(
@@ -189,10 +211,6 @@ def reset_password_request():
         except Exception as e:
             app.logger.error(f"Reset request error: {e}")
             flash('An error occurred. Please try again.', 'error')
-        finally:
-            if conn and conn.is_connected():
-                cursor.close()
-                conn.close()
     return render_template('reset_password_request.html')
 
 @app.route('/verify_otp', methods=['GET', 'POST'])
@@ -229,28 +247,22 @@ def reset_password():
             flash('Password must be at least 8 characters', 'error')
             return redirect(url_for('reset_password'))
 
-        conn = None
         try:
-            conn = get_db_connection()
+            conn = request_connection()
             cursor = conn.cursor()
             cursor.execute(
                 "UPDATE users SET password_hash = %s WHERE phone_number = %s",
                 (generate_password_hash(password), session['reset_phone'])
             )
             conn.commit()
-            for key in ['reset_otp', 'otp_verified', 'reset_phone', 'otp_expiry']:
+            user_cache.invalidate(session.get('reset_user_id'))
+            for key in ['reset_otp', 'otp_verified', 'reset_phone', 'otp_expiry', 'reset_user_id']:
                 session.pop(key, None)
             flash('Password updated successfully!', 'success')
             return redirect(url_for('login'))
         except Exception as e:
-            if conn:
-                conn.rollback()
             app.logger.error(f"Password reset error: {e}")
             flash('An error occurred. Please try again.', 'error')
-        finally:
-            if conn and conn.is_connected():
-                cursor.close()
-                conn.close()
     return render_template('reset_password.html')
 
 
@@ -260,35 +272,19 @@ def dashboard():
     if not is_logged_in():
         return redirect(url_for('login'))
 
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        zones = zone_scope()
+        latest_data, _ = latest_cache.get(get_latest_readings, zones=zones)
 
-        # Get latest sensor data
-        cursor.execute("SELECT * FROM sensor_readings ORDER BY timestamp DESC LIMIT 1")
-        latest_data = cursor.fetchone() or {}
+        cursor = request_connection().cursor(dictionary=True)
 
         # Get active alerts (only non-resolved)
-        cursor.execute("""
-            SELECT 
-                sensor_type, reading_value,
-                threshold_type, threshold_value,
-                timestamp, status
-            FROM alerts
-            WHERE status != 'Resolved'
-            ORDER BY timestamp DESC
-            LIMIT 10
-        """)
-        alerts = cursor.fetchall()
+        alerts, _ = list_alerts(cursor, limit=10, zones=zones)
         return render_template('dashboard.html', data=latest_data, alerts=alerts)
 
     except Exception as e:
         current_app.logger.error(f"Dashboard error: {e}")
         return render_template('error.html')
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
 
 @app.route('/history')
 def history():
@@ -296,36 +292,14 @@ def history():
     if not is_logged_in():
         return redirect(url_for('login'))
 
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
         start_date = request.args.get('start', (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d'))
         end_date = request.args.get('end', datetime.now().strftime('%Y-%m-%d'))
-        cursor.execute("""
-            SELECT
-                DATE(timestamp) as date,
-                AVG(temperature) as avg_temp,
-                AVG(pressure) as avg_pressure,
-                AVG(light_intensity) as avg_light,
-                AVG(humidity) as avg_humidity,
-                AVG(air_quality) as avg_air_quality,
-                AVG(pH) as avg_ph,
-                AVG(moisture) as avg_moisture
-            FROM sensor_readings
-            WHERE timestamp BETWEEN %s AND %s
-            GROUP BY DATE(timestamp)
-            ORDER BY date DESC
-        """, (start_date, end_date))
-        history_data = cursor.fetchall()
+        history_data = get_historical_data(start_date, end_date, zone_scope())
         return render_template('history.html', data=history_data, start_date=start_date, end_date=end_date, now=datetime.now)
     except Exception as e:
         app.logger.error(f"History error: {e}")
         return render_template('error.html')
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
 
 
 # MANAGEMENT ROUTES
@@ -333,10 +307,8 @@ def history():
 @require_role(['Manager'])
 def greenhouses():
     """Greenhouse management - display list"""
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        cursor = request_connection().cursor(dictionary=True)
         cursor.execute("SELECT id, name, location, description FROM greenhouses ORDER BY name")
         greenhouses = cursor.fetchall()
         return render_template('greenhouses.html', greenhouses=greenhouses)
@@ -344,19 +316,14 @@ def greenhouses():
         app.logger.error(f"Greenhouse error: {e}")
         flash('Error retrieving greenhouse data.', 'error')
         return render_template('error.html')
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
 
 @app.route('/settings', methods=['GET', 'POST'])
 @require_role(['Manager'])
 def settings():
     """System settings management"""
     form = AlertSettingsForm()
-    conn = None
     try:
-        conn = get_db_connection()
+        conn = request_connection()
         cursor = conn.cursor(dictionary=True)
         if request.method == 'POST' and form.validate_on_submit(): # Check if form is submitted and valid
             for param, value in request.form.items():
@@ -370,7 +337,9 @@ def settings():
                         "UPDATE optimal_ranges SET max_value = %s WHERE parameter = %s",
                         (value, param[:-4])
                     )
+            bump_version(cursor)
             conn.commit()
+            threshold_cache.invalidate()
             flash('Settings updated successfully', 'success')
             return redirect(url_for('settings'))
         cursor.execute("SELECT * FROM optimal_ranges")
@@ -380,10 +349,6 @@ def settings():
         app.logger.error(f"Settings error: {e}")
         flash('Failed to update settings', 'error')
         return render_template('error.html')
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
 
 @app.route('/greenhouses/add', methods=['GET', 'POST'])
 @require_role(['Manager'])
@@ -397,9 +362,8 @@ def add_greenhouse():
         if not name:
             flash('Name is required to add a greenhouse.', 'error')
             return render_template('add_greenhouse.html', form=form)
-        conn = None
         try:
-            conn = get_db_connection()
+            conn = request_connection()
             cursor = conn.cursor()
             cursor.execute(
                 "INSERT INTO greenhouses (name, location, description) VALUES (%s, %s, %s)",
@@ -412,21 +376,22 @@ def add_greenhouse():
             app.logger.error(f"Error adding greenhouse: {e}")
             flash('Error adding the greenhouse. Please try again.', 'error')
             return render_template('add_greenhouse.html', form=form)
-        finally:
-            if conn and conn.is_connected():
-                cursor.close()
-                conn.close()
     return render_template('add_greenhouse.html', form=form)
 
 
 @app.route('/assignments', methods=['GET', 'POST'])
 @require_role(['Manager'])
-def manage_assignments(greenhouse_id=None):
+def manage_assignments():
     """Manage employee assignments to greenhouses."""
-    conn = None
+    greenhouse_id = request.args.get('greenhouse_id', type=int)
+    form = AssignmentsForm()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        if greenhouse_id and form.validate_on_submit():
+            set_assignments(greenhouse_id, [int(employee_id) for employee_id in request.form.getlist('employees')])
+            flash('Assignments updated successfully', 'success')
+            return redirect(url_for('manage_assignments', greenhouse_id=greenhouse_id))
+
+        cursor = request_connection().cursor(dictionary=True)
 
         cursor.execute("SELECT id, username FROM users WHERE role = 'Employee'")
         employees = cursor.fetchall()
@@ -443,16 +408,90 @@ def manage_assignments(greenhouse_id=None):
             employees=employees,
             greenhouses=greenhouses,
             assigned_employees=assigned_employees,
-            current_greenhouse_id=greenhouse_id
+            current_greenhouse_id=greenhouse_id,
+            form=form
         )
     except Exception as e:
         app.logger.error(f"Manage assignments error: {e}")
         flash('Error managing assignments. Please try again.', 'error')
         return render_template('error.html')
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+
+
+@app.route('/api/greenhouses/<int:greenhouse_id>/zones', methods=['POST'])
+@require_role(['Manager'])
+def add_greenhouse_zone(greenhouse_id):
+    """Assign a reading zone to a greenhouse, moving it from any other; body {"zone": name}."""
+    zone = (request.get_json(silent=True) or {}).get('zone')
+    if not isinstance(zone, str) or not zone:
+        return jsonify({'error': 'zone must be a non-empty string'}), 400
+    try:
+        conn = request_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT id FROM greenhouses WHERE id = %s", (greenhouse_id,))
+        if not cursor.fetchone():
+            return jsonify({'error': 'Unknown greenhouse'}), 404
+        assign_zone(cursor, zone, greenhouse_id)
+        bump_version(cursor)
+        conn.commit()
+        threshold_cache.invalidate()
+    except Exception as e:
+        app.logger.error(f"Zone assignment error: {e}")
+        return jsonify({'error': 'Failed to assign zone'}), 500
+    return jsonify({'greenhouse_id': greenhouse_id, 'zone': zone}), 201
+
+
+@app.route('/api/thresholds', methods=['GET', 'PUT', 'DELETE'])
+@require_role(['Manager'])
+def threshold_profiles():
+    """Per-greenhouse and per-zone threshold overrides.
+
+    GET ?zone=<name> or ?greenhouse=<id> returns the ranges each zone resolves
+    to. PUT {greenhouse_id or zone, parameter, min_value, max_value} sets an
+    override; DELETE {greenhouse_id or zone, parameter} removes it.
+    """
+    if request.method == 'GET':
+        zone = request.args.get('zone')
+        try:
+            zones = zone_scope([zone] if zone else None)
+            if zones is None:
+                return jsonify({'error': 'zone or greenhouse is required'}), 400
+            index = threshold_cache.get_compiled(request_connection().cursor(dictionary=True))
+        except Exception as e:
+            app.logger.error(f"Threshold profile error: {e}")
+            return jsonify({'error': 'Failed to fetch thresholds'}), 500
+        return jsonify({zone: index.for_zone(zone).ranges() for zone in zones})
+
+    data = request.get_json(silent=True) or {}
+    parameter, greenhouse_id, zone = data.get('parameter'), data.get('greenhouse_id'), data.get('zone')
+    if parameter not in SENSOR_PARAMETERS:
+        return jsonify({'error': f"parameter must be one of: {', '.join(SENSOR_PARAMETERS)}"}), 400
+    if (greenhouse_id is None) == (zone is None):
+        return jsonify({'error': 'Give exactly one of greenhouse_id or zone'}), 400
+    bounds = [data.get('min_value'), data.get('max_value')]
+    if request.method == 'PUT':
+        if any(b is not None and (isinstance(b, bool) or not isinstance(b, (int, float))) for b in bounds):
+            return jsonify({'error': 'min_value and max_value must be numbers or null'}), 400
+        if None not in bounds and bounds[0] > bounds[1]:
+            return jsonify({'error': 'min_value must not exceed max_value'}), 400
+
+    try:
+        conn = request_connection()
+        cursor = conn.cursor(dictionary=True)
+        if greenhouse_id is not None:
+            cursor.execute("SELECT id FROM greenhouses WHERE id = %s", (greenhouse_id,))
+            if not cursor.fetchone():
+                return jsonify({'error': 'Unknown greenhouse'}), 404
+        if request.method == 'PUT':
+            save_range(cursor, parameter, *bounds, greenhouse_id=greenhouse_id, zone=zone)
+        else:
+            delete_range(cursor, parameter, greenhouse_id=greenhouse_id, zone=zone)
+        bump_version(cursor)
+        conn.commit()
+        threshold_cache.invalidate()
+    except Exception as e:
+        app.logger.error(f"Threshold profile update error: {e}")
+        return jsonify({'error': 'Failed to update thresholds'}), 500
+    return jsonify({'success': True})
 
 
 # API ROUTES
@@ -469,11 +508,11 @@ def submit_feedback():
         if not feedback_text:
             return jsonify({'success': False, 'error': 'Feedback text required'}), 400
 
-        conn = get_db_connection()
+        conn = request_connection()
         cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO feedback (user_id, feedback_text, related_table, related_id) VALUES (%s, %s, %s, %s)",
-            (session['user_id'], feedback_text, related_table, related_id)
+            (current_user.id, feedback_text, related_table, related_id)
         )
         conn.commit()
         return jsonify({'success': True})
@@ -481,44 +520,224 @@ def submit_feedback():
     except Exception as e:
         app.logger.error(f"Feedback error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
+
+
+def parse_history_bound(value, default, inclusive_day=False):
+    """Parse an ISO date or datetime query argument; a bare end date covers that whole day."""
+    if not value:
+        return default
+    parsed = datetime.fromisoformat(value).replace(tzinfo=None)
+    if inclusive_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+@app.route('/api/history')
+def history_series():
+    """Downsampled, columnar sensor series for the history charts."""
+    try:
+        end = parse_history_bound(request.args.get('end'), datetime.now(), inclusive_day=True)
+        start = parse_history_bound(request.args.get('start'), end - timedelta(days=7))
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO dates or datetimes'}), 400
+    if start >= end:
+        return jsonify({'error': 'start must be before end'}), 400
+
+    parameters = request.args.get('parameters')
+    parameters = parameters.split(',') if parameters else SENSOR_PARAMETERS
+    unknown = [p for p in parameters if p not in SENSOR_PARAMETERS]
+    if unknown:
+        return jsonify({'error': f"Unknown parameters: {', '.join(unknown)}"}), 400
+
+    method = request.args.get('method', 'lttb')
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({'error': f"method must be one of: {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+    points = min(request.args.get('points', app.config['HISTORY_DEFAULT_POINTS'], type=int),
+                 app.config['HISTORY_MAX_POINTS'])
+    if points < 3:
+        # Below its two end points plus one bucket LTTB gives up and returns every source row
+        return jsonify({'error': 'points must be at least 3'}), 400
+    zone = request.args.get('zone')
+    granularity = choose_granularity(start, end, app.config['HISTORY_MAX_SOURCE_BUCKETS'])
+
+    try:
+        zones = zone_scope([zone] if zone else None)
+        cursor = request_connection().cursor(dictionary=True)
+        rows = get_series(cursor, granularity, start, end, parameters, zones=zones)
+    except Exception as e:
+        app.logger.error(f"History series error: {e}")
+        return jsonify({'error': 'Failed to fetch history'}), 500
+
+    times = [int(row['bucket_start'].timestamp() * 1000) for row in rows]
+    series = {}
+    for param in parameters:
+        values = [float(row[param]) if row[param] is not None else None for row in rows]
+        t, v = downsample(times, values, points, method)
+        series[param] = {'t': t, 'v': v}
+
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'zone': zone,
+        'greenhouse': request.args.get('greenhouse', type=int),
+        'resolution': granularity,
+        'method': method,
+        'source_points': len(rows),
+        'series': series
+    })
+
+
+@app.route('/api/forecast')
+def forecast_series():
+    """Short-horizon forecasts per zone and parameter, from in-memory trend state.
+
+    Arguments: zone or greenhouse (default every zone the user can see),
+    parameters (comma-separated, default all), horizon (hours). Each
+    parameter reports its fitted value and trend per hour, hourly forecast
+    points, and the hours until it reaches its min or max (null when that
+    is not within the horizon). Forecasts are cached until the zone's next
+    reading.
+    """
+    parameters = request.args.get('parameters')
+    parameters = parameters.split(',') if parameters else SENSOR_PARAMETERS
+    unknown = [p for p in parameters if p not in SENSOR_PARAMETERS]
+    if unknown:
+        return jsonify({'error': f"Unknown parameters: {', '.join(unknown)}"}), 400
+    horizon = request.args.get('horizon', app.config['FORECAST_HORIZON'], type=int)
+    if not 1 <= horizon <= app.config['FORECAST_MAX_HORIZON']:
+        return jsonify({'error': f"horizon must be between 1 and {app.config['FORECAST_MAX_HORIZON']} hours"}), 400
+    zone = request.args.get('zone')
+
+    try:
+        zones = zone_scope([zone] if zone else None)
+        thresholds = threshold_cache.get_compiled(request_connection().cursor(dictionary=True))
+        forecasts = {}
+        for name in (forecaster.zones(get_forecast_history) if zones is None else zones):
+            forecasts[name] = forecaster.forecast(get_forecast_history, name, thresholds.for_zone(name),
+                                                  parameters, horizon)
+    except Exception as e:
+        app.logger.error(f"Forecast error: {e}")
+        return jsonify({'error': 'Failed to compute forecasts'}), 500
+
+    return jsonify({'horizon': horizon, 'zones': forecasts})
+
+
+@app.route('/api/export')
+def export_sensor_readings():
+    """Stream raw readings as a download: CSV, NDJSON or columnar binary.
+
+    Arguments: start/end (ISO dates or datetimes, default the last 7 days; a
+    bare end date includes that day), greenhouse, zone (repeatable), format.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        end = parse_history_bound(request.args.get('end'), datetime.now(), inclusive_day=True)
+        start = parse_history_bound(request.args.get('start'), end - timedelta(days=7))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start >= end:
+        return jsonify({'error': 'start must be before end'}), 400
+    try:
+        zones = zone_scope(request.args.getlist('zone'))
+    except Exception as e:
+        app.logger.error(f"Export error: {e}")
+        return jsonify({'error': 'Failed to start export'}), 500
+    _, mimetype, extension = EXPORT_FORMATS[fmt]
+
+    def generate():
+        # Its own connection: the stream outlives the request, and a long export should not pin g.db_conn
+        conn = get_db_connection()
+        try:
+            yield from export_readings(conn, fmt, start, end, zones, app.config['EXPORT_CHUNK_SIZE'])
+        finally:
             conn.close()
 
+    release_request_connection()
+    response = Response(generate(), mimetype=mimetype)
+    response.headers['Content-Disposition'] = \
+        f'attachment; filename="readings_{start:%Y%m%d}_{end:%Y%m%d}.{extension}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 
 @app.route('/latest_sensor_data')
 def latest_sensor_data():
-    """Returns the latest sensor data as JSON."""
-    conn = None
+    """Returns the latest sensor data as JSON, served from the in-memory cache.
+
+    ?zone=<name> returns that zone's reading, ?zone=all every zone's;
+    ?greenhouse=<id> limits either to that greenhouse's zones. Responses
+    carry an ETag so unchanged polls are answered with 304.
+    """
+    zone = request.args.get('zone')
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM sensor_readings ORDER BY timestamp DESC LIMIT 1")
-        latest_data = cursor.fetchone()
-        return jsonify(latest_data or {})
+        zones = zone_scope()
+        if zone == 'all':
+            latest_data, etag = latest_cache.get_all(get_latest_readings, zones)
+        else:
+            latest_data, etag = latest_cache.get(get_latest_readings, zone, zones)
     except Exception as e:
         app.logger.error(f"Error fetching latest sensor data: {e}")
         return jsonify({}), 500
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+
+    response = jsonify(latest_data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/stream')
+def stream():
+    """Server-Sent Events feed of new readings and alert transitions.
+
+    ?zone=<name> (repeatable) and ?greenhouse=<id> limit the feed to those
+    zones, within the user's assigned greenhouses. Each connection starts
+    with the current reading of every subscribed zone.
+    """
+    zones = zone_scope([zone for value in request.args.getlist('zone') for zone in value.split(',') if zone])
+    heartbeat = app.config['SSE_HEARTBEAT']
+    try:
+        snapshot, _ = latest_cache.get_all(get_latest_readings, zones)
+    except Exception as e:
+        app.logger.error(f"Stream snapshot error: {e}")
+        snapshot = {}
+    subscription = broker.subscribe(zones)
+
+    def events():
+        try:
+            yield "retry: 5000\n\n"
+            for zone, entry in snapshot.items():
+                if subscription.wants(zone):
+                    yield f"event: reading\ndata: {encode(entry)}\n\n"
+            while True:
+                item = subscription.get(timeout=heartbeat)
+                if item is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event, data = item
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    # stream_with_context keeps the app context, and its teardown, alive until the client leaves;
+    # hand back the connection the snapshot or user lookup borrowed now
+    release_request_connection()
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 # Add this decorator above your API route
 @app.route('/receive_sensor_data', methods=['POST'])
 def receive_sensor_data():
-    print("ENTERING /receive_sensor_data FUNCTION")
-    print(f"Request content type: {request.content_type}")
-    print(f"Request data (raw): {request.data}")
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 400
 
-    conn = None
+    checkpoint = None
     try:
         data = request.get_json()
-        print(f"Parsed JSON data: {data}")
 
         # Required fields
         required_fields = ['temperature', 'pressure', 'light_intensity', 'humidity', 'air_quality', 'pH', 'moisture', 'greenhouse_zone', 'timestamp']
@@ -527,150 +746,309 @@ def receive_sensor_data():
         if missing_fields:
             return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
 
-        temperature = data['temperature']
-        pressure = data['pressure']
-        light_intensity = data['light_intensity']
-        humidity = data['humidity']
-        air_quality = data['air_quality']
-        pH = data['pH']
-        moisture = data['moisture']
-        greenhouse_zone = data['greenhouse_zone']
-        timestamp = data['timestamp']
+        if app.config['INGEST_WRITE_BEHIND']:
+            # One malformed reading would fail the whole group commit, so check it fully up front
+            error = validate_reading(data)
+            if error:
+                return jsonify({"error": error}), 400
+            return queue_readings([data])
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        if spool_backlog():
+            # Nothing goes straight to the database while older readings wait in the spool
+            return spool_readings([data])
 
-        # Insert sensor data into sensor_readings
-        cursor.execute("""
-            INSERT INTO sensor_readings (temperature, pressure, light_intensity, humidity, air_quality, pH, moisture, greenhouse_zone, timestamp)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (temperature, pressure, light_intensity, humidity, air_quality, pH, moisture, greenhouse_zone, timestamp))
-        conn.commit()
+        conn = request_connection()
+        cursor = conn.cursor(dictionary=True)
 
-        # Fetch optimal ranges
-        cursor.execute("SELECT parameter, min_value, max_value FROM optimal_ranges")
-        thresholds = {row['parameter']: {'min': row['min_value'], 'max': row['max_value']} for row in cursor.fetchall()}
-
-        alerts_triggered = []
-
-        # Now check each sensor against its thresholds
-        for sensor, value in {
-            'temperature': temperature,
-            'pressure': pressure,
-            'light_intensity': light_intensity,
-            'humidity': humidity,
-            'air_quality': air_quality,
-            'pH': pH,
-            'moisture': moisture
-        }.items():
-            if sensor in thresholds:
-                min_val = thresholds[sensor]['min']
-                max_val = thresholds[sensor]['max']
-
-                # Compare with min
-                if min_val is not None and value < min_val:
-                    alert_msg = f"{sensor.capitalize()} too low ({value} < {min_val})"
-                    alerts_triggered.append(('Low ' + sensor.capitalize(), alert_msg))
-
-                # Compare with max
-                if max_val is not None and value > max_val:
-                    alert_msg = f"{sensor.capitalize()} too high ({value} > {max_val})"
-                    alerts_triggered.append(('High ' + sensor.capitalize(), alert_msg))
-
-        # Insert any triggered alerts into alerts table
-        for alert_type, description in alerts_triggered:
-            cursor.execute("""
-                INSERT INTO alerts (alert_type, description, greenhouse_zone, created_at)
-                VALUES (%s, %s, %s, NOW())
-            """, (alert_type, description, greenhouse_zone))
+        # Reading and alerts commit together, so a failure leaves nothing that spooling would duplicate
+        checkpoint = alert_tracker.checkpoint([data])
+        write_readings(cursor, [data])
+        alerts_triggered, transitions = alert_tracker.process(cursor, [data], threshold_cache.get_compiled(cursor))
         conn.commit()
+        after_ingest([data], transitions)
 
         return jsonify({"success": True, "alerts_triggered": len(alerts_triggered)}), 201
 
     except Exception as e:
+        if checkpoint is not None:
+            alert_tracker.rollback(checkpoint)
+        if database_unavailable(e):
+            app.logger.warning(f"Database unavailable in receive_sensor_data, spooling: {e}")
+            return spool_readings([data])
         app.logger.error(f"Error in receive_sensor_data: {e}")
         return jsonify({"error": str(e)}), 500
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
 
 
 
-def send_alert_sms(alert_message):
-    """Send SMS to all admins when an alert triggers."""
-    if not app.twilio_client:
-        return False
+def parse_sensor_batch():
+    """Parse a JSON array, NDJSON or packed binary request body into a list of readings.
+
+    Raises ValueError for a packed body that does not match its layout.
+    """
+    if request.mimetype == PACKED_MIMETYPE:
+        return decode_packed(request.get_data(cache=False))
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        readings = []
+        for line in request.get_data(as_text=True).splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                readings.append(json.loads(line))
+            except ValueError:
+                # Keep the slot so per-item results line up with the input
+                readings.append(None)
+        return readings
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('readings'), list):
+        return data['readings']
+    if isinstance(data, list):
+        return data
+    return None
+
 
+@app.route('/receive_sensor_data/batch', methods=['POST'])
+def receive_sensor_data_batch():
+    """Batch ingestion of sensor readings (JSON array, NDJSON or packed binary)."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT phone_number FROM users WHERE role = 'Manager'")
-        admins = cursor.fetchall()
-
-        for admin in admins:
-            app.twilio_client.messages.create(
-                body=f"🚨 ALERT: {alert_message}",
-                from_=app.config['TWILIO_PHONE_NUMBER'],
-                to=admin['phone_number']
-            )
-        return True
-    except TwilioRestException as e:
-        app.logger.error(f"Twilio SMS failed: {e}")
+        readings = parse_sensor_batch()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if readings is None:
+        return jsonify({"error": f"Request must be a JSON array, NDJSON or {PACKED_MIMETYPE}"}), 400
+    if not readings:
+        return jsonify({"error": "Batch is empty"}), 400
+    if len(readings) > app.config['INGEST_MAX_BATCH']:
+        return jsonify({"error": f"Batch exceeds {app.config['INGEST_MAX_BATCH']} readings"}), 413
+
+    results = []
+    accepted = []
+    for index, data in enumerate(readings):
+        error = "Invalid JSON" if data is None else validate_reading(data)
+        if error:
+            results.append({"index": index, "status": "rejected", "error": error})
+        else:
+            results.append({"index": index, "status": "accepted"})
+            accepted.append((index, data))
+
+    if not accepted:
+        return jsonify({"success": False, "accepted": 0, "rejected": len(results), "results": results}), 400
+
+    rejected = len(results) - len(accepted)
+    accepted_readings = [data for _, data in accepted]
+    if app.config['INGEST_WRITE_BEHIND']:
+        return defer_batch(queue_readings, accepted_readings, results)
+    if spool_backlog():
+        return defer_batch(spool_readings, accepted_readings, results)
+
+    try:
+        alert_counts, transitions = insert_sensor_batch(accepted_readings)
+    except Exception as e:
+        if database_unavailable(e):
+            app.logger.warning(f"Database unavailable in receive_sensor_data_batch, spooling: {e}")
+            return defer_batch(spool_readings, accepted_readings, results)
+        app.logger.error(f"Error in receive_sensor_data_batch: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    after_ingest(accepted_readings, transitions)
+    for (index, _), count in zip(accepted, alert_counts):
+        results[index]["alerts_triggered"] = count
+
+    return jsonify({
+        "success": rejected == 0,
+        "accepted": len(accepted),
+        "rejected": rejected,
+        "alerts_triggered": sum(alert_counts),
+        "results": results
+    }), 201 if rejected == 0 else 207
+
+
+
+def queue_readings(readings):
+    """Hand validated readings to the write-behind buffer: 202 once queued, 429 while it is full."""
+    if not app.ingest_buffer.submit(readings):
+        response = jsonify({"error": "Ingest queue is full, retry later"})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    return jsonify({"success": True, "queued": len(readings)}), 202
+
+
+def defer_batch(handoff, readings, results):
+    """202 with the per-reading results once handoff() has taken the accepted readings, else its refusal."""
+    response, status = handoff(readings)
+    if status != 202:
+        return response, status
+    rejected = len(results) - len(readings)
+    return jsonify({
+        "success": rejected == 0,
+        "accepted": len(readings),
+        "rejected": rejected,
+        "results": results
+    }), 202
+
+
+def spool_backlog():
+    return app.spool is not None and app.spool.pending()
+
+
+def spool(readings):
+    """Durably keep readings until the database is back; False without a spool or room in it."""
+    if app.spool is None or not app.spool.append(readings):
         return False
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
+    app.spool_replayer.notify()
+    return True
 
 
-@app.route('/alerts')
-def get_alerts():
-    """Returns the latest active alerts as JSON."""
-    conn = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+def spool_readings(readings):
+    """Answer for readings the database cannot take now: 202 once spooled, 503 when they cannot be kept."""
+    if not spool(readings):
+        response = jsonify({"error": "Database unavailable, retry later"})
+        response.headers['Retry-After'] = str(int(app.config['INGEST_SPOOL_RETRY_INTERVAL']))
+        return response, 503
+    return jsonify({"success": True, "spooled": len(readings)}), 202
+
+
+def commit_readings(readings):
+    """Insert readings and their alerts in one transaction, then fan them out; for background threads."""
+    with app.app_context():
+        _, transitions = insert_sensor_batch(readings)
+    after_ingest(readings, transitions)
+
+
+def flush_ingest_buffer(readings):
+    """Group-commit readings queued by write-behind ingest; runs on the flusher thread.
+
+    Any error but FlushRefused makes the buffer split the batch to isolate a
+    bad reading, so an outage the spool cannot absorb must raise FlushRefused.
+    """
+    if not spool_backlog():
+        try:
+            commit_readings(readings)
+            return
+        except Exception as e:
+            if not database_unavailable(e):
+                raise
+            if not spool(readings):
+                raise FlushRefused(f"Database unavailable and spool refused {len(readings)} readings") from e
+            return
+    if not spool(readings):
+        raise FlushRefused(f"Spool backlog pending and spool refused {len(readings)} readings")
+
+
+def send_alert_sms(alert_message):
+    """Queue an SMS to all admins; delivery happens on the dispatcher threads."""
+    return app.sms_dispatcher.enqueue(alert_message)
 
-        # Pagination logic (optional)
-        page = request.args.get('page', default=1, type=int)
-        limit = 10
-        offset = (page - 1) * limit
 
-        cursor.execute("""
-            SELECT
-                sensor_type, reading_value,
-                threshold_type, threshold_value,
-                timestamp, status, message
-            FROM alerts
-            WHERE status != 'Resolved'
-            ORDER BY timestamp DESC
-            LIMIT %s OFFSET %s
-        """, (limit, offset))
+def after_ingest(readings, transitions):
+    """Fan committed readings out to in-memory consumers and notify on new alerts."""
+    for entry in latest_cache.update(readings):
+        broker.publish('reading', encode(entry), entry['greenhouse_zone'])
+    forecaster.update(readings)
+    for zone, count in Counter(reading['greenhouse_zone'] for reading in readings).items():
+        readings_ingested.inc(zone, amount=count)
+    for transition in transitions:
+        broker.publish('alert', encode(transition), transition['greenhouse_zone'])
+        alert_transitions.inc(transition['event'], transition['sensor_type'])
+    notify_transitions(transitions)
 
-        alerts = cursor.fetchall()
 
-        if not alerts:
-            app.logger.info("No active alerts found.")
-            return jsonify({"message": "No active alerts"}), 200
+def notify_transitions(transitions):
+    """Send SMS for alerts that were opened by an ingest request."""
+    for transition in transitions:
+        if transition['event'] == 'opened':
+            send_alert_sms(transition['message'])
+
+
+@app.route('/alerts')
+def get_alerts():
+    """Returns alerts as JSON, newest first, paginated with an opaque cursor.
+
+    Filters: greenhouse, zone, sensor_type, status (default Open, 'all' for every status),
+    since/until (ISO datetimes), limit (max 100). Pass next_cursor back as
+    ?cursor= to fetch the following page.
+    """
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        since = parse_history_bound(request.args.get('since'), None)
+        until = parse_history_bound(request.args.get('until'), None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = max(1, min(request.args.get('limit', default=10, type=int), 100))
+    filters = {
+        'zone': request.args.get('zone'),
+        'sensor_type': request.args.get('sensor_type'),
+        'status': request.args.get('status'),
+        'since': since,
+        'until': until
+    }
+
+    try:
+        filters['zones'] = zone_scope()
+        cursor = request_connection().cursor(dictionary=True)
+        alerts, next_cursor = list_alerts(cursor, after=after, limit=limit, **filters)
+        total_alerts = count_alerts(cursor, **filters)
 
         return jsonify({
             "alerts": alerts,
-            "total_alerts": len(alerts),
-            "message": "Alerts fetched successfully"
+            "next_cursor": next_cursor,
+            "total_alerts": total_alerts,
+            "message": "Alerts fetched successfully" if alerts else "No active alerts"
         }), 200
 
-    except mysql.connector.Error as e:
+    except DatabaseError as e:
         app.logger.error(f"Database error: {e}")
         return jsonify({'error': 'Database error occurred'}), 500
     except Exception as e:
         app.logger.error(f"Unexpected error: {e}")
         return jsonify({'error': 'Failed to fetch alerts'}), 500
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
 
 
 
+@app.route('/api/db/stats')
+@require_role(['Manager'])
+def db_stats():
+    """Connection pool metrics (checkouts, in-use, waits, exhaustion, commits) and ingest queue and spool state."""
+    stats = pool_stats()
+    stats['ingest_buffer'] = dict(app.ingest_buffer.stats, depth=app.ingest_buffer.depth(),
+                                  enabled=app.config['INGEST_WRITE_BEHIND'])
+    if app.spool is not None:
+        stats['spool'] = dict(app.spool.stats, bytes=app.spool.size(), pending=app.spool.pending())
+    return jsonify(stats)
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint: request, query, pool checkout and SMS latencies, ingest and alert counters.
+
+    A scraper authenticates with `Authorization: Bearer <METRICS_TOKEN>`;
+    without a configured token only a logged-in manager can read it.
+    """
+    token = app.config['METRICS_TOKEN']
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return "Unauthorized Access", 401
+    elif not is_logged_in() or current_user.role != 'Manager':
+        return "Unauthorized Access", 401
+    return Response(registry.render(), mimetype=METRICS_MIMETYPE)
+
+
+@registry.collector
+def runtime_stats():
+    """Pool, ingest queue and SMS dispatcher state, read at scrape time."""
+    stats = pool_stats()
+    if stats:
+        yield 'greenhouse_db_pool_size', 'gauge', 'Connection pool size.', stats['size']
+        yield 'greenhouse_db_pool_in_use', 'gauge', 'Pooled connections checked out.', stats['in_use']
+        yield 'greenhouse_db_pool_waited_total', 'counter', 'Checkouts that queued for a connection.', stats['waited']
+        yield 'greenhouse_db_pool_exhausted_total', 'counter', 'Checkouts that timed out.', stats['exhausted']
+    yield 'greenhouse_ingest_queue_depth', 'gauge', 'Readings waiting in the write-behind buffer.', \
+        app.ingest_buffer.depth()
+    for key in ('sent', 'failed', 'dropped'):
+        yield f"greenhouse_sms_{key}_total", 'counter', f"Alert SMS {key}.", app.sms_dispatcher.stats[key]
+
+
 @app.route('/send_mock_sensor_data', methods=['GET'])
 def send_mock_sensor_data():
     """A temporary route to generate and send mock sensor data."""
@@ -1,35 +1,31 @@
-function renderCharts(data) {
-    if (!data || data.length === 0) return;
+// canvas id, label and colour for each sensor parameter
+const CHART_SERIES = {
+    temperature: ['tempChart', 'Temperature (°C)', '#4CAF50'],
+    pressure: ['pressureChart', 'Pressure (hPa)', '#3F51B5'],
+    pH: ['phChart', 'pH Level', '#008080'],
+    humidity: ['humidityChart', 'Humidity (%)', '#2196F3'],
+    light_intensity: ['lightChart', 'Light Intensity (Lux)', '#FFC107'],
+    air_quality: ['airQualityChart', 'Air Quality (ppm)', '#9C27B0'],
+    moisture: ['moistureChart', 'Moisture (%)', '#795548']
+};
 
-    const dates = data.map(item => item.date);
-
-    // Temperature Chart
-    createChart('tempChart', 'Temperature (°C)', dates,
-               data.map(item => item.avg_temp), '#4CAF50');
-
-    // Pressure Chart
-    createChart('pressureChart', 'Pressure (hPa)', dates,
-               data.map(item => item.avg_pressure), '#3F51B5');
-
-    // pH Chart
-    createChart('phChart', 'pH Level', dates,
-               data.map(item => item.avg_ph), '#008080');
-
-    // Humidity Chart
-    createChart('humidityChart', 'Humidity (%)', dates,
-               data.map(item => item.avg_humidity), '#2196F3');
-
-    // Light Intensity Chart
-    createChart('lightChart', 'Light Intensity (Lux)', dates,
-               data.map(item => item.avg_light), '#FFC107');
-
-    // Air Quality Chart
-    createChart('airQualityChart', 'Air Quality (ppm)', dates,
-               data.map(item => item.avg_air_quality), '#9C27B0');
-
-    // Moisture Chart
-    createChart('moistureChart', 'Moisture (%)', dates,
-               data.map(item => item.avg_moisture), '#795548');
+function loadHistoryCharts(start, end, points) {
+    // Series come back downsampled server-side, so the payload stays small for any range
+    const params = new URLSearchParams({ start: start, end: end, points: points || 500 });
+    fetch('/api/history?' + params)
+        .then(response => response.json())
+        .then(payload => {
+            if (!payload.series) return;
+            Object.entries(CHART_SERIES).forEach(([param, [elementId, label, color]]) => {
+                const series = payload.series[param];
+                if (!series) return;
+                const labels = series.t.map(t => new Date(t).toLocaleString());
+                createChart(elementId, label, labels, series.v, color);
+            });
+        })
+        .catch(error => {
+            console.error('Error fetching history series:', error);
+        });
 }
 
 function createChart(elementId, label, labels, data, color) {
@@ -64,7 +60,7 @@ function createChart(elementId, label, labels, data, color) {
                 x: {
                     title: {
                         display: true,
-                        text: 'Date'
+                        text: 'Time'
                     }
                 }
             },
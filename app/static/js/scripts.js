@@ -71,34 +71,33 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+function renderLatestData(data) {
+    if (!data) return;
+    document.querySelector('.latest-data table tbody tr td:nth-child(1)').textContent = (data.temperature || '--') + ' °C';
+    document.querySelector('.latest-data table tbody tr td:nth-child(2)').textContent = (data.humidity || '--') + ' %';
+    document.querySelector('.latest-data table tbody tr td:nth-child(3)').textContent = (data.light_intensity || '--') + ' lux';
+    document.querySelector('.latest-data table tbody tr td:nth-child(4)').textContent = (data.pressure || '--') + ' hPa';
+    document.querySelector('.latest-data table tbody tr td:nth-child(5)').textContent = (data.air_quality || '--') + ' ppm';
+    document.querySelector('.latest-data table tbody tr td:nth-child(6)').textContent = (data.pH || '--') + ' level';
+    document.querySelector('.latest-data table tbody tr td:nth-child(7)').textContent = (data.moisture || '--') + ' %';
+    document.querySelector('.latest-data table tbody tr td:nth-child(8)').textContent = data.timestamp || '--';
+}
+
 function fetchLatestData() {
-    fetch('/latest_sensor_data')
+    // Revalidates with If-None-Match, so an unchanged reading costs a 304
+    fetch('/latest_sensor_data', { cache: 'no-cache' })
         .then(response => response.json())
-        .then(data => {
-            if (data) {
-                document.querySelector('.latest-data table tbody tr td:nth-child(1)').textContent = (data.temperature || '--') + ' °C';
-                document.querySelector('.latest-data table tbody tr td:nth-child(2)').textContent = (data.humidity || '--') + ' %';
-                document.querySelector('.latest-data table tbody tr td:nth-child(3)').textContent = (data.light_intensity || '--') + ' lux';
-                document.querySelector('.latest-data table tbody tr td:nth-child(4)').textContent = (data.pressure || '--') + ' hPa';
-                document.querySelector('.latest-data table tbody tr td:nth-child(5)').textContent = (data.air_quality || '--') + ' ppm';
-                document.querySelector('.latest-data table tbody tr td:nth-child(6)').textContent = (data.pH || '--') + ' level';
-                document.querySelector('.latest-data table tbody tr td:nth-child(7)').textContent = (data.moisture || '--') + ' %';
-                document.querySelector('.latest-data table tbody tr td:nth-child(8)').textContent = data.timestamp || '--';
-            }
-        })
+        .then(renderLatestData)
         .catch(error => {
             console.error('Error fetching latest data:', error);
         });
 }
 
-fetchLatestData();
-
-setInterval(fetchLatestData, 60000);
-
 function fetchActiveAlerts() {
     fetch('/alerts')
         .then(response => response.json())
-        .then(alerts => {
+        .then(payload => {
+            const alerts = payload.alerts || [];
             const alertsList = document.querySelector('.active-alerts ul');
             if (alertsList) {
                 alertsList.innerHTML = ''; // Clear existing alerts
@@ -124,6 +123,29 @@ function fetchActiveAlerts() {
         });
 }
 
-fetchActiveAlerts();
+function startLiveUpdates() {
+    if (!document.querySelector('.latest-data')) return;
+
+    fetchLatestData();
+    fetchActiveAlerts();
+
+    if (!window.EventSource) {
+        setInterval(fetchLatestData, 60000);
+        setInterval(fetchActiveAlerts, 60000);
+        return;
+    }
+
+    // Server pushes readings and alert changes; EventSource reconnects on its own
+    const source = new EventSource('/stream');
+    let latestTimestamp = '';
+    source.addEventListener('reading', event => {
+        const data = JSON.parse(event.data);
+        if (data.timestamp >= latestTimestamp) {
+            latestTimestamp = data.timestamp;
+            renderLatestData(data);
+        }
+    });
+    source.addEventListener('alert', fetchActiveAlerts);
+}
 
-setInterval(fetchActiveAlerts, 60000);
\ No newline at end of file
+startLiveUpdates();
\ No newline at end of file
@@ -0,0 +1,149 @@
+from array import array
+from datetime import datetime
+from math import inf
+
+PARAMETERS = ('temperature', 'pressure', 'light_intensity', 'humidity',
+              'air_quality', 'pH', 'moisture')
+
+ALERT_STATUS_OPEN = 'Open'
+
+
+class CompiledThresholds:
+    """Threshold ranges laid out as parallel arrays, one slot per parameter.
+
+    Missing bounds compile to -inf/+inf so they can never fire.
+    """
+
+    def __init__(self, mins, maxs):
+        self.parameters = PARAMETERS
+        self.mins = mins
+        self.maxs = maxs
+
+    def bounds(self, param):
+        i = self.parameters.index(param)
+        return self.mins[i], self.maxs[i]
+
+    def ranges(self):
+        """Return {parameter: {'min_value', 'max_value'}}, None for an open bound."""
+        return {param: {'min_value': None if lo == -inf else lo, 'max_value': None if hi == inf else hi}
+                for param, lo, hi in zip(self.parameters, self.mins, self.maxs)}
+
+    def for_zone(self, zone):
+        """One range set applies to every zone."""
+        return self
+
+
+class ThresholdIndex:
+    """Compiled ranges resolved per greenhouse zone.
+
+    by_zone holds the zones whose greenhouse or own profile overrides the
+    default (global) ranges; every other zone uses default. Zones sharing a
+    profile share one CompiledThresholds, so evaluate_zones() checks them as
+    one batch. zones_by_greenhouse maps greenhouse id to its zone names.
+    """
+
+    def __init__(self, default, by_zone=None, zones_by_greenhouse=None):
+        self.default = default
+        self.by_zone = by_zone or {}
+        self.zones_by_greenhouse = zones_by_greenhouse or {}
+
+    def for_zone(self, zone):
+        return self.by_zone.get(zone, self.default)
+
+    def zones(self, greenhouse_id):
+        """Zone names assigned to a greenhouse; [] for a greenhouse without zones."""
+        return self.zones_by_greenhouse.get(greenhouse_id, [])
+
+
+def compile_thresholds(thresholds):
+    """Compile {parameter: row} from optimal_ranges into CompiledThresholds."""
+    mins = array('d', [-inf] * len(PARAMETERS))
+    maxs = array('d', [inf] * len(PARAMETERS))
+    for i, param in enumerate(PARAMETERS):
+        row = thresholds.get(param)
+        if not row:
+            continue
+        if row.get('min_value') is not None:
+            mins[i] = float(row['min_value'])
+        if row.get('max_value') is not None:
+            maxs[i] = float(row['max_value'])
+    return CompiledThresholds(mins, maxs)
+
+
+def evaluate(readings, compiled):
+    """Check a batch of readings against compiled thresholds.
+
+    Each parameter is evaluated as one column over the whole batch rather
+    than reading by reading. Returns alert dicts ordered by reading, then
+    parameter, then min before max, so every ingest path gets the same output.
+    """
+    hits = []
+    for p, param in enumerate(compiled.parameters):
+        lo = compiled.mins[p]
+        hi = compiled.maxs[p]
+        if lo == -inf and hi == inf:
+            continue
+        column = [reading.get(param) for reading in readings]
+        if lo != -inf:
+            hits.extend((i, p, 0) for i, v in enumerate(column) if v is not None and v < lo)
+        if hi != inf:
+            hits.extend((i, p, 1) for i, v in enumerate(column) if v is not None and v > hi)
+
+    hits.sort()
+    alerts = []
+    for i, p, is_max in hits:
+        reading = readings[i]
+        param = compiled.parameters[p]
+        value = reading[param]
+        if is_max:
+            threshold = compiled.maxs[p]
+            message = f"{param} too high ({value} > {_format(threshold)})"
+        else:
+            threshold = compiled.mins[p]
+            message = f"{param} too low ({value} < {_format(threshold)})"
+        alerts.append({
+            'index': i,
+            'message': message,
+            'timestamp': reading.get('timestamp') or datetime.now(),
+            'sensor_type': param,
+            'reading_value': float(value),
+            'threshold_type': 'max' if is_max else 'min',
+            'threshold_value': threshold,
+            'greenhouse_zone': reading.get('greenhouse_zone'),
+        })
+    return alerts
+
+
+def evaluate_zones(readings, thresholds):
+    """evaluate() with each reading checked against its own zone's ranges.
+
+    thresholds is a ThresholdIndex or a single CompiledThresholds. Readings
+    are grouped by the ranges that apply to them and each group is evaluated
+    as one batch; indexes and ordering match evaluate() over the whole batch.
+    """
+    groups = {}
+    for i, reading in enumerate(readings):
+        groups.setdefault(thresholds.for_zone(reading.get('greenhouse_zone')), []).append(i)
+    if len(groups) <= 1:
+        return evaluate(readings, next(iter(groups), thresholds.for_zone(None)))
+
+    alerts = []
+    for compiled, indexes in groups.items():
+        for alert in evaluate([readings[i] for i in indexes], compiled):
+            alert['index'] = indexes[alert['index']]
+            alerts.append(alert)
+    # Stable: a reading's alerts all come from one group, already in parameter order
+    alerts.sort(key=lambda alert: alert['index'])
+    return alerts
+
+
+def count_by_reading(alerts, size):
+    """Number of alerts for each of `size` readings."""
+    counts = [0] * size
+    for alert in alerts:
+        counts[alert['index']] += 1
+    return counts
+
+
+def _format(threshold):
+    return int(threshold) if threshold.is_integer() else threshold
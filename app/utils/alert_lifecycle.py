@@ -0,0 +1,250 @@
+import threading
+from datetime import datetime, timedelta
+from math import inf
+
+from . import storage
+from .alert_engine import ALERT_STATUS_OPEN, evaluate_zones
+
+ALERT_STATUS_RESOLVED = 'Resolved'
+
+
+class OpenAlert:
+    """In-memory state of one open alert row."""
+
+    def __init__(self, alert_id, last_seen=None):
+        self.alert_id = alert_id
+        self.last_seen = last_seen
+        self.last_value = None
+        self.pending = 0
+        self.clear_since = None
+
+
+class AlertTracker:
+    """Alert lifecycle keyed by (greenhouse_zone, sensor_type, threshold_type).
+
+    A breach opens one alert row. Further breaches only bump occurrences and
+    last_seen on that row, once per batch. The alert resolves after the value
+    has stayed back inside the range, past the hysteresis band, for
+    min_dwell seconds.
+
+    With a detector (anomaly.AnomalyDetector) set, its drift and spike
+    alerts go through the same lifecycle; they clear once the detector stops
+    raising them, then resolve after the same dwell.
+
+    State is per process and warm-loaded from the open rows on first use.
+    Callers take a checkpoint() before process() and rollback() to it if the
+    transaction is rolled back; only the zones of that batch are reloaded.
+    """
+
+    def __init__(self, hysteresis=0.02, min_dwell=300, detector=None):
+        self.hysteresis = hysteresis
+        self.min_dwell = min_dwell
+        self.detector = detector
+        self._lock = threading.Lock()
+        self._open = None
+        self._stale = set()
+
+    def process(self, cursor, readings, thresholds):
+        """Evaluate readings and apply the resulting transitions.
+
+        thresholds is the ThresholdIndex from the threshold cache (or one
+        CompiledThresholds for every zone); each reading is checked against
+        its zone's ranges.
+
+        Returns (alerts, transitions): every breach found by the alert engine,
+        and the opened/resolved state changes that were written.
+        """
+        alerts = evaluate_zones(readings, thresholds)
+        if self.detector is not None:
+            anomalies = self.detector.observe(readings)
+            if anomalies:
+                # Stable: range alerts stay ahead of a reading's anomaly alerts
+                alerts = sorted(alerts + anomalies, key=lambda alert: alert['index'])
+        by_index = {}
+        for alert in alerts:
+            by_index.setdefault(alert['index'], []).append(alert)
+
+        with self._lock:
+            if self._open is None:
+                self._load(cursor)
+            elif self._stale:
+                stale = self._stale.intersection(reading.get('greenhouse_zone') for reading in readings)
+                if stale:
+                    self._load(cursor, stale)
+                    self._stale -= stale
+
+            transitions = []
+            touched = {}
+            resolved = []
+            for i, reading in enumerate(readings):
+                zone = reading.get('greenhouse_zone')
+                seen_at = reading_time(reading)
+                zone_state = self._open.setdefault(zone, {})
+                compiled = thresholds.for_zone(zone)
+                breached = {(a['sensor_type'], a['threshold_type']): a for a in by_index.get(i, ())}
+
+                for key, alert in breached.items():
+                    state = zone_state.get(key)
+                    if state is None:
+                        state = OpenAlert(self._insert(cursor, alert, seen_at), seen_at)
+                        zone_state[key] = state
+                        transitions.append(_transition('opened', state, alert))
+                    else:
+                        state.pending += 1
+                        touched[state.alert_id] = state
+                    alert['alert_id'] = state.alert_id
+                    state.last_seen = seen_at
+                    state.last_value = alert['reading_value']
+                    state.clear_since = None
+
+                for key, state in list(zone_state.items()):
+                    if key in breached or reading.get(key[0]) is None:
+                        continue
+                    if not self._cleared(compiled, key, reading[key[0]]):
+                        state.clear_since = None
+                        continue
+                    if state.clear_since is None:
+                        state.clear_since = seen_at
+                    if seen_at - state.clear_since >= timedelta(seconds=self.min_dwell):
+                        del zone_state[key]
+                        resolved.append((state, seen_at))
+                        transitions.append(_transition('resolved', state, {
+                            'greenhouse_zone': zone, 'sensor_type': key[0], 'threshold_type': key[1],
+                            'reading_value': float(reading[key[0]]), 'timestamp': reading.get('timestamp'),
+                            'message': f"{key[0]} back in range ({reading[key[0]]})",
+                        }))
+
+            if touched:
+                cursor.executemany("""
+                    UPDATE alerts SET occurrences = occurrences + %s, last_seen = %s, reading_value = %s
+                    WHERE id = %s
+                """, [(s.pending, s.last_seen, s.last_value, s.alert_id) for s in touched.values()])
+                for state in touched.values():
+                    state.pending = 0
+            if resolved:
+                cursor.executemany("""
+                    UPDATE alerts SET status = %s, resolved_at = %s WHERE id = %s
+                """, [(ALERT_STATUS_RESOLVED, resolved_at, s.alert_id) for s, resolved_at in resolved])
+            if transitions:
+                _update_open_counts(cursor, transitions)
+
+        return alerts, transitions
+
+    def checkpoint(self, readings):
+        """What rollback() needs to undo process(readings): their zones and the detector's series."""
+        zones = {reading.get('greenhouse_zone') for reading in readings}
+        series = self.detector.snapshot(readings) if self.detector is not None else None
+        return zones, series
+
+    def rollback(self, checkpoint):
+        """Undo a process() whose transaction rolled back.
+
+        The checkpoint's zones are reloaded from their open rows when they
+        next see a reading; every other zone keeps its state and dwell timers.
+        The detector's series go back to the snapshot, so a replay of the
+        same readings does not count them twice.
+        """
+        zones, series = checkpoint
+        with self._lock:
+            if self._open is not None:
+                for zone in zones:
+                    self._open.pop(zone, None)
+                self._stale.update(zones)
+        if series is not None:
+            self.detector.restore(series)
+
+    def reset(self):
+        """Forget in-memory state; the next process() reloads open alerts."""
+        with self._lock:
+            self._open = None
+            self._stale = set()
+
+    def _load(self, cursor, zones=None):
+        """Load open rows, of every zone or only of zones."""
+        if zones is None:
+            cursor.execute("""
+                SELECT id, greenhouse_zone, sensor_type, threshold_type, last_seen
+                FROM alerts WHERE status = %s
+            """, (ALERT_STATUS_OPEN,))
+            self._open = {}
+            self._stale = set()
+        else:
+            zone_sql, zone_params = storage.in_clause('greenhouse_zone', list(zones))
+            cursor.execute(f"""
+                SELECT id, greenhouse_zone, sensor_type, threshold_type, last_seen
+                FROM alerts WHERE status = %s AND {zone_sql}
+            """, [ALERT_STATUS_OPEN] + zone_params)
+            for zone in zones:
+                self._open[zone] = {}
+        for row in cursor.fetchall():
+            key = (row['sensor_type'], row['threshold_type'])
+            self._open.setdefault(row['greenhouse_zone'], {})[key] = OpenAlert(row['id'], row['last_seen'])
+
+    def _insert(self, cursor, alert, seen_at):
+        cursor.execute("""
+            INSERT INTO alerts (message, timestamp, sensor_type, reading_value, threshold_type, threshold_value,
+                                status, greenhouse_zone, occurrences, last_seen)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1, %s)
+        """, (alert['message'], alert['timestamp'], alert['sensor_type'], alert['reading_value'],
+              alert['threshold_type'], alert['threshold_value'], ALERT_STATUS_OPEN,
+              alert['greenhouse_zone'], seen_at))
+        return cursor.lastrowid
+
+    def _cleared(self, compiled, key, value):
+        """True once value is back inside the range by more than the hysteresis band."""
+        param, threshold_type = key
+        if threshold_type not in ('min', 'max'):
+            # An anomaly alert is back to normal as soon as the detector stops raising it
+            return True
+        lo, hi = compiled.bounds(param)
+        if threshold_type == 'max':
+            if hi == inf:
+                return True
+            band = self.hysteresis * ((hi - lo) if lo != -inf else abs(hi))
+            return value <= hi - band
+        if lo == -inf:
+            return True
+        band = self.hysteresis * ((hi - lo) if hi != inf else abs(lo))
+        return value >= lo + band
+
+
+def reading_time(reading):
+    """Timestamp of a reading as a naive datetime, or now if it cannot be parsed."""
+    timestamp = reading.get('timestamp')
+    if isinstance(timestamp, datetime):
+        return timestamp.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(timestamp).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return datetime.now()
+
+
+def _update_open_counts(cursor, transitions):
+    """Keep alert_counts.open_count per zone in step with opened/resolved alerts."""
+    deltas = {}
+    for transition in transitions:
+        zone = transition['greenhouse_zone'] or ''
+        deltas[zone] = deltas.get(zone, 0) + (1 if transition['event'] == 'opened' else -1)
+    # Zone order, so concurrent batches lock the count rows in the same sequence
+    rows = sorted((zone, delta) for zone, delta in deltas.items() if delta)
+    if rows:
+        cursor.executemany(f"""
+            INSERT INTO alert_counts (greenhouse_zone, open_count) VALUES (%s, %s)
+            {storage.dialect.upsert(['greenhouse_zone'])} open_count = open_count + {storage.dialect.inserted('open_count')}
+        """, rows)
+
+
+def _transition(event, state, alert):
+    return {
+        'event': event,
+        'alert_id': state.alert_id,
+        'message': alert['message'],
+        'greenhouse_zone': alert['greenhouse_zone'],
+        'sensor_type': alert['sensor_type'],
+        'threshold_type': alert['threshold_type'],
+        'reading_value': alert['reading_value'],
+        'timestamp': alert['timestamp'],
+    }
+
+
+alert_tracker = AlertTracker()
@@ -1,36 +1,115 @@
-from .db_utils import get_db_connection
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
+from . import storage
+from .db_utils import db_connection
+from .threshold_cache import threshold_cache
+from .alert_engine import ALERT_STATUS_OPEN
+from .alert_lifecycle import alert_tracker
 
-THRESHOLDS = {
-    'temperature': {'min': 18, 'max': 40},
-    'humidity': {'min': 30, 'max': 80},
-    'light_intensity': {'min': 150, 'max': 1800},
-    'pressure': {'min': 985, 'max': 1040},
-    'air_quality': {'min': 0, 'max': 100},
-    'pH': {'min': 6.0, 'max': 7.5},
-    'moisture': {'min': 15, 'max': 55}
-}
+ACTIVE_STATUS = ALERT_STATUS_OPEN
+ALERT_COLUMNS = """
+    id, sensor_type, reading_value, threshold_type, threshold_value,
+    timestamp, status, message, greenhouse_zone
+"""
 
 def check_and_generate_alerts(sensor_data):
-    connection = get_db_connection()
-    cursor = connection.cursor()
-
-    for sensor, limits in THRESHOLDS.items():
-        value = sensor_data.get(sensor)
-        if value is None:
-            continue
-
-        if value < limits['min']:
-            cursor.execute('''
-                INSERT INTO alerts (sensor_type, reading_value, threshold_type, threshold_value, timestamp, status)
-                VALUES (%s, %s, 'min', %s, %s, 'Unresolved')
-            ''', (sensor, value, limits['min'], datetime.now()))
-
-        elif value > limits['max']:
-            cursor.execute('''
-                INSERT INTO alerts (sensor_type, reading_value, threshold_type, threshold_value, timestamp, status)
-                VALUES (%s, %s, 'max', %s, %s, 'Unresolved')
-            ''', (sensor, value, limits['max'], datetime.now()))
-
-    connection.commit()
-    connection.close()
+    """Evaluate one reading against optimal_ranges and record any alerts."""
+    with db_connection() as connection:
+        checkpoint = alert_tracker.checkpoint([sensor_data])
+        try:
+            cursor = connection.cursor(dictionary=True)
+            alerts, _ = alert_tracker.process(cursor, [sensor_data], threshold_cache.get_compiled(cursor))
+            connection.commit()
+            return alerts
+        except Exception:
+            alert_tracker.rollback(checkpoint)
+            raise
+
+
+
+def encode_cursor(row):
+    """Opaque keyset cursor for the (timestamp, id) position of an alert row."""
+    return urlsafe_b64encode(f"{row['timestamp'].isoformat()}|{row['id']}".encode()).decode()
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for a malformed token."""
+    try:
+        timestamp, alert_id = urlsafe_b64decode(token.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(alert_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {token}")
+
+
+def _filters(zone=None, zones=None, sensor_type=None, status=None, since=None, until=None):
+    """WHERE clauses for the alert filters; status defaults to open alerts, 'all' disables it.
+
+    zones, when not None, limits alerts to those zones (e.g. one greenhouse's).
+    """
+    clauses, params = [], []
+    status = status or ACTIVE_STATUS
+    if status != 'all':
+        clauses.append("status = %s")
+        params.append(status)
+    if zone:
+        clauses.append("greenhouse_zone = %s")
+        params.append(zone)
+    if zones is not None:
+        zone_sql, zone_params = storage.in_clause('greenhouse_zone', zones)
+        clauses.append(zone_sql)
+        params.extend(zone_params)
+    if sensor_type:
+        clauses.append("sensor_type = %s")
+        params.append(sensor_type)
+    if since:
+        clauses.append("timestamp >= %s")
+        params.append(since)
+    if until:
+        clauses.append("timestamp < %s")
+        params.append(until)
+    return clauses, params
+
+
+def list_alerts(cursor, after=None, limit=10, **filters):
+    """One page of alerts, newest first, keyset-paginated on (timestamp, id).
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    clauses, params = _filters(**filters)
+    if after:
+        clauses.append("(timestamp < %s OR (timestamp = %s AND id < %s))")
+        params.extend([after[0], after[0], after[1]])
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cursor.execute(f"""
+        SELECT {ALERT_COLUMNS}
+        FROM alerts
+        {where}
+        ORDER BY timestamp DESC, id DESC
+        LIMIT %s
+    """, params + [limit + 1])
+    rows = cursor.fetchall()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def count_alerts(cursor, **filters):
+    """Total matching alerts; open alerts by zone come from the maintained alert_counts table."""
+    if not any(filters.get(key) for key in ('sensor_type', 'since', 'until')) \
+            and filters.get('status') in (None, ACTIVE_STATUS):
+        zone, zones = filters.get('zone'), filters.get('zones')
+        if zone and zones is None:
+            cursor.execute("SELECT open_count AS total FROM alert_counts WHERE greenhouse_zone = %s", (zone,))
+        elif zones is not None:
+            zone_sql, zone_params = storage.in_clause('greenhouse_zone', [z for z in zones if not zone or z == zone])
+            cursor.execute(f"SELECT COALESCE(SUM(open_count), 0) AS total FROM alert_counts WHERE {zone_sql}",
+                           zone_params)
+        else:
+            cursor.execute("SELECT COALESCE(SUM(open_count), 0) AS total FROM alert_counts")
+        row = cursor.fetchone()
+        return int(row['total']) if row else 0
+
+    clauses, params = _filters(**filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cursor.execute(f"SELECT COUNT(*) AS total FROM alerts {where}", params)
+    return cursor.fetchone()['total']
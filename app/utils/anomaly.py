@@ -0,0 +1,151 @@
+import threading
+from datetime import datetime
+from math import sqrt
+
+from .alert_engine import PARAMETERS
+from .alert_lifecycle import reading_time
+
+ANOMALY_TYPES = ('drift', 'spike')
+
+
+class SeriesState:
+    """Running statistics of one (zone, parameter) series; the same size however long it runs."""
+
+    __slots__ = ('count', 'mean', 'variance', 'ewma', 'rate', 'last_value', 'last_time')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.ewma = None
+        self.rate = 0.0
+        self.last_value = None
+        self.last_time = None
+
+    def copy(self):
+        state = SeriesState()
+        for name in self.__slots__:
+            setattr(state, name, getattr(self, name))
+        return state
+
+
+class AnomalyDetector:
+    """Streaming drift and spike detection per (greenhouse_zone, parameter).
+
+    Every series keeps a baseline mean and variance (Welford's recurrence,
+    with a new value's weight floored at 1/window so the baseline follows
+    slow seasonal change instead of averaging over all time), a fast EWMA of
+    the values, and the rate of change per hour smoothed with the same alpha.
+
+    A drift alert fires when the EWMA leaves the control limit
+    mean +/- drift_limit * sigma * sqrt(alpha / (2 - alpha)), so a steady
+    creep is caught long before it crosses a hard range. A spike alert fires
+    when one reading is more than spike_limit * sigma from the mean. Neither
+    fires before a series has min_samples readings. State is per process and
+    rebuilt from the ingest stream after a restart.
+    """
+
+    def __init__(self, window=500, alpha=0.1, drift_limit=4.0, spike_limit=6.0, min_samples=50):
+        self.window = window
+        self.alpha = alpha
+        self.drift_limit = drift_limit
+        self.spike_limit = spike_limit
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, readings):
+        """Fold readings into their series and return anomaly alerts, in alert_engine.evaluate()'s format."""
+        alerts = []
+        ewma_limit = self.drift_limit * sqrt(self.alpha / (2 - self.alpha))
+        with self._lock:
+            series = self._series
+            for i, reading in enumerate(readings):
+                zone = reading.get('greenhouse_zone')
+                moment = reading_time(reading)
+                for param in PARAMETERS:
+                    value = reading.get(param)
+                    if value is None:
+                        continue
+                    state = series.get((zone, param))
+                    if state is None:
+                        state = series[(zone, param)] = SeriesState()
+                    anomaly = self._update(state, float(value), moment, ewma_limit)
+                    if anomaly:
+                        kind, message, threshold = anomaly
+                        alerts.append({
+                            'index': i,
+                            'message': f"{param} {message}",
+                            'timestamp': reading.get('timestamp') or datetime.now(),
+                            'sensor_type': param,
+                            'reading_value': float(value),
+                            'threshold_type': kind,
+                            'threshold_value': threshold,
+                            'greenhouse_zone': zone,
+                        })
+        return alerts
+
+    def _update(self, state, value, moment, ewma_limit):
+        # Checked against the baseline as it stood before this reading
+        mean = state.mean
+        sigma = sqrt(state.variance)
+        ewma = value if state.ewma is None else state.ewma + self.alpha * (value - state.ewma)
+
+        if state.last_time is not None and moment > state.last_time:
+            slope = (value - state.last_value) / ((moment - state.last_time).total_seconds() / 3600)
+            state.rate += self.alpha * (slope - state.rate)
+        if state.last_time is None or moment >= state.last_time:
+            state.last_value = value
+            state.last_time = moment
+
+        state.count += 1
+        weight = 1.0 / min(state.count, self.window)
+        delta = value - mean
+        state.mean = mean + delta * weight
+        state.variance = (1.0 - weight) * (state.variance + delta * delta * weight)
+        state.ewma = ewma
+
+        if state.count <= self.min_samples or sigma <= 0.0:
+            return None
+        if abs(delta) > self.spike_limit * sigma:
+            bound = mean + self.spike_limit * sigma if delta > 0 else mean - self.spike_limit * sigma
+            return 'spike', f"spike ({value:g}, usually {mean:.2f} +/- {sigma:.2f})", bound
+        if abs(ewma - mean) > ewma_limit * sigma:
+            bound = mean + ewma_limit * sigma if ewma > mean else mean - ewma_limit * sigma
+            direction = 'up' if ewma > mean else 'down'
+            return 'drift', f"drifting {direction} (average {ewma:.2f}, usually {mean:.2f}, {state.rate:+.2f}/h)", bound
+        return None
+
+    def state(self, zone, param):
+        """The SeriesState of one series, or None before its first reading."""
+        return self._series.get((zone, param))
+
+    def snapshot(self, readings):
+        """Copies of the series readings would update, for restore() if their transaction rolls back."""
+        zones = {reading.get('greenhouse_zone') for reading in readings}
+        saved = {}
+        with self._lock:
+            for zone in zones:
+                for param in PARAMETERS:
+                    state = self._series.get((zone, param))
+                    saved[(zone, param)] = state.copy() if state is not None else None
+        return saved
+
+    def restore(self, saved):
+        """Put back the series a snapshot() covered, dropping those it found missing."""
+        with self._lock:
+            for key, state in saved.items():
+                if state is None:
+                    self._series.pop(key, None)
+                else:
+                    self._series[key] = state.copy()
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def __len__(self):
+        return len(self._series)
+
+
+anomaly_detector = AnomalyDetector()
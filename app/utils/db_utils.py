@@ -1,46 +1,214 @@
 import json
+import math
 import random
-from datetime import datetime
-import mysql.connector
-from mysql.connector import Error, pooling
-from flask import current_app
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import current_app, g, has_request_context
 from flask_login import UserMixin
+from .threshold_cache import threshold_cache
+from .alert_engine import PARAMETERS, count_by_reading
+from .alert_lifecycle import alert_tracker
+from .anomaly import anomaly_detector
+from .forecast import forecaster
+from .rollups import ROLLUP_TABLES, apply_rollups, get_daily_averages, get_zone_hours
+from .latest_cache import latest_cache
+from .metrics import TimedCursor, db_checkout_seconds
+from .pool import InstrumentedPool, PoolTimeout
+from .storage import DatabaseError, create_backend, is_unavailable
+from .user_cache import user_cache
 
 connection_pool = None
+rollups_at_ingest = True
+
+SENSOR_PARAMETERS = list(PARAMETERS)
+REQUIRED_READING_FIELDS = SENSOR_PARAMETERS + ['greenhouse_zone', 'timestamp']
+# Tables and columns the code reads and writes beyond the baseline schema, with the migration that adds them;
+# checked at startup so a database that is behind fails the deploy rather than every request
+REQUIRED_SCHEMA = [
+    ('settings_versions', ('name', 'version'), '002_ingest_pipeline'),
+    ('alerts', ('occurrences', 'last_seen', 'resolved_at'), '002_ingest_pipeline'),
+] + [(table, ('bucket_start', 'greenhouse_zone', 'reading_count'), '002_ingest_pipeline')
+     for table in ROLLUP_TABLES.values()]
+
+# sensor_readings.greenhouse_zone is VARCHAR(100); parameters are single-precision FLOAT columns
+ZONE_MAX_LENGTH = 100
+FLOAT_MAX = 3.402823466e38
 
 def init_db(app):
-    global connection_pool
+    global connection_pool, rollups_at_ingest
     try:
-        connection_pool = pooling.MySQLConnectionPool(
-            pool_name="greenhouse_pool",
-            pool_size=app.config['MYSQL_POOL_SIZE'],
-            host=app.config['MYSQL_HOST'],
-            user=app.config['MYSQL_USER'],
-            password=app.config['MYSQL_PASSWORD'],
-            database=app.config['MYSQL_DB']
+        # The MySQL pool connects on first checkout, so the app starts without a reachable server
+        backend = create_backend(app.config)
+        pool_size = app.config['SQLITE_POOL_SIZE' if app.config['DB_BACKEND'] == 'sqlite' else 'MYSQL_POOL_SIZE']
+        connection_pool = InstrumentedPool(
+            backend,
+            pool_size,
+            checkout_timeout=app.config['MYSQL_POOL_TIMEOUT'],
+            ping_on_borrow=app.config['MYSQL_POOL_PING'],
+            wrap_cursor=TimedCursor if app.config['METRICS_ENABLED'] else None
         )
-    except Error as e:
+        threshold_cache.ttl = app.config['THRESHOLD_CACHE_TTL']
+        rollups_at_ingest = app.config['ROLLUP_AT_INGEST']
+        latest_cache.refresh_interval = app.config['LATEST_CACHE_REFRESH']
+        alert_tracker.hysteresis = app.config['ALERT_HYSTERESIS']
+        alert_tracker.min_dwell = app.config['ALERT_MIN_DWELL']
+        anomaly_detector.window = app.config['ANOMALY_WINDOW']
+        anomaly_detector.alpha = app.config['ANOMALY_EWMA_ALPHA']
+        anomaly_detector.drift_limit = app.config['ANOMALY_DRIFT_LIMIT']
+        anomaly_detector.spike_limit = app.config['ANOMALY_SPIKE_LIMIT']
+        anomaly_detector.min_samples = app.config['ANOMALY_MIN_SAMPLES']
+        alert_tracker.detector = anomaly_detector if app.config['ANOMALY_DETECTION'] else None
+        forecaster.half_life = app.config['FORECAST_HALF_LIFE']
+        forecaster.refresh_interval = app.config['FORECAST_REFRESH']
+        user_cache.max_size = app.config['USER_CACHE_SIZE']
+        user_cache.ttl = app.config['USER_CACHE_TTL']
+    except DatabaseError as e:
         raise RuntimeError(f"Failed to initialize pool: {e}")
+    app.teardown_appcontext(release_request_connection)
+    # SQLite creates its schema when the backend opens; migrations are MySQL DDL
+    if app.config['AUTO_MIGRATE'] and app.config['DB_BACKEND'] == 'mysql':
+        upgrade_schema(app)
+    if app.config['SCHEMA_CHECK']:
+        check_schema(app)
+
+
+def upgrade_schema(app):
+    """Bring the schema up to the newest migration before serving requests."""
+    from .migrations import migrate
+    conn = get_db_connection()
+    try:
+        migrate(conn, log=app.logger.info)
+    except DatabaseError as e:
+        raise RuntimeError(f"Schema migration failed: {e}")
+    finally:
+        conn.close()
+
+
+def check_schema(app):
+    """Refuse to start against a database missing anything in REQUIRED_SCHEMA.
+
+    A database that cannot be reached is only logged, since the app is meant
+    to start without one.
+    """
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        if not database_unavailable(e):
+            raise
+        app.logger.warning(f"Schema check skipped, database unreachable: {e}")
+        return
+    missing = []
+    try:
+        cursor = conn.cursor()
+        for table, columns, migration in REQUIRED_SCHEMA:
+            try:
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE 1 = 0")
+                cursor.fetchall()
+            except DatabaseError:
+                missing.append(f"{table} ({', '.join(columns)}) from migration {migration}")
+    finally:
+        conn.close()
+    if missing:
+        raise RuntimeError(f"Database schema is behind the code, missing {'; '.join(missing)}. "
+                           f"Run 'flask db-upgrade' or start with AUTO_MIGRATE=true.")
 
 
 def get_db_connection():
     if not connection_pool:
         raise RuntimeError("Database pool not initialized")
-    return connection_pool.get_connection()
+    start = time.perf_counter()
+    conn = connection_pool.get_connection()
+    db_checkout_seconds.observe(time.perf_counter() - start)
+    return conn
+
+
+def request_connection():
+    """The current request's connection, borrowed on first use and released at teardown."""
+    if 'db_conn' not in g:
+        g.db_conn = get_db_connection()
+    return g.db_conn
+
+
+def release_request_connection(error=None):
+    conn = g.pop('db_conn', None)
+    if conn is None:
+        return
+    try:
+        if error is not None or conn.in_transaction:
+            conn.rollback()
+    except DatabaseError as e:
+        current_app.logger.error(f"Rollback on release failed: {e}")
+    finally:
+        conn.close()
+
+
+@contextmanager
+def db_connection():
+    """Connection for a unit of work: the request's own inside a request, else a fresh checkout.
+
+    A fresh checkout is rolled back on error and always returned to the pool.
+    """
+    if has_request_context():
+        yield request_connection()
+        return
+    conn = get_db_connection()
+    try:
+        yield conn
+    except Exception:
+        try:
+            conn.rollback()
+        except DatabaseError:
+            pass
+        raise
+    finally:
+        conn.close()
+
+
+@contextmanager
+def db_cursor(dictionary=True):
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+def database_unavailable(error):
+    """True when error, or the error it was raised from, means a retry once the database is back can succeed."""
+    while error is not None:
+        if isinstance(error, PoolTimeout) or is_unavailable(error):
+            return True
+        error = error.__cause__
+    return False
+
+
+def pool_stats():
+    return connection_pool.stats() if connection_pool else {}
 
 
 class AnonymousUser(UserMixin):
-    def __init__(self, id, username, role):
+    def __init__(self, id, username, role, greenhouse_ids=None):
         self.id = id
         self.username = username
         self.role = role
+        # Greenhouses an employee is assigned to, loaded with the user; managers see every greenhouse
+        self.greenhouse_ids = greenhouse_ids
 
+    @property
+    def sees_all_greenhouses(self):
+        return self.role == 'Manager'
+
+    @property
     def is_active(self):
         return True
 
+    @property
     def is_authenticated(self):
         return True
 
+    @property
     def is_anonymous(self):
         return False
 
@@ -49,84 +217,175 @@ class AnonymousUser(UserMixin):
 
 
 def load_user(user_id):
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
+    """Flask-Login user loader; served from user_cache, so only a miss queries MySQL."""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    with db_cursor() as cursor:
         cursor.execute("SELECT id, username, role FROM users WHERE id = %s", (user_id,))
         user_data = cursor.fetchone()
-        conn.close()
-        if user_data:
-            return AnonymousUser(**user_data)
-    return None
+        if not user_data:
+            return None
+        user = AnonymousUser(**user_data, greenhouse_ids=load_access(cursor, user_data['id'], user_data['role']))
+    user_cache.put(user)
+    return user
 
 
-def insert_sensor_data(data):
-    conn = None
-    alerts_triggered = []
+def load_access(cursor, user_id, role):
+    """Greenhouse ids a user may see: None for managers (every greenhouse), else their assignments."""
+    if role == 'Manager':
+        return None
+    cursor.execute("SELECT greenhouse_id FROM employee_assignments WHERE employee_id = %s", (user_id,))
+    return frozenset(row['greenhouse_id'] for row in cursor.fetchall())
 
-    try:
-        conn = get_db_connection()
+
+def set_assignments(greenhouse_id, employee_ids):
+    """Replace a greenhouse's assigned employees.
+
+    Access sets are cached with the user, so everyone added or removed is
+    dropped from user_cache and reloads theirs on the next request.
+    """
+    employee_ids = set(employee_ids)
+    with db_connection() as conn:
         cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT employee_id FROM employee_assignments WHERE greenhouse_id = %s", (greenhouse_id,))
+        previous = {row['employee_id'] for row in cursor.fetchall()}
+        cursor.execute("DELETE FROM employee_assignments WHERE greenhouse_id = %s", (greenhouse_id,))
+        if employee_ids:
+            cursor.executemany("INSERT INTO employee_assignments (employee_id, greenhouse_id) VALUES (%s, %s)",
+                               [(employee_id, greenhouse_id) for employee_id in sorted(employee_ids)])
+        conn.commit()
+    for employee_id in previous ^ employee_ids:
+        user_cache.invalidate(employee_id)
 
-        cursor.execute("""
-            INSERT INTO sensor_readings (timestamp, temperature, pressure, light_intensity, humidity, air_quality, pH, moisture, greenhouse_zone)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            data['timestamp'],
-            data.get('temperature'),
-            data.get('pressure'),
-            data.get('light_intensity'),
-            data.get('humidity'),
-            data.get('air_quality'),
-            data.get('pH'),
-            data.get('moisture'),
-            data.get('greenhouse_zone')
-        ))
-        # Get thresholds
-        cursor.execute("SELECT parameter, min_value, max_value FROM optimal_ranges")
-        thresholds = {row['parameter']: row for row in cursor.fetchall()}
-
-        for param in ['temperature', 'humidity', 'light_intensity',
-                      'pressure', 'air_quality', 'pH', 'moisture']:
-            value = data.get(param)
-            if value is None:
-                continue
-
-            if param in thresholds:
-                min_val = thresholds[param]['min_value']
-                max_val = thresholds[param]['max_value']
-
-                current_app.logger.info(f"Checking {param}: value={value}, min={min_val}, max={max_val}") # Added logging
-
-                # Check min threshold
-                if min_val is not None and value < min_val:
-                    alert_msg = f"{param} too low ({value} < {min_val})"
-                    cursor.execute("""
-                        INSERT INTO alerts (message, timestamp, sensor_type, reading_value, threshold_type, threshold_value, status)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (alert_msg, data['timestamp'], param, float(value), 'min', float(min_val), 'Open'))
-                    alerts_triggered.append(alert_msg)
-
-                # Check max threshold
-                if max_val is not None and value > max_val:
-                    alert_msg = f"{param} too high ({value} > {max_val})"
-                    cursor.execute("""
-                        INSERT INTO alerts (message, timestamp, sensor_type, reading_value, threshold_type, threshold_value, status)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (alert_msg, data['timestamp'], param, float(value), 'max', float(max_val), 'Open'))
-                    alerts_triggered.append(alert_msg)
 
+def set_user_role(user_id, role):
+    """Change a user's role and drop their cached entry so it takes effect on the next request."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE users SET role = %s WHERE id = %s", (role, user_id))
         conn.commit()
-        return alerts_triggered
+        updated = cursor.rowcount
+    user_cache.invalidate(user_id)
+    return updated
+
+
+def write_readings(cursor, readings):
+    """Insert readings and fold them into the rollup tables; the caller commits."""
+    # executemany() rewrites a plain INSERT ... VALUES into one multi-row statement
+    cursor.executemany("""
+        INSERT INTO sensor_readings (timestamp, temperature, pressure, light_intensity, humidity, air_quality, pH, moisture, greenhouse_zone)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [
+        (data['timestamp'], data.get('temperature'), data.get('pressure'), data.get('light_intensity'),
+         data.get('humidity'), data.get('air_quality'), data.get('pH'), data.get('moisture'),
+         data.get('greenhouse_zone'))
+        for data in readings
+    ])
+    if rollups_at_ingest:
+        apply_rollups(cursor, readings)
+
+
+def insert_sensor_data(data):
+    with db_connection() as conn:
+        checkpoint = alert_tracker.checkpoint([data])
+        try:
+            cursor = conn.cursor(dictionary=True)
+
+            write_readings(cursor, [data])
+            alerts, _ = alert_tracker.process(cursor, [data], threshold_cache.get_compiled(cursor))
+
+            conn.commit()
+            return [alert['message'] for alert in alerts]
 
-    except Error as e:
-        if conn:
+        except DatabaseError as e:
             conn.rollback()
-        current_app.logger.error(f"Database error: {e}")
-        raise RuntimeError(f"Failed to process sensor data: {e}")
-    finally:
-        if conn and conn.is_connected():
-            conn.close()
+            alert_tracker.rollback(checkpoint)
+            current_app.logger.error(f"Database error: {e}")
+            raise RuntimeError(f"Failed to process sensor data: {e}")
+
+
+def validate_reading(data):
+    """Check a single reading payload; returns an error message or None."""
+    if not isinstance(data, dict):
+        return "Reading must be a JSON object"
+
+    missing_fields = [field for field in REQUIRED_READING_FIELDS if field not in data]
+    if missing_fields:
+        return f"Missing required fields: {', '.join(missing_fields)}"
+
+    for param in SENSOR_PARAMETERS:
+        value = data[param]
+        # value != value catches NaN, which JSON and packed payloads can both carry
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+            return f"Field {param} must be numeric"
+        # So can +/-Infinity, and neither it nor a double beyond float32 range fits a FLOAT column
+        if math.isinf(value) or abs(value) > FLOAT_MAX:
+            return f"Field {param} must be a finite number"
+
+    zone = data['greenhouse_zone']
+    if not isinstance(zone, str) or not zone:
+        return "Field greenhouse_zone must be a non-empty string"
+    if len(zone) > ZONE_MAX_LENGTH:
+        return f"Field greenhouse_zone must be at most {ZONE_MAX_LENGTH} characters"
+    if not isinstance(data['timestamp'], str) or not data['timestamp']:
+        return "Field timestamp must be a non-empty string"
+    try:
+        moment = datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00'))
+    except ValueError:
+        return "Field timestamp must be an ISO 8601 date and time"
+    # MySQL DATETIME starts at year 1000
+    if moment.year < 1000:
+        return "Field timestamp is out of range"
+    return None
+
+
+def insert_sensor_batch(readings):
+    """Insert validated readings and their alerts in a single transaction.
+
+    Returns the number of alerts triggered for each reading, in order, and
+    the alert transitions (opened/resolved) the batch caused.
+    """
+    with db_connection() as conn:
+        checkpoint = alert_tracker.checkpoint(readings)
+        try:
+            cursor = conn.cursor(dictionary=True)
+
+            write_readings(cursor, readings)
+
+            alerts, transitions = alert_tracker.process(cursor, readings, threshold_cache.get_compiled(cursor))
+            alert_counts = count_by_reading(alerts, len(readings))
+
+            conn.commit()
+            return alert_counts, transitions
+
+        except DatabaseError as e:
+            conn.rollback()
+            alert_tracker.rollback(checkpoint)
+            current_app.logger.error(f"Database error during batch insert: {e}")
+            raise RuntimeError(f"Failed to process sensor batch: {e}") from e
+
+
+def get_latest_readings():
+    """Newest reading of every greenhouse zone, used to prime the latest-reading cache."""
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT r.*
+            FROM sensor_readings r
+            JOIN (
+                SELECT greenhouse_zone, MAX(timestamp) AS latest
+                FROM sensor_readings
+                GROUP BY greenhouse_zone
+            ) m ON r.greenhouse_zone = m.greenhouse_zone AND r.timestamp = m.latest
+        """)
+        return cursor.fetchall()
+
+
+def get_forecast_history():
+    """Hourly averages per zone over the last FORECAST_HISTORY_HOURS, used to prime the forecaster."""
+    start = datetime.now() - timedelta(hours=current_app.config['FORECAST_HISTORY_HOURS'])
+    with db_cursor() as cursor:
+        return get_zone_hours(cursor, start)
 
 
 def simulate_sensor_data():
@@ -146,31 +405,6 @@ def simulate_sensor_data():
     return data
 
 
-def get_historical_data(start_date, end_date):
-    conn = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        query = """
-        SELECT
-            DATE(timestamp) as date,
-            AVG(temperature) as avg_temp,
-            AVG(pressure) as avg_pressure,
-            AVG(light_intensity) as avg_light,
-            AVG(humidity) as avg_humidity,
-            AVG(air_quality) as avg_air_quality,
-            AVG(pH) as avg_ph,
-            AVG(moisture) as avg_moisture
-        FROM sensor_readings
-        WHERE timestamp BETWEEN %s AND %s
-        GROUP BY DATE(timestamp)
-        ORDER BY date DESC
-        """
-
-        cursor.execute(query, (start_date, end_date))
-        return cursor.fetchall()
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
\ No newline at end of file
+def get_historical_data(start_date, end_date, zones=None):
+    with db_cursor() as cursor:
+        return get_daily_averages(cursor, start_date, end_date, zones)
\ No newline at end of file
@@ -0,0 +1,66 @@
+def lttb(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the shape.
+
+    xs must be ascending. Returns all indices when the series is already small enough.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket is the third triangle vertex
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
+
+        ax, ay = xs[a], ys[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        indices.append(best)
+        a = best
+
+    indices.append(n - 1)
+    return indices
+
+
+def minmax(xs, ys, threshold):
+    """Min/max per bucket: indices of the extremes in threshold // 2 equal-width buckets."""
+    n = len(xs)
+    if threshold >= n or threshold < 2:
+        return list(range(n))
+
+    buckets = threshold // 2
+    size = n / buckets
+    indices = []
+    for b in range(buckets):
+        start = int(b * size)
+        end = int((b + 1) * size)
+        if start >= end:
+            continue
+        lo = min(range(start, end), key=ys.__getitem__)
+        hi = max(range(start, end), key=ys.__getitem__)
+        indices.extend(sorted({lo, hi}))
+    return indices
+
+
+METHODS = {'lttb': lttb, 'minmax': minmax}
+
+
+def downsample(xs, ys, threshold, method='lttb'):
+    """Downsample a series with gaps (None values) into columnar (xs, ys)."""
+    points = [(x, y) for x, y in zip(xs, ys) if y is not None]
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    indices = METHODS[method](xs, ys, threshold)
+    return [xs[i] for i in indices], [ys[i] for i in indices]
@@ -0,0 +1,156 @@
+import csv
+import io
+import math
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+from . import storage
+from .alert_engine import PARAMETERS
+from .pubsub import encode
+
+COLUMNS = ('id', 'timestamp') + PARAMETERS + ('greenhouse_zone',)
+COLUMNAR_MAGIC = b'GHCOL1\n'
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+_COUNT = struct.Struct('<I')
+_SHORT = struct.Struct('<H')
+
+
+def export_query(start, end, zones=None):
+    """SQL and parameters for readings in [start, end), oldest first; zones, when not None, limits them."""
+    sql = f"SELECT {', '.join(COLUMNS)} FROM sensor_readings WHERE timestamp >= %s AND timestamp < %s"
+    params = [start, end]
+    if zones is not None:
+        zone_sql, zone_params = storage.in_clause('greenhouse_zone', zones)
+        sql += f" AND {zone_sql}"
+        params.extend(zone_params)
+    return sql + " ORDER BY timestamp, id", tuple(params)
+
+
+def iter_chunks(conn, start, end, zones=None, chunk_size=5000):
+    """Yield lists of row tuples, at most chunk_size at a time.
+
+    The cursor is unbuffered, so mysql-connector streams the result set from
+    the server as fetchmany() asks for it instead of loading it whole; memory
+    stays flat however many months are exported.
+    """
+    cursor = conn.cursor(buffered=False)
+    finished = False
+    try:
+        cursor.execute(*export_query(start, end, zones))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                finished = True
+                return
+            yield rows
+    finally:
+        if not finished and hasattr(conn, 'consume_results'):
+            # An abandoned unbuffered result must be read off the wire before the connection is reused
+            conn.consume_results()
+        cursor.close()
+
+
+def encode_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def encode_ndjson(chunks):
+    for rows in chunks:
+        yield ''.join(encode(dict(zip(COLUMNS, row))) + '\n' for row in rows).encode()
+
+
+def encode_columnar(chunks):
+    """Compact column-major binary, one row group per chunk.
+
+        magic        b'GHCOL1\\n'
+        row group    uint32 row count (0 ends the stream)
+                     id           int64[count]
+                     timestamp    int64[count], microseconds since 1970-01-01 (naive, as stored)
+                     <parameter>  float32[count] for each of PARAMETERS, NaN for NULL
+                     zones        uint16 dictionary size, then per entry uint16 length + UTF-8 bytes
+                     zone index   uint16[count] into that row group's dictionary
+
+    Integers are little-endian. Readings are MySQL FLOAT columns, so float32 holds them exactly.
+    """
+    yield COLUMNAR_MAGIC
+    for rows in chunks:
+        yield _row_group(rows)
+    yield _COUNT.pack(0)
+
+
+def _row_group(rows):
+    parts = [_COUNT.pack(len(rows)),
+             _little_endian(array('q', [row[0] for row in rows])),
+             _little_endian(array('q', [(row[1] - EPOCH) // MICROSECOND for row in rows]))]
+    for column in range(2, 2 + len(PARAMETERS)):
+        parts.append(_little_endian(array('f', [math.nan if row[column] is None else row[column] for row in rows])))
+    dictionary = {}
+    indexes = array('H', [dictionary.setdefault(row[-1] or '', len(dictionary)) for row in rows])
+    parts.append(_SHORT.pack(len(dictionary)))
+    for zone in dictionary:
+        encoded = zone.encode()
+        parts.append(_SHORT.pack(len(encoded)) + encoded)
+    parts.append(_little_endian(indexes))
+    return b''.join(parts)
+
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def read_columnar(stream):
+    """Decode a columnar export from a binary file object; yields one {column: list} per row group."""
+    if stream.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar sensor export")
+    while True:
+        (count,) = _COUNT.unpack(stream.read(_COUNT.size))
+        if not count:
+            return
+        group = {'id': _read_array(stream, 'q', count).tolist(),
+                 'timestamp': [EPOCH + value * MICROSECOND for value in _read_array(stream, 'q', count)]}
+        for param in PARAMETERS:
+            group[param] = [None if math.isnan(value) else value for value in _read_array(stream, 'f', count)]
+        (size,) = _SHORT.unpack(stream.read(_SHORT.size))
+        zones = []
+        for _ in range(size):
+            (length,) = _SHORT.unpack(stream.read(_SHORT.size))
+            zones.append(stream.read(length).decode())
+        group['greenhouse_zone'] = [zones[index] for index in _read_array(stream, 'H', count)]
+        yield group
+
+
+def _read_array(stream, typecode, count):
+    values = array(typecode)
+    values.frombytes(stream.read(values.itemsize * count))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+# format name: (encoder, mimetype, file extension)
+FORMATS = {
+    'csv': (encode_csv, 'text/csv', 'csv'),
+    'ndjson': (encode_ndjson, 'application/x-ndjson', 'ndjson'),
+    'columnar': (encode_columnar, 'application/octet-stream', 'ghcol'),
+}
+
+
+def export_readings(conn, fmt, start, end, zones=None, chunk_size=5000):
+    """Yield the export of [start, end) in format fmt as byte strings, one or so per chunk of rows."""
+    encoder = FORMATS[fmt][0]
+    return encoder(iter_chunks(conn, start, end, zones, chunk_size))
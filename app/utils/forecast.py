@@ -0,0 +1,192 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from math import inf
+
+from .alert_engine import PARAMETERS
+from .alert_lifecycle import reading_time
+
+EPOCH = datetime(1970, 1, 1)
+HOUR = timedelta(hours=1)
+# Forecasts are searched for a range crossing in steps of this many hours
+CROSSING_STEP = 0.25
+
+
+class TrendState:
+    """Exponentially weighted least-squares line through one series, plus an hour-of-day profile of what it misses.
+
+    Times are hours since 1970, stored relative to origin so the sums keep
+    their precision. Weights halve every half_life hours of series time.
+    """
+
+    __slots__ = ('origin', 'last', 'count', 'weight', 'st', 'sv', 'stt', 'stv', 'season')
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.last = origin
+        self.count = 0
+        self.weight = self.st = self.sv = self.stt = self.stv = 0.0
+        self.season = [0.0] * 24
+
+    def add(self, t, value, half_life, season_alpha):
+        if t > self.last:
+            decay = 0.5 ** ((t - self.last) / half_life)
+            self.weight *= decay
+            self.st *= decay
+            self.sv *= decay
+            self.stt *= decay
+            self.stv *= decay
+            self.last = t
+            weight = 1.0
+        else:
+            # Late reading: weigh it as if it had arrived in order
+            weight = 0.5 ** ((self.last - t) / half_life)
+
+        fitted = self.line()
+        if fitted is not None:
+            hour = int(t % 24)
+            residual = value - (fitted[0] + fitted[1] * (t - self.origin))
+            self.season[hour] += season_alpha * (residual - self.season[hour])
+
+        x = t - self.origin
+        self.count += 1
+        self.weight += weight
+        self.st += weight * x
+        self.sv += weight * value
+        self.stt += weight * x * x
+        self.stv += weight * x * value
+        if self.last - self.origin > 4 * half_life:
+            self._move_origin(self.last)
+
+    def line(self):
+        """(value at origin, slope per hour), or None until the series spans two distinct times."""
+        spread = self.weight * self.stt - self.st * self.st
+        if self.weight <= 0.0 or spread <= 1e-9 * self.weight * self.weight:
+            return None
+        slope = (self.weight * self.stv - self.st * self.sv) / spread
+        return (self.sv - slope * self.st) / self.weight, slope
+
+    def predict(self, t, line):
+        return line[0] + line[1] * (t - self.origin) + self.season[int(t % 24)]
+
+    def _move_origin(self, origin):
+        shift = origin - self.origin
+        self.stt -= 2 * shift * self.st - shift * shift * self.weight
+        self.stv -= shift * self.sv
+        self.st -= shift * self.weight
+        self.origin = origin
+
+
+class Forecaster:
+    """Short-horizon forecasts per (greenhouse_zone, parameter) from incrementally maintained trend state.
+
+    update() folds committed readings in, O(1) per reading and parameter,
+    and drops that zone's cached forecasts; a zone's forecasts are otherwise
+    served from memory until its next reading. State is per process: it is
+    primed from the hourly rollups on first use (readings before then are
+    ignored, the rollups already hold them) and, when refresh_interval
+    is set, re-primed once older than that many seconds so every worker
+    converges on the same trend.
+    """
+
+    def __init__(self, half_life=6.0, season_alpha=0.05, refresh_interval=0):
+        self.half_life = half_life
+        self.season_alpha = season_alpha
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._series = {}
+        self._forecasts = {}
+        self._primed_at = None
+
+    def update(self, readings):
+        with self._lock:
+            # Until primed, the rollups written alongside these readings will supply them
+            if self._primed_at is not None:
+                self._fold(readings)
+
+    def forecast(self, loader, zone, compiled, parameters, horizon):
+        """Return {parameter: projection or None} for one zone.
+
+        compiled supplies the zone's min/max (a CompiledThresholds). loader()
+        is only called to prime the state and must return hourly rows of
+        bucket_start, greenhouse_zone and per-parameter averages.
+        """
+        self._ensure_primed(loader)
+        key = (tuple(parameters), horizon, compiled)
+        with self._lock:
+            cached = self._forecasts.get(zone, {}).get(key)
+            if cached is None:
+                cached = {param: self._project(self._series.get((zone, param)), compiled.bounds(param), horizon)
+                          for param in parameters}
+                self._forecasts.setdefault(zone, {})[key] = cached
+        return cached
+
+    def zones(self, loader):
+        """Zones with trend state, priming from loader() first like forecast()."""
+        self._ensure_primed(loader)
+        with self._lock:
+            return sorted({zone for zone, _ in self._series if zone is not None})
+
+    def clear(self):
+        with self._lock:
+            self._series = {}
+            self._forecasts = {}
+            self._primed_at = None
+
+    def _ensure_primed(self, loader):
+        primed_at = self._primed_at
+        if primed_at is not None and (not self.refresh_interval or time.monotonic() - primed_at < self.refresh_interval):
+            return
+        rows = loader()
+        # Hourly averages stand in for the readings of their hour, at its midpoint
+        readings = [dict(row, timestamp=row['bucket_start'] + HOUR / 2) for row in rows]
+        with self._lock:
+            self._series = {}
+            self._forecasts = {}
+            self._fold(readings)
+            self._primed_at = time.monotonic()
+
+    def _fold(self, readings):
+        for reading in readings:
+            zone = reading.get('greenhouse_zone')
+            t = (reading_time(reading) - EPOCH) / HOUR
+            for param in PARAMETERS:
+                value = reading.get(param)
+                if value is None:
+                    continue
+                state = self._series.get((zone, param))
+                if state is None:
+                    state = self._series[(zone, param)] = TrendState(t)
+                state.add(t, float(value), self.half_life, self.season_alpha)
+            self._forecasts.pop(zone, None)
+
+    def _project(self, state, bounds, horizon):
+        line = state.line() if state is not None else None
+        if line is None:
+            return None
+        lo, hi = bounds
+        now = state.last
+        return {
+            'at': (EPOCH + now * HOUR).isoformat(timespec='seconds'),
+            'value': round(state.predict(now, line), 3),
+            'trend_per_hour': round(line[1], 4),
+            'min': None if lo == -inf else lo,
+            'max': None if hi == inf else hi,
+            'hours_to_min': None if lo == -inf else _hours_until(state, line, now, horizon, lambda v: v < lo),
+            'hours_to_max': None if hi == inf else _hours_until(state, line, now, horizon, lambda v: v > hi),
+            'forecast': [{'t': (EPOCH + (now + h) * HOUR).isoformat(timespec='seconds'),
+                          'v': round(state.predict(now + h, line), 3)} for h in range(1, horizon + 1)],
+            'samples': state.count,
+        }
+
+
+def _hours_until(state, line, now, horizon, crossed):
+    """First forecast step at which crossed(value) holds, in hours from now; None if not within horizon."""
+    steps = int(horizon / CROSSING_STEP)
+    for step in range(steps + 1):
+        if crossed(state.predict(now + step * CROSSING_STEP, line)):
+            return step * CROSSING_STEP
+    return None
+
+
+forecaster = Forecaster()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import threading
+import time
+from decimal import Decimal
+
+from .alert_engine import PARAMETERS
+from .alert_lifecycle import reading_time
+
+CACHED_FIELDS = ('greenhouse_zone', 'timestamp') + PARAMETERS
+
+
+class LatestReadingCache:
+    """Most recent reading per greenhouse_zone, kept current by the ingest path.
+
+    Each entry carries a content-derived ETag, so the same reading yields the
+    same ETag in every worker. With more than one worker process, set
+    refresh_interval so entries are re-read from the database once they are
+    older than that many seconds; 0 trusts in-process ingest alone.
+    """
+
+    def __init__(self, refresh_interval=0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._by_zone = {}
+        self._loaded_at = None
+
+    def update(self, readings):
+        """Record ingested readings, keeping the newest per zone; returns the normalised entries."""
+        entries = [_entry(reading) for reading in readings]
+        with self._lock:
+            for entry in entries:
+                current = self._by_zone.get(entry['greenhouse_zone'])
+                if current is None or entry['timestamp'] >= current[0]['timestamp']:
+                    self._by_zone[entry['greenhouse_zone']] = (entry, _etag(entry))
+        return entries
+
+    def get(self, loader, zone=None, zones=None):
+        """Return (reading, etag) for a zone, or the newest reading of any zone.
+
+        zones, when not None, limits the lookup to those zones (e.g. one
+        greenhouse's). loader() is only called to prime the cache or refresh
+        stale entries and must return the latest row per zone.
+        """
+        self._ensure_fresh(loader)
+        with self._lock:
+            if zone is not None:
+                if zones is not None and zone not in zones:
+                    return {}, _etag({})
+                return self._by_zone.get(zone, ({}, _etag({})))
+            candidates = self._by_zone.values() if zones is None else \
+                [self._by_zone[z] for z in zones if z in self._by_zone]
+            if not candidates:
+                return {}, _etag({})
+            return max(candidates, key=lambda item: item[0]['timestamp'])
+
+    def get_all(self, loader, zones=None):
+        """Return ({zone: reading}, etag) across every zone, or only those in zones."""
+        self._ensure_fresh(loader)
+        with self._lock:
+            items = [(zone, item) for zone, item in self._by_zone.items() if zones is None or zone in zones]
+        return {zone: entry for zone, (entry, _) in items}, _etag({zone: tag for zone, (_, tag) in items})
+
+    def clear(self):
+        with self._lock:
+            self._by_zone = {}
+            self._loaded_at = None
+
+    def _ensure_fresh(self, loader):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and (not self.refresh_interval or time.monotonic() - loaded_at < self.refresh_interval):
+            return
+        rows = loader()
+        self.update(rows)
+        self._loaded_at = time.monotonic()
+
+
+def _entry(reading):
+    entry = {field: reading.get(field) for field in CACHED_FIELDS}
+    entry['timestamp'] = reading_time(reading)
+    for param in PARAMETERS:
+        if isinstance(entry[param], Decimal):
+            entry[param] = float(entry[param])
+    return entry
+
+
+def _etag(entry):
+    return hashlib.sha1(json.dumps(entry, sort_keys=True, default=str).encode()).hexdigest()
+
+
+latest_cache = LatestReadingCache()
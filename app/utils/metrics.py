@@ -0,0 +1,217 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+
+MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; HTTP and SMS latencies use Prometheus' default buckets, queries start finer
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    """Monotonic totals per label combination."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name, tuple(zip(self.labels, labels)), value
+
+
+class Histogram:
+    """Fixed-bucket latency distribution per label combination.
+
+    observe() is a bisect and three increments under a lock; buckets are
+    only made cumulative when the metrics are rendered.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *labels):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in series:
+            pairs = tuple(zip(self.labels, labels))
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                yield f"{self.name}_bucket", pairs + (('le', _number(bound)),), running
+            running += counts[-1]
+            yield f"{self.name}_bucket", pairs + (('le', '+Inf'),), running
+            yield f"{self.name}_sum", pairs, total
+            yield f"{self.name}_count", pairs, running
+
+
+class Registry:
+    """Metric families plus collectors that read existing stats (pool, queues) at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect):
+        """Register collect(), yielding (name, type, help, value) samples; usable as a decorator."""
+        self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, labels, value in metric.samples():
+                lines.append(f"{sample}{_labels(labels)} {_number(value)}")
+        for collect in self._collectors:
+            for name, kind, help, value in collect():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    'greenhouse_http_request_duration_seconds', 'Time from before_request to after_request per route.',
+    ('endpoint', 'method', 'status'))
+db_query_seconds = registry.histogram(
+    'greenhouse_db_query_duration_seconds', 'Time in cursor.execute()/executemany() per statement name.',
+    ('statement',), QUERY_BUCKETS)
+db_checkout_seconds = registry.histogram(
+    'greenhouse_db_pool_checkout_seconds', 'Time to borrow a pooled connection, including queueing and ping.',
+    (), QUERY_BUCKETS)
+readings_ingested = registry.counter(
+    'greenhouse_readings_ingested_total', 'Sensor readings committed, per zone.', ('zone',))
+alert_transitions = registry.counter(
+    'greenhouse_alert_transitions_total', 'Alerts opened and resolved, per sensor type.', ('event', 'sensor_type'))
+sms_send_seconds = registry.histogram(
+    'greenhouse_sms_send_duration_seconds', 'Time per Twilio send attempt.', ('outcome',))
+
+
+_STATEMENT = re.compile(r'^\W*(?:(UPDATE)|(\w+).*?\b(?:FROM|INTO|JOIN|TABLE))\s+`?(\w+)', re.IGNORECASE | re.DOTALL)
+_statement_names = {}
+_MAX_STATEMENT_NAMES = 4096
+
+
+def statement_name(sql):
+    """Short name for a query, its verb and first table ('select_sensor_readings'), so the label stays low-cardinality."""
+    name = _statement_names.get(sql)
+    if name is None:
+        match = _STATEMENT.match(sql)
+        if match:
+            name = f"{match.group(1) or match.group(2)}_{match.group(3)}".lower()
+        else:
+            name = (sql.split(None, 1) or ['empty'])[0].lower()
+        if len(_statement_names) >= _MAX_STATEMENT_NAMES:
+            _statement_names.clear()
+        _statement_names[sql] = name
+    return name
+
+
+class TimedCursor:
+    """Cursor proxy that records each execute() in db_query_seconds; everything else passes through."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, sql, params=None):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            db_query_seconds.observe(time.perf_counter() - start, statement_name(sql))
+
+    def executemany(self, sql, seq_params):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_params)
+        finally:
+            db_query_seconds.observe(time.perf_counter() - start, statement_name(sql))
+
+
+def init_app(app):
+    """Time every request; registered before the login check so redirects are measured too."""
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+
+
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+
+def _record_request(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        # Streamed responses (SSE, exports) are timed to their first byte
+        http_request_seconds.observe(time.perf_counter() - start, request.endpoint or 'unmatched',
+                                     request.method, str(response.status_code))
+    return response
@@ -0,0 +1,187 @@
+import os
+import re
+from datetime import datetime, timedelta
+
+from .alerts_utils import count_alerts, list_alerts
+from .db_utils import load_access
+from .export import export_query
+from .rollups import get_daily_averages, get_series
+
+MIGRATIONS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'migrations'))
+
+_FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+_LOCK_NAME = 'greenhouse_schema_migrations'
+
+# Tables small enough that a full scan is the right plan
+SMALL_TABLES = {'optimal_ranges', 'settings_versions', 'alert_counts', 'greenhouses', 'schema_migrations',
+                'greenhouse_zones', 'greenhouse_ranges', 'zone_ranges'}
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Return [(version, name, path)] for every migration file, oldest first."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def split_statements(sql):
+    """Split a migration file into statements, dropping -- comments."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """)
+
+
+def applied_versions(cursor):
+    ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] if isinstance(row, tuple) else row['version'] for row in cursor.fetchall()}
+
+
+def pending(cursor, directory=MIGRATIONS_DIR):
+    applied = applied_versions(cursor)
+    return [migration for migration in discover(directory) if migration[0] not in applied]
+
+
+def record(cursor, version, name):
+    cursor.execute(
+        "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, %s)",
+        (version, name, datetime.now())
+    )
+
+
+def migrate(conn, directory=MIGRATIONS_DIR, target=None, log=None):
+    """Apply pending migrations in version order; returns the versions applied.
+
+    MySQL commits DDL implicitly, so each file is recorded as soon as it
+    succeeds and a failure leaves the earlier files applied. A named lock
+    keeps several workers starting together from racing each other.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, 60)", (_LOCK_NAME,))
+    if cursor.fetchone()[0] != 1:
+        raise RuntimeError("Timed out waiting for the schema migration lock")
+    applied = []
+    try:
+        for version, name, path in pending(cursor, directory):
+            if target is not None and version > target:
+                break
+            with open(path) as f:
+                statements = split_statements(f.read())
+            for statement in statements:
+                cursor.execute(statement)
+            record(cursor, version, name)
+            conn.commit()
+            applied.append(version)
+            if log:
+                log(f"Applied migration {version:03d}_{name}")
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+        cursor.fetchone()
+    return applied
+
+
+def mark_applied(conn, version, directory=MIGRATIONS_DIR):
+    """Record a migration as applied without running it, for schemas changed by hand."""
+    names = {v: name for v, name, _ in discover(directory)}
+    if version not in names:
+        raise ValueError(f"No migration with version {version}")
+    cursor = conn.cursor()
+    if version not in applied_versions(cursor):
+        record(cursor, version, names[version])
+        conn.commit()
+
+
+def _hot_queries():
+    """The queries behind the busiest pages, with representative arguments.
+
+    Where a query lives in a helper, the helper is run against a recording
+    cursor so the check explains the SQL the app actually sends.
+    """
+    now = datetime.now().replace(microsecond=0)
+    week_ago = now - timedelta(days=7)
+    return {
+        'latest_per_zone': lambda c: c.execute("""
+            SELECT r.* FROM sensor_readings r
+            JOIN (
+                SELECT greenhouse_zone, MAX(timestamp) AS max_ts
+                FROM sensor_readings GROUP BY greenhouse_zone
+            ) latest ON r.greenhouse_zone = latest.greenhouse_zone AND r.timestamp = latest.max_ts
+        """),
+        'readings_range': lambda c: c.execute(
+            "SELECT * FROM sensor_readings WHERE timestamp >= %s AND timestamp < %s", (week_ago, now)),
+        'readings_zone_range': lambda c: c.execute(
+            "SELECT * FROM sensor_readings WHERE greenhouse_zone = %s AND timestamp >= %s AND timestamp < %s",
+            ('Zone A', week_ago, now)),
+        'export_range': lambda c: c.execute(*export_query(week_ago, now)),
+        'export_zones': lambda c: c.execute(*export_query(week_ago, now, ['Zone A', 'Zone B'])),
+        'daily_averages': lambda c: get_daily_averages(c, week_ago, now),
+        'daily_averages_greenhouse': lambda c: get_daily_averages(c, week_ago, now, ['Zone A', 'Zone B']),
+        'series_hour': lambda c: get_series(c, 'hour', week_ago, now, ['temperature']),
+        'series_minute_zone': lambda c: get_series(c, 'minute', week_ago, now, ['temperature'], 'Zone A'),
+        'alerts_open': lambda c: list_alerts(c, limit=10),
+        'alerts_zone': lambda c: list_alerts(c, limit=10, zone='Zone A'),
+        'alerts_greenhouse': lambda c: list_alerts(c, limit=10, zones=['Zone A', 'Zone B']),
+        'alerts_sensor': lambda c: list_alerts(c, limit=10, sensor_type='temperature'),
+        'alerts_count_all': lambda c: count_alerts(c, status='Resolved'),
+        'login_lookup': lambda c: c.execute(
+            "SELECT id FROM users WHERE username = %s OR email = %s OR phone_number = %s", ('a', 'a', 'a')),
+        'manager_numbers': lambda c: c.execute("SELECT phone_number FROM users WHERE role = 'Manager'"),
+        'greenhouse_assignments': lambda c: c.execute(
+            "SELECT employee_id FROM employee_assignments WHERE greenhouse_id = %s", (1,)),
+        'employee_access': lambda c: load_access(c, 1, 'Employee'),
+    }
+
+
+class _RecordingCursor:
+    """Captures statements instead of running them; results are always empty."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+    def fetchone(self):
+        return None
+
+
+def check_query_plans(conn, queries=None):
+    """EXPLAIN each hot query; returns {name: [problem, ...]} for full table scans."""
+    queries = queries or _hot_queries()
+    cursor = conn.cursor(dictionary=True)
+    problems = {}
+    for name, run in queries.items():
+        recorder = _RecordingCursor()
+        try:
+            run(recorder)
+        except (TypeError, KeyError):
+            # Query functions that post-process results stop early on empty rows
+            pass
+        for sql, params in recorder.statements:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            for row in cursor.fetchall():
+                table = row.get('table') or ''
+                if row.get('type') == 'ALL' and not table.startswith('<') and table not in SMALL_TABLES:
+                    problems.setdefault(name, []).append(
+                        f"full scan of {table} (~{row.get('rows')} rows, possible keys: {row.get('possible_keys')})"
+                    )
+    return problems
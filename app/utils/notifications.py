@@ -0,0 +1,183 @@
+import logging
+import queue
+import threading
+import time
+
+from .db_utils import db_cursor
+from .metrics import sms_send_seconds
+
+logger = logging.getLogger(__name__)
+
+SMS_MAX_LENGTH = 1600
+_STOP = object()
+
+
+def load_manager_numbers():
+    """Phone numbers of every Manager, the recipients of alert SMS."""
+    with db_cursor() as cursor:
+        cursor.execute("SELECT phone_number FROM users WHERE role = 'Manager'")
+        return [row['phone_number'] for row in cursor.fetchall() if row['phone_number']]
+
+
+def build_digest(messages):
+    """Fold alerts that arrived together into one SMS body."""
+    if len(messages) == 1:
+        body = f"🚨 ALERT: {messages[0]}"
+    else:
+        body = f"🚨 {len(messages)} ALERTS: " + "; ".join(messages)
+    if len(body) > SMS_MAX_LENGTH:
+        body = body[:SMS_MAX_LENGTH - 3] + '...'
+    return body
+
+
+class RateLimiter:
+    """Token bucket shared by all send workers."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SmsDispatcher:
+    """Background alert SMS delivery.
+
+    enqueue() only puts the message on a queue. A coalescer thread collects
+    alerts arriving within coalesce_window seconds into one digest per
+    manager, and a pool of workers sends them through the Twilio client,
+    rate limited and retried with exponential backoff.
+    """
+
+    def __init__(self, client, from_number, recipients_loader, workers=2, coalesce_window=30.0,
+                 rate_limit=1.0, max_retries=3, backoff=1.0, recipient_ttl=300, max_queue=1000):
+        self.client = client
+        self.from_number = from_number
+        self.recipients_loader = recipients_loader
+        self.workers = workers
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.recipient_ttl = recipient_ttl
+        self.limiter = RateLimiter(rate_limit)
+        self.stats = {'enqueued': 0, 'dropped': 0, 'sent': 0, 'failed': 0, 'retried': 0}
+
+        self._alerts = queue.Queue(maxsize=max_queue)
+        self._sends = queue.Queue()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._recipients = None
+        self._recipients_loaded_at = 0.0
+
+    @property
+    def enabled(self):
+        return self.client is not None
+
+    def enqueue(self, message):
+        """Queue an alert for delivery; never blocks the caller."""
+        if not self.enabled:
+            return False
+        self.start()
+        try:
+            self._alerts.put_nowait(message)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            logger.warning(f"SMS queue full, dropping alert: {message}")
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    def start(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            self._threads.append(threading.Thread(target=self._coalesce_loop, name='sms-coalescer', daemon=True))
+            for i in range(self.workers):
+                self._threads.append(threading.Thread(target=self._send_loop, name=f'sms-worker-{i}', daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=10):
+        """Flush queued alerts and stop the threads."""
+        with self._start_lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        self._alerts.put(_STOP)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _coalesce_loop(self):
+        while True:
+            first = self._alerts.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self.coalesce_window
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    message = self._alerts.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if message is _STOP:
+                    stopping = True
+                    break
+                batch.append(message)
+            self._dispatch(batch)
+            if stopping:
+                break
+        for _ in range(self.workers):
+            self._sends.put(_STOP)
+
+    def _dispatch(self, messages):
+        body = build_digest(messages)
+        for number in self._get_recipients():
+            self._sends.put((number, body))
+
+    def _get_recipients(self):
+        if self._recipients is None or time.monotonic() - self._recipients_loaded_at >= self.recipient_ttl:
+            try:
+                self._recipients = self.recipients_loader()
+                self._recipients_loaded_at = time.monotonic()
+            except Exception as e:
+                logger.error(f"Failed to load SMS recipients: {e}")
+        return self._recipients or []
+
+    def _send_loop(self):
+        while True:
+            job = self._sends.get()
+            if job is _STOP:
+                break
+            self._send(*job)
+
+    def _send(self, to, body):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                self.client.messages.create(body=body, from_=self.from_number, to=to)
+                sms_send_seconds.observe(time.perf_counter() - start, 'sent')
+                self.stats['sent'] += 1
+                return True
+            except Exception as e:
+                sms_send_seconds.observe(time.perf_counter() - start, 'error')
+                if attempt == self.max_retries:
+                    self.stats['failed'] += 1
+                    logger.error(f"Twilio SMS to {to} failed after {attempt + 1} attempts: {e}")
+                    return False
+                self.stats['retried'] += 1
+                time.sleep(self.backoff * 2 ** attempt)
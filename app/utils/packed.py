@@ -0,0 +1,81 @@
+import struct
+from datetime import datetime, timedelta
+
+from .alert_engine import PARAMETERS
+
+MIMETYPE = 'application/vnd.greenhouse.readings'
+MAGIC = b'GR'
+VERSION = 1
+
+# magic, version, zone count, reading count
+HEADER = struct.Struct('<2sBBI')
+# epoch milliseconds (UTC), one float32 per parameter in PARAMETERS order, zone index
+RECORD = struct.Struct('<q' + 'f' * len(PARAMETERS) + 'B')
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_packed(readings):
+    """Pack readings into the fixed-layout batch format; the gateway side of decode_packed()."""
+    zones = {}
+    records = []
+    for reading in readings:
+        moment = reading['timestamp']
+        if isinstance(moment, str):
+            moment = datetime.fromisoformat(moment.replace('Z', '+00:00'))
+        millis = (moment.replace(tzinfo=None) - EPOCH) // timedelta(milliseconds=1)
+        zone = zones.setdefault(reading['greenhouse_zone'], len(zones))
+        records.append(RECORD.pack(millis, *(reading[param] for param in PARAMETERS), zone))
+    if len(zones) > 255:
+        raise ValueError("A packed batch can name at most 255 zones")
+    table = b''.join(bytes([len(name.encode())]) + name.encode() for name in zones)
+    return HEADER.pack(MAGIC, VERSION, len(zones), len(records)) + table + b''.join(records)
+
+
+def decode_packed(body):
+    """Unpack a batch into the same reading dicts the JSON endpoints produce.
+
+    Layout, little-endian: header (b'GR', version 1, uint8 zone count, uint32
+    reading count); the zone table, one uint8 length + UTF-8 name each; then
+    fixed 37-byte records: int64 epoch milliseconds, float32 per parameter
+    (NaN for a missing value, which validation rejects), uint8 zone index.
+    Records are unpacked straight out of the request buffer through a
+    memoryview, without copying it. Raises ValueError when the body does not
+    match the layout.
+    """
+    view = memoryview(body)
+    if len(view) < HEADER.size:
+        raise ValueError("Packed body is shorter than its header")
+    magic, version, zone_count, count = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version 1 packed sensor batch")
+
+    offset = HEADER.size
+    zones = []
+    for _ in range(zone_count):
+        if offset >= len(view):
+            raise ValueError("Packed zone table is truncated")
+        length = view[offset]
+        zones.append(str(view[offset + 1:offset + 1 + length], 'utf-8'))
+        offset += 1 + length
+    if len(view) - offset != count * RECORD.size:
+        raise ValueError(f"Expected {count} packed readings of {RECORD.size} bytes")
+
+    readings = []
+    minutes = {}
+    try:
+        for record in RECORD.iter_unpack(view[offset:]):
+            reading = dict(zip(PARAMETERS, record[1:-1]))
+            # Gateways send readings close together, so most share a formatted minute
+            seconds, millis = divmod(record[0], 1000)
+            minute, second = divmod(seconds, 60)
+            prefix = minutes.get(minute)
+            if prefix is None:
+                prefix = minutes[minute] = (EPOCH + timedelta(minutes=minute)).isoformat(timespec='minutes')
+            reading['timestamp'] = f"{prefix}:{second:02d}.{millis:03d}"
+            reading['greenhouse_zone'] = zones[record[-1]]
+            readings.append(reading)
+    except IndexError:
+        raise ValueError(f"Reading {len(readings)} names a zone outside the zone table")
+    except OverflowError:
+        raise ValueError(f"Reading {len(readings)} has a timestamp outside the supported dates")
+    return readings
@@ -0,0 +1,152 @@
+import csv
+import gzip
+import os
+from datetime import datetime, timedelta
+
+from .rollups import rebuild_rollups
+
+TABLE = 'sensor_readings'
+FUTURE_PARTITION = 'p_future'
+
+ARCHIVE_BATCH = 5000
+
+
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(moment, months):
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def list_partitions(cursor):
+    """[(name, upper_bound)] of sensor_readings partitions, oldest first; p_future has no bound."""
+    cursor.execute("""
+        SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (TABLE,))
+    return [(row['name'], _parse_bound(row['bound'])) for row in cursor.fetchall()]
+
+
+def _parse_bound(description):
+    value = description.strip("'")
+    if value == 'MAXVALUE':
+        return None
+    return datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S' if len(value) > 10 else '%Y-%m-%d')
+
+
+def ensure_partitions(cursor, now, months_ahead=3):
+    """Split monthly partitions off p_future through months_ahead months past now.
+
+    p_future should stay empty so the split is a metadata change; on the first
+    run it starts at the oldest reading's month and moves existing rows once.
+    Returns the names of the partitions created.
+    """
+    partitions = list_partitions(cursor)
+    bounds = [bound for _, bound in partitions if bound is not None]
+    if bounds:
+        first = bounds[-1]
+    else:
+        cursor.execute(f"SELECT MIN(timestamp) AS oldest FROM {TABLE}")
+        oldest = cursor.fetchone()['oldest']
+        first = month_start(oldest or now)
+
+    last = add_months(month_start(now), months_ahead + 1)
+    months = []
+    month = first
+    while month < last:
+        months.append(month)
+        month = add_months(month, 1)
+    if not months:
+        return []
+
+    definitions = [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}')"
+        for month in months
+    ]
+    definitions.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    cursor.execute(
+        f"ALTER TABLE {TABLE} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({', '.join(definitions)})"
+    )
+    return [partition_name(month) for month in months]
+
+
+def expired_partitions(cursor, now, retention_months):
+    """[(name, start, end)] of monthly partitions that end before the retention cutoff."""
+    cutoff = add_months(month_start(now), -retention_months)
+    expired = []
+    for name, bound in list_partitions(cursor):
+        if bound is None or bound > cutoff:
+            break
+        expired.append((name, add_months(bound, -1), bound))
+    return expired
+
+
+def rollups_complete(cursor, name, start, end):
+    """True when the day rollups over [start, end) account for every row in the partition."""
+    cursor.execute(f"SELECT COUNT(*) AS total FROM {TABLE} PARTITION ({name})")
+    raw = cursor.fetchone()['total']
+    cursor.execute("""
+        SELECT COALESCE(SUM(reading_count), 0) AS total FROM sensor_rollup_day
+        WHERE bucket_start >= %s AND bucket_start < %s
+    """, (start, end))
+    return int(cursor.fetchone()['total']) == raw
+
+
+def archive_partition(conn, name, archive_dir):
+    """Stream a partition's rows into archive_dir/sensor_readings_<name>.csv.gz; returns (path, rows).
+
+    The file is written under a temporary name and renamed once complete, so
+    a partially written archive is never mistaken for a finished one.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{TABLE}_{name}.csv.gz")
+    partial = path + '.part'
+    cursor = conn.cursor()
+    rows = 0
+    try:
+        cursor.execute(f"SELECT * FROM {TABLE} PARTITION ({name}) ORDER BY timestamp")
+        with gzip.open(partial, 'wt', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(cursor.column_names)
+            while True:
+                batch = cursor.fetchmany(ARCHIVE_BATCH)
+                if not batch:
+                    break
+                writer.writerows(batch)
+                rows += len(batch)
+    finally:
+        cursor.close()
+    os.replace(partial, path)
+    return path, rows
+
+
+def apply_retention(conn, now, retention_months, archive_dir=None, log=None):
+    """Roll up, archive (when archive_dir is set) and drop partitions past retention.
+
+    Returns the names of the dropped partitions.
+    """
+    cursor = conn.cursor(dictionary=True)
+    dropped = []
+    for name, start, end in expired_partitions(cursor, now, retention_months):
+        if not rollups_complete(cursor, name, start, end):
+            rebuild_rollups(cursor, start, end - timedelta(days=1))
+            conn.commit()
+            if log:
+                log(f"Rebuilt rollups for {name} before archiving")
+        if archive_dir:
+            path, rows = archive_partition(conn, name, archive_dir)
+            if log:
+                log(f"Archived {rows} readings from {name} to {path}")
+        cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {name}")
+        dropped.append(name)
+        if log:
+            log(f"Dropped partition {name}")
+    return dropped
@@ -0,0 +1,133 @@
+import threading
+import time
+
+from .storage import DatabaseError
+
+
+class PoolTimeout(RuntimeError):
+    """No connection came free within the checkout timeout."""
+
+
+class PooledConnection:
+    """A borrowed connection that returns its pool slot exactly once, however often it is closed."""
+
+    def __init__(self, conn, pool):
+        self._conn = conn
+        self._pool = pool
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def is_connected(self):
+        return not self._closed and self._conn.is_connected()
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        wrap = self._pool.wrap_cursor
+        return cursor if wrap is None else wrap(cursor)
+
+    def commit(self):
+        self._conn.commit()
+        self._pool.record_commit()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._conn.close()
+        except DatabaseError:
+            # A broken connection still goes back to the pool; the next borrower's ping repairs it
+            pass
+        finally:
+            self._pool.release()
+
+
+class InstrumentedPool:
+    """Bounded checkout over a storage backend's connections, with timing and health checks.
+
+    mysql-connector fails immediately when its pool is empty; here borrowers
+    queue for up to checkout_timeout seconds instead, and each borrowed
+    connection is pinged (reconnecting if needed) when ping_on_borrow is set.
+    wrap_cursor, when set, is applied to every cursor a borrowed connection
+    opens (query timing).
+    """
+
+    def __init__(self, pool, size, checkout_timeout=5, ping_on_borrow=True, wrap_cursor=None):
+        self.pool = pool
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.ping_on_borrow = ping_on_borrow
+        self.wrap_cursor = wrap_cursor
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._stats = {
+            'checkouts': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'waited': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'exhausted': 0,
+            'health_check_failures': 0,
+            'commits': 0,
+        }
+
+    def get_connection(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            if not self._slots.acquire(timeout=self.checkout_timeout):
+                with self._lock:
+                    self._stats['exhausted'] += 1
+                raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s")
+            self._record_wait(time.perf_counter() - start)
+        try:
+            conn = self._borrow()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._stats['in_use'])
+        return PooledConnection(conn, self)
+
+    def release(self):
+        with self._lock:
+            self._stats['in_use'] -= 1
+        self._slots.release()
+
+    def record_commit(self):
+        with self._lock:
+            self._stats['commits'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = self.size
+        stats['available'] = self.size - stats['in_use']
+        stats['wait_seconds_avg'] = stats['wait_seconds_total'] / stats['waited'] if stats['waited'] else 0.0
+        return stats
+
+    def _record_wait(self, waited):
+        with self._lock:
+            self._stats['waited'] += 1
+            self._stats['wait_seconds_total'] += waited
+            self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+
+    def _borrow(self):
+        conn = self.pool.get_connection()
+        if not self.ping_on_borrow:
+            return conn
+        try:
+            conn.ping(reconnect=True, attempts=2, delay=0)
+        except DatabaseError:
+            with self._lock:
+                self._stats['health_check_failures'] += 1
+            try:
+                conn.close()
+            except DatabaseError:
+                pass
+            raise
+        return conn
@@ -0,0 +1,88 @@
+import json
+import queue
+import threading
+from datetime import date
+from decimal import Decimal
+
+
+class Subscription:
+    """One subscriber's bounded event queue, optionally filtered to a set of zones."""
+
+    def __init__(self, zones=None, max_queue=100):
+        # None subscribes to every zone; an empty collection to none
+        self.zones = set(zones) if zones is not None else None
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def wants(self, zone):
+        return self.zones is None or zone is None or zone in self.zones
+
+    def put(self, event):
+        # A slow client loses its oldest events rather than stalling publishers
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Next (event, data) pair, or None after timeout."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker:
+    """In-process publish/subscribe fan-out for ingest events.
+
+    Only subscribers in the same process see an event, so the stream endpoint
+    must be served by the process that ingests.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, zones=None):
+        subscription = Subscription(zones, self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, data, zone=None):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if subscription.wants(zone):
+                subscription.put((event, data))
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+def encode(data):
+    """Serialise event data once, before it is fanned out to every subscriber."""
+    return json.dumps(data, default=_json_default)
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+broker = Broker()
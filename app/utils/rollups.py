@@ -0,0 +1,202 @@
+from datetime import timedelta
+
+from . import storage
+from .alert_engine import PARAMETERS
+from .alert_lifecycle import reading_time
+
+ROLLUP_TABLES = {
+    'minute': 'sensor_rollup_minute',
+    'hour': 'sensor_rollup_hour',
+    'day': 'sensor_rollup_day',
+}
+
+BUCKET_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Bucket expression over raw sensor_readings.timestamp, for rebuilds
+_BUCKET_SQL = {
+    'minute': "DATE_FORMAT(timestamp, '%%Y-%%m-%%d %%H:%%i:00')",
+    'hour': "DATE_FORMAT(timestamp, '%%Y-%%m-%%d %%H:00:00')",
+    'day': "DATE_FORMAT(timestamp, '%%Y-%%m-%%d 00:00:00')",
+}
+
+_COLUMNS = ['reading_count'] + [
+    f"{param}_{stat}" for param in PARAMETERS for stat in ('count', 'sum', 'min', 'max')
+]
+
+
+def _merge_sql(column, dialect):
+    new = dialect.inserted(column)
+    if column.endswith('_min'):
+        return f"{column} = LEAST(COALESCE({column}, {new}), COALESCE({new}, {column}))"
+    if column.endswith('_max'):
+        return f"{column} = GREATEST(COALESCE({column}, {new}), COALESCE({new}, {column}))"
+    return f"{column} = {column} + {new}"
+
+
+_upsert_sql = {}
+
+
+def upsert_sql(granularity):
+    """Statement merging pre-aggregated rows into a rollup table, for the current dialect."""
+    dialect = storage.dialect
+    key = (dialect.name, granularity)
+    if key not in _upsert_sql:
+        _upsert_sql[key] = f"""
+            INSERT INTO {ROLLUP_TABLES[granularity]} (bucket_start, greenhouse_zone, {', '.join(_COLUMNS)})
+            VALUES ({', '.join(['%s'] * (len(_COLUMNS) + 2))})
+            {dialect.upsert(['bucket_start', 'greenhouse_zone'])} {', '.join(_merge_sql(column, dialect) for column in _COLUMNS)}
+        """
+    return _upsert_sql[key]
+
+
+def bucket_start(moment, granularity):
+    if granularity == 'minute':
+        return moment.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate(readings):
+    """Pre-aggregate readings into {(granularity, bucket_start, zone): row values}."""
+    buckets = {}
+    for reading in readings:
+        moment = reading_time(reading)
+        zone = reading.get('greenhouse_zone')
+        for granularity in ROLLUP_TABLES:
+            key = (granularity, bucket_start(moment, granularity), zone)
+            agg = buckets.get(key)
+            if agg is None:
+                agg = buckets[key] = {'reading_count': 0}
+            agg['reading_count'] += 1
+            for param in PARAMETERS:
+                value = reading.get(param)
+                if value is None:
+                    continue
+                if f"{param}_count" not in agg:
+                    agg[f"{param}_count"] = 1
+                    agg[f"{param}_sum"] = value
+                    agg[f"{param}_min"] = value
+                    agg[f"{param}_max"] = value
+                else:
+                    agg[f"{param}_count"] += 1
+                    agg[f"{param}_sum"] += value
+                    agg[f"{param}_min"] = min(agg[f"{param}_min"], value)
+                    agg[f"{param}_max"] = max(agg[f"{param}_max"], value)
+    return buckets
+
+
+def apply_rollups(cursor, readings):
+    """Fold a batch of readings into the rollup tables, one upsert per table.
+
+    Rows go out in unique-key order (bucket_start, greenhouse_zone), and the
+    tables always in the same order, so concurrent batches that share buckets
+    lock them in the same sequence instead of deadlocking.
+    """
+    rows = {granularity: [] for granularity in ROLLUP_TABLES}
+    for (granularity, bucket, zone), agg in aggregate(readings).items():
+        rows[granularity].append(
+            (bucket, zone) + tuple(agg.get(column, 0 if column.endswith(('_count', '_sum')) else None)
+                                   for column in _COLUMNS)
+        )
+    for granularity, values in rows.items():
+        if values:
+            values.sort(key=lambda row: (row[0], row[1]))
+            cursor.executemany(upsert_sql(granularity), values)
+
+
+def rebuild_rollups(cursor, start, end):
+    """Recompute the rollups for the days start..end (inclusive) from sensor_readings.
+
+    Used by the compaction job to backfill history or when ingest-time
+    rollups are disabled.
+    """
+    start = bucket_start(start, 'day')
+    end = bucket_start(end, 'day') + timedelta(days=1)
+    aggregates = ', '.join(
+        f"COUNT({p}), SUM({p}), MIN({p}), MAX({p})" for p in PARAMETERS
+    )
+    for granularity, table in ROLLUP_TABLES.items():
+        cursor.execute(f"DELETE FROM {table} WHERE bucket_start >= %s AND bucket_start < %s", (start, end))
+        cursor.execute(f"""
+            INSERT INTO {table} (bucket_start, greenhouse_zone, {', '.join(_COLUMNS)})
+            SELECT {_BUCKET_SQL[granularity]} AS bucket, greenhouse_zone, COUNT(*), {aggregates}
+            FROM sensor_readings
+            WHERE timestamp >= %s AND timestamp < %s
+            GROUP BY bucket, greenhouse_zone
+        """, (start, end))
+
+
+def get_daily_averages(cursor, start_date, end_date, zones=None):
+    """Daily averages across zones for /history, read from sensor_rollup_day.
+
+    zones, when not None, limits the averages to those zones (e.g. one
+    greenhouse's); each is a range of the (greenhouse_zone, bucket_start) index.
+    """
+    query = """
+        SELECT
+            DATE(bucket_start) as date,
+            SUM(temperature_sum) / SUM(temperature_count) as avg_temp,
+            SUM(pressure_sum) / SUM(pressure_count) as avg_pressure,
+            SUM(light_intensity_sum) / SUM(light_intensity_count) as avg_light,
+            SUM(humidity_sum) / SUM(humidity_count) as avg_humidity,
+            SUM(air_quality_sum) / SUM(air_quality_count) as avg_air_quality,
+            SUM(pH_sum) / SUM(pH_count) as avg_ph,
+            SUM(moisture_sum) / SUM(moisture_count) as avg_moisture
+        FROM sensor_rollup_day
+        WHERE bucket_start BETWEEN %s AND %s
+    """
+    params = [start_date, end_date]
+    if zones is not None:
+        zone_sql, zone_params = storage.in_clause('greenhouse_zone', zones)
+        query += f" AND {zone_sql}"
+        params.extend(zone_params)
+    query += " GROUP BY bucket_start ORDER BY date DESC"
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+def choose_granularity(start, end, max_buckets):
+    """Finest rollup whose bucket count over [start, end) stays within max_buckets."""
+    span = (end - start).total_seconds()
+    for granularity in ROLLUP_TABLES:
+        if span / BUCKET_SECONDS[granularity] <= max_buckets:
+            return granularity
+    return 'day'
+
+
+def get_series(cursor, granularity, start, end, parameters, zone=None, zones=None):
+    """Per-bucket averages of the given parameters over [start, end), oldest first.
+
+    parameters must already be validated against PARAMETERS. zone, or zones
+    when not None (e.g. one greenhouse's), limits the series to those zones.
+    """
+    averages = ', '.join(f"SUM({p}_sum) / SUM({p}_count) AS {p}" for p in parameters)
+    query = f"""
+        SELECT bucket_start, {averages}
+        FROM {ROLLUP_TABLES[granularity]}
+        WHERE bucket_start >= %s AND bucket_start < %s
+    """
+    params = [start, end]
+    if zone:
+        query += " AND greenhouse_zone = %s"
+        params.append(zone)
+    if zones is not None:
+        zone_sql, zone_params = storage.in_clause('greenhouse_zone', zones)
+        query += f" AND {zone_sql}"
+        params.extend(zone_params)
+    query += " GROUP BY bucket_start ORDER BY bucket_start"
+    cursor.execute(query, params)
+    return cursor.fetchall()
+
+
+def get_zone_hours(cursor, start):
+    """Hourly averages per zone from start on, oldest first; primes the forecaster without touching raw readings."""
+    averages = ', '.join(f"{p}_sum / NULLIF({p}_count, 0) AS {p}" for p in PARAMETERS)
+    cursor.execute(f"""
+        SELECT bucket_start, greenhouse_zone, {averages}
+        FROM sensor_rollup_hour
+        WHERE bucket_start >= %s
+        ORDER BY bucket_start
+    """, (start,))
+    return cursor.fetchall()
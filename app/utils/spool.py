@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Each record is one ingest call's readings: payload length and CRC32, then the JSON payload
+RECORD_HEADER = struct.Struct('<II')
+SEGMENT_SUFFIX = '.seg'
+CHECKPOINT = 'checkpoint'
+DEAD_LETTER = 'rejected.ndjson'
+
+
+class Spool:
+    """Append-only, segment-file store for readings the database could not take.
+
+    append() returns only once the record is on disk. Concurrent appenders
+    share fsyncs: whoever syncs first covers every record written before it,
+    so a burst of requests during an outage costs a few fsyncs, not one each.
+    Segments roll at segment_bytes and are deleted once replayed. Together
+    with the dead-letter file, which only an operator clears, they stay under
+    max_bytes, beyond which append() refuses. A torn record left by a crash
+    is cut off when the spool is reopened.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, segment_bytes=8 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.stats = {'appended': 0, 'refused': 0, 'replayed': 0, 'dead_lettered': 0, 'fsyncs': 0}
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._file = None
+        self._active = None
+        self._written = 0
+        self._synced = 0
+        self._size = 0
+        self._dead_bytes = 0
+        if os.path.isdir(directory):
+            self._recover()
+
+    def pending(self):
+        """True while anything is spooled and not yet replayed."""
+        with self._lock:
+            return self._size > 0
+
+    def size(self):
+        """Bytes counted against max_bytes: unreplayed segments and dead letters."""
+        with self._lock:
+            return self._size + self._dead_bytes
+
+    def append(self, readings):
+        """Durably store readings for later replay; False when that would exceed max_bytes."""
+        payload = json.dumps(readings, separators=(',', ':'), default=str).encode()
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._size + self._dead_bytes + len(record) > self.max_bytes:
+                self.stats['refused'] += len(readings)
+                return False
+            if self._file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._open_segment(1)
+            elif self._file.tell() >= self.segment_bytes:
+                self._roll()
+            self._file.write(record)
+            self._file.flush()
+            self._size += len(record)
+            self._written += 1
+            ticket = self._written
+            self.stats['appended'] += len(readings)
+        self._sync(ticket)
+        return True
+
+    def replay(self, handler, max_readings=500, retryable=lambda error: True, validate=None):
+        """Hand spooled readings to handler, oldest first, up to max_readings per call.
+
+        Progress is checkpointed after every successful call, so a failure
+        stops the replay and the next one resumes with the readings that
+        failed. Readings whose error is not retryable are moved to the
+        dead-letter file instead of blocking everything behind them.
+        validate(reading), returning an error message or None, screens each
+        chunk first so one unstorable reading is dead-lettered on its own
+        rather than taking the rest of its chunk with it.
+        Returns the number of readings replayed.
+        """
+        with self._replay_lock:
+            with self._lock:
+                if self._file is not None and self._file.tell():
+                    self._roll()
+                sealed = [seq for seq in self._segments() if seq != self._active]
+            checkpoint = self._read_checkpoint()
+            replayed = 0
+            for seq in sealed:
+                start = checkpoint[1] if checkpoint and checkpoint[0] == seq else 0
+                for end, readings in self._chunks(seq, start, max_readings):
+                    if validate is not None:
+                        readings = self._screen(readings, validate)
+                    try:
+                        if readings:
+                            handler(readings)
+                        replayed += len(readings)
+                        self.stats['replayed'] += len(readings)
+                    except Exception as e:
+                        if retryable(e):
+                            raise
+                        self._dead_letter(readings, e)
+                    self._write_checkpoint(seq, end)
+                self._remove_segment(seq)
+            return replayed
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def _recover(self):
+        dead_letter = os.path.join(self.directory, DEAD_LETTER)
+        if os.path.exists(dead_letter):
+            self._dead_bytes = os.path.getsize(dead_letter)
+        segments = self._segments()
+        if not segments:
+            return
+        last = self._segment_path(segments[-1])
+        valid = 0
+        for valid, _ in self._records(segments[-1], 0):
+            pass
+        if valid < os.path.getsize(last):
+            logger.warning(f"Truncating torn record at byte {valid} of spool segment {last}")
+            with open(last, 'r+b') as f:
+                f.truncate(valid)
+        self._size = sum(os.path.getsize(self._segment_path(seq)) for seq in segments)
+        self._active = segments[-1]
+        self._file = open(last, 'ab')
+
+    def _roll(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._open_segment(self._active + 1)
+
+    def _open_segment(self, seq):
+        self._active = seq
+        self._file = open(self._segment_path(seq), 'ab')
+
+    def _sync(self, ticket):
+        with self._sync_lock:
+            if self._synced >= ticket:
+                # Another appender's fsync already covered this record
+                return
+            with self._lock:
+                target = self._written
+                # A private descriptor stays valid if the segment rolls (and is closed) meanwhile
+                fd = os.dup(self._file.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._synced = target
+            self.stats['fsyncs'] += 1
+
+    def _segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.endswith(SEGMENT_SUFFIX))
+
+    def _segment_path(self, seq):
+        return os.path.join(self.directory, f"{seq:012d}{SEGMENT_SUFFIX}")
+
+    def _records(self, seq, start):
+        """Yield (end_offset, readings) for each intact record from byte start on."""
+        with open(self._segment_path(seq), 'rb') as f:
+            f.seek(start)
+            offset = start
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                length, crc = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                offset += RECORD_HEADER.size + length
+                yield offset, json.loads(payload)
+
+    def _chunks(self, seq, start, max_readings):
+        chunk = []
+        end = start
+        for end, readings in self._records(seq, start):
+            chunk.extend(readings)
+            if len(chunk) >= max_readings:
+                yield end, chunk
+                chunk = []
+        if chunk:
+            yield end, chunk
+
+    def _remove_segment(self, seq):
+        path = self._segment_path(seq)
+        size = os.path.getsize(path)
+        os.remove(path)
+        with self._lock:
+            self._size -= size
+        checkpoint_path = os.path.join(self.directory, CHECKPOINT)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, CHECKPOINT)) as f:
+                seq, offset = f.read().split()
+                return int(seq), int(offset)
+        except (OSError, ValueError):
+            return None
+
+    def _write_checkpoint(self, seq, offset):
+        path = os.path.join(self.directory, CHECKPOINT)
+        with open(path + '.tmp', 'w') as f:
+            f.write(f"{seq} {offset}")
+        os.replace(path + '.tmp', path)
+
+    def _screen(self, readings, validate):
+        valid = []
+        for reading in readings:
+            error = validate(reading)
+            if error:
+                self._dead_letter([reading], error)
+            else:
+                valid.append(reading)
+        return valid
+
+    def _dead_letter(self, readings, error):
+        self.stats['dead_lettered'] += len(readings)
+        logger.error(f"Moving {len(readings)} spooled readings to {DEAD_LETTER}: {error}")
+        lines = ''.join(json.dumps(reading, default=str) + '\n' for reading in readings).encode()
+        with open(os.path.join(self.directory, DEAD_LETTER), 'ab') as f:
+            f.write(lines)
+        with self._lock:
+            self._dead_bytes += len(lines)
+
+
+class SpoolReplayer:
+    """Background thread that drains a Spool into the database once it accepts writes again.
+
+    It wakes when notified of a new spooled record, or every retry_interval
+    seconds, and backs off for retry_interval after a retryable failure.
+    """
+
+    def __init__(self, spool, handler, retryable, retry_interval=5.0, batch_size=500, validate=None):
+        self.spool = spool
+        self.handler = handler
+        self.retryable = retryable
+        self.validate = validate
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def notify(self):
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='spool-replayer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.retry_interval)
+            self._wake.clear()
+            if self._stopping.is_set() or not self.spool.pending():
+                continue
+            try:
+                replayed = self.spool.replay(self.handler, self.batch_size, self.retryable, self.validate)
+                if replayed:
+                    logger.info(f"Replayed {replayed} spooled readings")
+                if self.spool.pending():
+                    # Readings spooled while this pass ran keep their place behind it
+                    self._wake.set()
+            except Exception as e:
+                logger.warning(f"Spool replay paused, database still unavailable: {e}")
+                self._stopping.wait(self.retry_interval)
@@ -0,0 +1,305 @@
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import weakref
+from datetime import date, datetime
+from decimal import Decimal
+
+import mysql.connector
+from mysql.connector import pooling
+
+# Every backend's driver errors, for except clauses that must catch either
+DatabaseError = (mysql.connector.Error, sqlite3.Error)
+
+# mysql-connector client errors (2000-2999) are all connection failures; these server errors are transient
+_MYSQL_TRANSIENT = {1040, 1053, 1205, 1213, 4031}
+_SQLITE_TRANSIENT = {'SQLITE_BUSY', 'SQLITE_LOCKED', 'SQLITE_LOCKED_SHAREDCACHE', 'SQLITE_CANTOPEN', 'SQLITE_IOERR',
+                     'SQLITE_FULL'}
+
+SQLITE_SCHEMA = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'migrations', 'sqlite', 'schema.sql'))
+
+
+def is_unavailable(error):
+    """True when a driver error means the database could not take the write right now, so retrying later can succeed."""
+    if isinstance(error, (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError,
+                          mysql.connector.errors.PoolError)):
+        return True
+    if isinstance(error, mysql.connector.Error):
+        return error.errno is not None and (2000 <= error.errno < 3000 or error.errno in _MYSQL_TRANSIENT)
+    if isinstance(error, sqlite3.Error):
+        return getattr(error, 'sqlite_errorname', None) in _SQLITE_TRANSIENT
+    return False
+
+
+class MySQLDialect:
+    name = 'mysql'
+
+    def upsert(self, keys):
+        """Clause that turns an INSERT into an upsert on the unique key `keys`."""
+        return "ON DUPLICATE KEY UPDATE"
+
+    def inserted(self, column):
+        """The value an upsert tried to insert into `column`."""
+        return f"VALUES({column})"
+
+
+class SQLiteDialect:
+    name = 'sqlite'
+
+    def upsert(self, keys):
+        return f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET"
+
+    def inserted(self, column):
+        return f"excluded.{column}"
+
+
+MYSQL = MySQLDialect()
+SQLITE = SQLiteDialect()
+
+# Dialect of the configured backend; queries that differ between engines consult it
+dialect = MYSQL
+
+
+def in_clause(column, values):
+    """`column IN (...)` with one placeholder per value, and its parameters; no values matches no rows."""
+    if not values:
+        return "1 = 0", []
+    return f"{column} IN ({', '.join(['%s'] * len(values))})", list(values)
+
+
+class MySQLBackend:
+    """mysql-connector pool, created on first checkout so the app starts without a reachable server."""
+
+    dialect = MYSQL
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def get_connection(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pooling.MySQLConnectionPool(pool_name="greenhouse_pool", **self.settings)
+        return self._pool.get_connection()
+
+
+class SQLiteBackend:
+    """Embedded SQLite database in WAL mode, with the same query set as MySQL.
+
+    Statements keep the mysql-connector %s paramstyle and are rewritten on the
+    way in. A path of ':memory:' gives a throwaway database for this process,
+    deleted with the backend.
+    """
+
+    dialect = SQLITE
+
+    def __init__(self, path, schema=SQLITE_SCHEMA):
+        self.path = path
+        self.schema = schema
+        self._idle = queue.LifoQueue()
+        if path == ':memory:':
+            # A shared-cache memory database answers a concurrent writer with SQLITE_LOCKED_SHAREDCACHE at once
+            # instead of waiting out the busy timeout, so it is backed by a temporary WAL file instead
+            directory = tempfile.mkdtemp(prefix='greenhouse-')
+            weakref.finalize(self, shutil.rmtree, directory, True)
+            self._target = os.path.join(directory, 'greenhouse.db')
+        else:
+            self._target = path
+        self.create_schema()
+
+    def get_connection(self):
+        try:
+            raw = self._idle.get_nowait()
+        except queue.Empty:
+            raw = self._connect()
+        return SQLiteConnection(raw, self)
+
+    def release(self, raw):
+        self._idle.put(raw)
+
+    def create_schema(self):
+        conn = self._connect()
+        try:
+            with open(self.schema) as f:
+                conn.executescript(f.read())
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        raw = sqlite3.connect(self._target, detect_types=sqlite3.PARSE_DECLTYPES,
+                              check_same_thread=False, isolation_level='IMMEDIATE', timeout=5)
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.execute("PRAGMA synchronous=NORMAL")
+        raw.execute("PRAGMA foreign_keys=ON")
+        raw.create_function('DATE_FORMAT', 2, _date_format, deterministic=True)
+        raw.create_function('LEAST', -1, _least, deterministic=True)
+        raw.create_function('GREATEST', -1, _greatest, deterministic=True)
+        return raw
+
+
+class SQLiteConnection:
+    """The subset of the mysql-connector connection API the app uses."""
+
+    def __init__(self, raw, backend):
+        self._raw = raw
+        self._backend = backend
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self._raw.cursor(), dictionary)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+    def is_connected(self):
+        return self._raw is not None
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self._raw.execute("SELECT 1")
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        if raw.in_transaction:
+            raw.rollback()
+        self._backend.release(raw)
+
+
+class SQLiteCursor:
+    def __init__(self, cursor, dictionary):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=None):
+        self._cursor.execute(translate(sql), _bind(params))
+
+    def executemany(self, sql, seq_params):
+        self._cursor.executemany(translate(sql), [_bind(params) for params in seq_params])
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._row(row) if row is not None else None
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._cursor.description or ())
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+    def _row(self, row):
+        if self._dictionary:
+            return dict(zip(self.column_names, row))
+        return tuple(row)
+
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+_ISO_DATETIME = re.compile(r'^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}')
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_translated = {}
+
+
+def translate(sql):
+    """Rewrite %s placeholders to ? and unescape %%."""
+    statement = _translated.get(sql)
+    if statement is None:
+        statement = _translated[sql] = _PLACEHOLDER.sub(lambda m: '%' if m.group() == '%%' else '?', sql)
+    return statement
+
+
+def _bind(params):
+    if params is None:
+        return ()
+    return tuple(_storage_value(value) for value in params)
+
+
+def _storage_value(value):
+    # Timestamps are stored as 'YYYY-MM-DD HH:MM:SS[.ffffff]' text so they sort and compare correctly
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None).isoformat(' ')
+    if isinstance(value, str) and _ISO_DATETIME.match(value):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None).isoformat(' ')
+        except ValueError:
+            return value
+    # Every temporal column is DATETIME, which MySQL compares with a bare date as that day's midnight
+    if isinstance(value, str) and _ISO_DATE.match(value):
+        return value + ' 00:00:00'
+    if isinstance(value, date):
+        return value.isoformat() + ' 00:00:00'
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _parse_datetime(raw):
+    return datetime.fromisoformat(raw.decode())
+
+
+sqlite3.register_converter('DATETIME', _parse_datetime)
+
+_MYSQL_FORMAT = {'Y': '%Y', 'm': '%m', 'd': '%d', 'H': '%H', 'i': '%M', 's': '%S'}
+
+
+def _date_format(value, fmt):
+    """MySQL DATE_FORMAT for the specifiers the rollup rebuild uses."""
+    if value is None:
+        return None
+    moment = datetime.fromisoformat(value) if isinstance(value, str) else value
+    return moment.strftime(re.sub(r'%(\w)', lambda m: _MYSQL_FORMAT.get(m.group(1), m.group()), fmt))
+
+
+def _least(*values):
+    return None if any(value is None for value in values) else min(values)
+
+
+def _greatest(*values):
+    return None if any(value is None for value in values) else max(values)
+
+
+def create_backend(config):
+    """Backend named by DB_BACKEND, also making its dialect the current one."""
+    global dialect
+    if config['DB_BACKEND'] == 'sqlite':
+        backend = SQLiteBackend(config['SQLITE_PATH'])
+    elif config['DB_BACKEND'] == 'mysql':
+        backend = MySQLBackend(
+            pool_size=config['MYSQL_POOL_SIZE'],
+            host=config['MYSQL_HOST'],
+            port=config['MYSQL_PORT'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            database=config['MYSQL_DB']
+        )
+    else:
+        raise ValueError(f"Unknown DB_BACKEND {config['DB_BACKEND']!r}; expected 'mysql' or 'sqlite'")
+    dialect = backend.dialect
+    return backend
@@ -0,0 +1,145 @@
+import threading
+import time
+from . import storage
+from .alert_engine import ThresholdIndex, compile_thresholds
+
+VERSION_KEY = 'optimal_ranges'
+
+
+class ThresholdCache:
+    """Process-local copy of optimal_ranges and the greenhouse and zone profiles.
+
+    Loaded once and served from memory. Local writes call invalidate(); other
+    worker processes notice changes through the settings_versions row, which is
+    only checked once the TTL has expired.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entry = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self, cursor):
+        """Return {parameter: {'min_value', 'max_value'}} using the given dictionary cursor."""
+        return self._load(lambda: cursor)[0]
+
+    def get_compiled(self, cursor):
+        """Return the ThresholdIndex of compiled ranges per zone, for alert_engine.evaluate_zones()."""
+        return self._load(lambda: cursor)[1]
+
+    def zones(self, get_cursor, greenhouse_ids):
+        """Zone names of the given greenhouses, from the same in-memory index.
+
+        get_cursor() is only called when the index must be checked or
+        reloaded, so read paths served from memory take no connection.
+        """
+        index = self._load(get_cursor)[1]
+        return [zone for greenhouse_id in greenhouse_ids for zone in index.zones(greenhouse_id)]
+
+    def invalidate(self):
+        """Drop the cached ranges so the next get() reloads them."""
+        with self._lock:
+            self._entry = None
+            self._version = None
+
+    def _load(self, get_cursor):
+        entry = self._entry
+        if entry is not None and time.monotonic() - self._checked_at < self.ttl:
+            return entry
+
+        with self._lock:
+            if self._entry is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._entry
+
+            cursor = get_cursor()
+            version = fetch_version(cursor)
+            if self._entry is None or version != self._version:
+                cursor.execute("SELECT parameter, min_value, max_value FROM optimal_ranges")
+                thresholds = {row['parameter']: row for row in cursor.fetchall()}
+                self._entry = (thresholds, load_index(cursor, thresholds))
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._entry
+
+
+def load_index(cursor, thresholds):
+    """Compile the zone map and profile overrides on top of the global ranges.
+
+    An override row replaces that parameter's whole range. A zone resolves
+    zone_ranges first, then its greenhouse's greenhouse_ranges, then thresholds.
+    """
+    cursor.execute("SELECT greenhouse_zone, greenhouse_id FROM greenhouse_zones")
+    greenhouse_of = {row['greenhouse_zone']: row['greenhouse_id'] for row in cursor.fetchall()}
+    cursor.execute("SELECT greenhouse_id, parameter, min_value, max_value FROM greenhouse_ranges")
+    greenhouse_ranges = {}
+    for row in cursor.fetchall():
+        greenhouse_ranges.setdefault(row['greenhouse_id'], {})[row['parameter']] = row
+    cursor.execute("SELECT greenhouse_zone, parameter, min_value, max_value FROM zone_ranges")
+    zone_ranges = {}
+    for row in cursor.fetchall():
+        zone_ranges.setdefault(row['greenhouse_zone'], {})[row['parameter']] = row
+
+    profiles = {greenhouse_id: compile_thresholds({**thresholds, **ranges})
+                for greenhouse_id, ranges in greenhouse_ranges.items()}
+    by_zone = {zone: profiles[greenhouse_id] for zone, greenhouse_id in greenhouse_of.items()
+               if greenhouse_id in profiles}
+    for zone, ranges in zone_ranges.items():
+        inherited = greenhouse_ranges.get(greenhouse_of.get(zone), {})
+        by_zone[zone] = compile_thresholds({**thresholds, **inherited, **ranges})
+
+    zones_by_greenhouse = {}
+    for zone, greenhouse_id in sorted(greenhouse_of.items()):
+        zones_by_greenhouse.setdefault(greenhouse_id, []).append(zone)
+    return ThresholdIndex(compile_thresholds(thresholds), by_zone, zones_by_greenhouse)
+
+
+def assign_zone(cursor, zone, greenhouse_id):
+    """Put a zone in a greenhouse, moving it if it already belongs to another; call bump_version()."""
+    cursor.execute(f"""
+        INSERT INTO greenhouse_zones (greenhouse_zone, greenhouse_id) VALUES (%s, %s)
+        {storage.dialect.upsert(['greenhouse_zone'])} greenhouse_id = {storage.dialect.inserted('greenhouse_id')}
+    """, (zone, greenhouse_id))
+
+
+def save_range(cursor, parameter, min_value, max_value, greenhouse_id=None, zone=None):
+    """Set a greenhouse's or a zone's override for one parameter; call bump_version()."""
+    table, key, owner = _profile(greenhouse_id, zone)
+    cursor.execute(f"""
+        INSERT INTO {table} ({key}, parameter, min_value, max_value) VALUES (%s, %s, %s, %s)
+        {storage.dialect.upsert([key, 'parameter'])} min_value = {storage.dialect.inserted('min_value')},
+            max_value = {storage.dialect.inserted('max_value')}
+    """, (owner, parameter, min_value, max_value))
+
+
+def delete_range(cursor, parameter, greenhouse_id=None, zone=None):
+    """Drop an override so the parameter falls back to the greenhouse or global range; call bump_version()."""
+    table, key, owner = _profile(greenhouse_id, zone)
+    cursor.execute(f"DELETE FROM {table} WHERE {key} = %s AND parameter = %s", (owner, parameter))
+    return cursor.rowcount
+
+
+def _profile(greenhouse_id, zone):
+    if zone is not None:
+        return 'zone_ranges', 'greenhouse_zone', zone
+    if greenhouse_id is not None:
+        return 'greenhouse_ranges', 'greenhouse_id', greenhouse_id
+    raise ValueError("A range override needs a greenhouse_id or a zone")
+
+
+def fetch_version(cursor):
+    cursor.execute("SELECT version FROM settings_versions WHERE name = %s", (VERSION_KEY,))
+    row = cursor.fetchone()
+    return row['version'] if row else 0
+
+
+def bump_version(cursor):
+    """Mark the ranges or zone map as changed for every worker process; commit with the update."""
+    cursor.execute(f"""
+        INSERT INTO settings_versions (name, version) VALUES (%s, 1)
+        {storage.dialect.upsert(['name'])} version = version + 1
+    """, (VERSION_KEY,))
+
+
+threshold_cache = ThresholdCache()
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class FlushRefused(RuntimeError):
+    """flush() could not take the batch at all (database down, no spool room); splitting it would not help."""
+
+
+class WriteBehindBuffer:
+    """Bounded in-memory queue of validated readings, committed in groups by a background thread.
+
+    submit() only appends to the queue and refuses (returns False) when it
+    would overflow max_queue, so callers can push back on the sender. The
+    flusher hands flush() up to batch_size readings at a time, waiting at most
+    flush_interval seconds after the first queued reading for a batch to fill,
+    so each call is one transaction however many requests fed it.
+
+    Readings were already acknowledged when queued, so a batch that fails
+    for any reason but FlushRefused is split in halves and retried until the
+    reading that broke it is isolated; only that one is dropped.
+    """
+
+    def __init__(self, flush, max_queue=10000, batch_size=500, flush_interval=0.05):
+        self.flush = flush
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {'enqueued': 0, 'rejected': 0, 'flushed': 0, 'commits': 0, 'failed': 0}
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._stopping = False
+        self._thread = None
+
+    def submit(self, readings):
+        """Queue readings as a unit; False when the queue has no room for all of them."""
+        self.start()
+        with self._cond:
+            if len(self._queue) + len(readings) > self.max_queue:
+                self.stats['rejected'] += len(readings)
+                return False
+            self._queue.extend(readings)
+            self.stats['enqueued'] += len(readings)
+            self._cond.notify()
+        return True
+
+    def depth(self):
+        with self._cond:
+            return len(self._queue) + self._in_flight
+
+    def wait_idle(self, timeout=None):
+        """Block until everything submitted so far has been flushed; False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._flush_loop, name='ingest-flusher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=30):
+        """Flush whatever is still queued, then stop the flusher."""
+        with self._cond:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        thread.join(timeout)
+        with self._cond:
+            self._thread = None
+            left = len(self._queue) + self._in_flight
+        if left:
+            logger.error(f"Ingest buffer stopped with {left} readings not written")
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopping)
+                if not self._queue:
+                    break
+                # Group commit: let the batch fill for up to flush_interval unless we are draining
+                deadline = time.monotonic() + self.flush_interval
+                while len(self._queue) < self.batch_size and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+            self._commit(batch)
+            with self._cond:
+                self._in_flight = 0
+                self._cond.notify_all()
+
+    def _commit(self, batch):
+        try:
+            self.flush(batch)
+        except FlushRefused as e:
+            self.stats['failed'] += len(batch)
+            logger.error(f"Write-behind flush of {len(batch)} readings failed: {e}")
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                self.stats['failed'] += 1
+                logger.error(f"Write-behind dropped reading {batch[0]!r}: {e}")
+                return
+            middle = len(batch) // 2
+            self._commit(batch[:middle])
+            self._commit(batch[middle:])
+            return
+        self.stats['commits'] += 1
+        self.stats['flushed'] += len(batch)
@@ -0,0 +1,45 @@
+"""Micro-benchmark of alert_engine.evaluate() for batches of 1, 100 and 10k readings.
+
+    python -m benchmarks.bench_alert_engine
+"""
+import random
+import time
+
+from app.utils.alert_engine import PARAMETERS, compile_thresholds, evaluate
+
+RANGES = {
+    'temperature': (18, 40), 'pressure': (985, 1040), 'light_intensity': (150, 1800),
+    'humidity': (30, 80), 'air_quality': (0, 100), 'pH': (6.0, 7.5), 'moisture': (15, 55),
+}
+
+
+def make_reading():
+    reading = {'timestamp': '2025-04-20T10:00:00', 'greenhouse_zone': random.choice(['Zone A', 'Zone B'])}
+    for param in PARAMETERS:
+        lo, hi = RANGES[param]
+        span = hi - lo
+        reading[param] = round(random.uniform(lo - 0.2 * span, hi + 0.2 * span), 2)
+    return reading
+
+
+def bench(compiled, batch_size, min_seconds=1.0):
+    readings = [make_reading() for _ in range(batch_size)]
+    evaluated = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_seconds:
+        evaluate(readings, compiled)
+        evaluated += batch_size
+    return evaluated / (time.perf_counter() - start)
+
+
+def main():
+    compiled = compile_thresholds({
+        param: {'min_value': lo, 'max_value': hi} for param, (lo, hi) in RANGES.items()
+    })
+    print(f"{'batch size':>10}{'readings/sec':>16}")
+    for batch_size in (1, 100, 10000):
+        print(f"{batch_size:>10}{bench(compiled, batch_size):>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
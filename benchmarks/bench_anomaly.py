@@ -0,0 +1,63 @@
+"""Throughput of AnomalyDetector.observe() next to alert_engine.evaluate(), for batches of 1, 100 and 10k readings.
+
+Both run inline on the ingest path, inside the request's transaction, so
+the detector's cost is reported per reading and against the range check it
+sits beside.
+
+    python -m benchmarks.bench_anomaly --zones 12
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.utils.alert_engine import PARAMETERS, compile_thresholds, evaluate
+from app.utils.anomaly import AnomalyDetector
+from benchmarks.bench_alert_engine import RANGES
+
+
+def make_readings(count, zones, start):
+    readings = []
+    for i in range(count):
+        reading = {'timestamp': (start + timedelta(seconds=10 * i)).isoformat(),
+                   'greenhouse_zone': f"Zone {i % zones + 1}"}
+        for param in PARAMETERS:
+            lo, hi = RANGES[param]
+            reading[param] = round(random.gauss((lo + hi) / 2, (hi - lo) / 20), 2)
+        readings.append(reading)
+    return readings
+
+
+def bench(run, batch_size, zones, min_seconds=1.0):
+    start = datetime(2025, 4, 20)
+    batches = [make_readings(batch_size, zones, start + timedelta(hours=i)) for i in range(8)]
+    processed = 0
+    began = time.perf_counter()
+    while time.perf_counter() - began < min_seconds:
+        run(batches[processed // batch_size % len(batches)])
+        processed += batch_size
+    return processed / (time.perf_counter() - began)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--zones', type=int, default=6)
+    args = parser.parse_args()
+
+    compiled = compile_thresholds({
+        param: {'min_value': lo, 'max_value': hi} for param, (lo, hi) in RANGES.items()
+    })
+    detector = AnomalyDetector()
+    # Warm every series past min_samples so the alert checks run as they would in production
+    detector.observe(make_readings(args.zones * (detector.min_samples + 1), args.zones, datetime(2025, 4, 19)))
+
+    print(f"{'batch size':>10}{'evaluate/sec':>16}{'observe/sec':>16}{'observe us':>12}")
+    for batch_size in (1, 100, 10000):
+        ranges = bench(lambda batch: evaluate(batch, compiled), batch_size, args.zones)
+        anomalies = bench(detector.observe, batch_size, args.zones)
+        print(f"{batch_size:>10}{ranges:>16.0f}{anomalies:>16.0f}{1e6 / anomalies:>12.1f}")
+    print(f"series tracked: {len(detector)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare ingest throughput of /receive_sensor_data against /receive_sensor_data/batch.
+
+Runs in-process through the Flask test client against the configured database,
+so point MYSQL_DB at a scratch schema before running:
+
+    python -m benchmarks.bench_ingest --readings 2000 --batch-size 500
+"""
+import argparse
+import time
+
+from app import app
+from app.utils.db_utils import AnonymousUser, simulate_sensor_data
+from app.utils.user_cache import user_cache
+
+
+def make_client():
+    app.config['WTF_CSRF_ENABLED'] = False
+    client = app.test_client()
+    # A cached user that never expires, so the run never looks up users
+    user_cache.ttl = float('inf')
+    user_cache.put(AnonymousUser(0, 'bench', 'Manager'))
+    with client.session_transaction() as sess:
+        sess['_user_id'] = '0'
+    return client
+
+
+def make_readings(count):
+    readings = []
+    for _ in range(count):
+        data = simulate_sensor_data()
+        data['timestamp'] = data['timestamp'].rstrip('Z')
+        readings.append(data)
+    return readings
+
+
+def bench_single(client, readings):
+    start = time.perf_counter()
+    for data in readings:
+        response = client.post('/receive_sensor_data', json=data)
+        if response.status_code != 201:
+            raise RuntimeError(f"Single ingest failed: {response.status_code} {response.get_data(as_text=True)}")
+    return time.perf_counter() - start
+
+
+def bench_batch(client, readings, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(readings), batch_size):
+        response = client.post('/receive_sensor_data/batch', json=readings[i:i + batch_size])
+        if response.status_code != 201:
+            raise RuntimeError(f"Batch ingest failed: {response.status_code} {response.get_data(as_text=True)}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readings', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=250)
+    args = parser.parse_args()
+
+    # simulate_sensor_data() prints every payload; generate up front so it stays out of the timings
+    readings = make_readings(args.readings)
+    client = make_client()
+
+    single = bench_single(client, readings)
+    batch = bench_batch(client, readings, args.batch_size)
+
+    print(f"{'endpoint':<32}{'seconds':>10}{'readings/sec':>16}")
+    print(f"{'/receive_sensor_data':<32}{single:>10.3f}{args.readings / single:>16.0f}")
+    print(f"{'/receive_sensor_data/batch':<32}{batch:>10.3f}{args.readings / batch:>16.0f}")
+    print(f"speedup: {single / batch:.1f}x (batch size {args.batch_size})")
+
+
+if __name__ == '__main__':
+    main()
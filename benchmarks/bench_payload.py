@@ -0,0 +1,77 @@
+"""Compare bytes per reading and parse time of the JSON, NDJSON and packed binary batch formats.
+
+Times only what the batch endpoint does with a body before touching the
+database: decoding it into reading dicts and validating each one.
+
+    python -m benchmarks.bench_payload --readings 5000 --zones 12
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.utils.db_utils import validate_reading
+from app.utils.packed import decode_packed, encode_packed
+
+PARAMETER_RANGES = {
+    'temperature': (10, 50), 'pressure': (980, 1030), 'light_intensity': (200, 1500),
+    'humidity': (10, 90), 'air_quality': (10, 200), 'pH': (3.5, 9.0), 'moisture': (10, 90),
+}
+
+
+def make_readings(count, zones, seed=1):
+    rng = random.Random(seed)
+    start = datetime(2025, 4, 20)
+    readings = []
+    for i in range(count):
+        reading = {param: round(rng.uniform(low, high), 2) for param, (low, high) in PARAMETER_RANGES.items()}
+        reading['timestamp'] = (start + timedelta(seconds=i)).isoformat(timespec='milliseconds')
+        reading['greenhouse_zone'] = f"Zone {i % zones + 1}"
+        readings.append(reading)
+    return readings
+
+
+def parse_json(body):
+    return json.loads(body)
+
+
+def parse_ndjson(body):
+    return [json.loads(line) for line in body.decode().splitlines() if line.strip()]
+
+
+def best_time(parse, body, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        readings = parse(body)
+        errors = [error for error in map(validate_reading, readings) if error]
+        best = min(best, time.perf_counter() - start)
+    if errors:
+        raise RuntimeError(f"{len(errors)} readings failed validation: {errors[0]}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readings', type=int, default=5000)
+    parser.add_argument('--zones', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per format; the best is reported')
+    args = parser.parse_args()
+
+    readings = make_readings(args.readings, args.zones)
+    bodies = {
+        'json': (parse_json, json.dumps(readings).encode()),
+        'ndjson': (parse_ndjson, '\n'.join(json.dumps(r) for r in readings).encode()),
+        'packed': (decode_packed, encode_packed(readings)),
+    }
+
+    print(f"{'format':<10}{'bytes/reading':>15}{'us/reading':>12}{'readings/sec':>15}")
+    for name, (parse, body) in bodies.items():
+        elapsed = best_time(parse, body, args.repeat)
+        print(f"{name:<10}{len(body) / args.readings:>15.1f}{elapsed / args.readings * 1e6:>12.2f}"
+              f"{args.readings / elapsed:>15.0f}")
+
+
+if __name__ == '__main__':
+    main()
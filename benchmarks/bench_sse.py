@@ -0,0 +1,115 @@
+"""Load test for /stream: how many concurrent SSE subscribers one worker sustains.
+
+Serves the app from a threaded werkzeug server in this process, opens N aiohttp
+subscribers, publishes events through the in-process broker and measures
+delivery latency at each level:
+
+    python -m benchmarks.bench_sse --levels 100,500,1000,2000 --events 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import threading
+import time
+
+import aiohttp
+from werkzeug.serving import make_server
+
+from app import app
+from app.utils.db_utils import AnonymousUser
+from app.utils.latest_cache import latest_cache
+from app.utils.pubsub import broker, encode
+from app.utils.user_cache import user_cache
+
+
+def start_server():
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def session_cookie():
+    user_cache.ttl = float('inf')
+    user_cache.put(AnonymousUser(0, 'bench', 'Manager'))
+    serializer = app.session_interface.get_signing_serializer(app)
+    return {app.config.get('SESSION_COOKIE_NAME', 'session'): serializer.dumps({'_user_id': '0'})}
+
+
+async def subscriber(session, url, expected, latencies, ready):
+    received = 0
+    async with session.get(url) as response:
+        ready.release()
+        async for line in response.content:
+            if not line.startswith(b'data: '):
+                continue
+            event = json.loads(line[6:])
+            if 'sent_at' not in event:
+                continue
+            latencies.append(time.perf_counter() - event['sent_at'])
+            received += 1
+            if received == expected:
+                return True
+    return False
+
+
+async def run_level(url, cookies, subscribers, events, interval):
+    latencies = []
+    ready = asyncio.Semaphore(0)
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+    async with aiohttp.ClientSession(cookies=cookies, connector=connector, timeout=timeout) as session:
+        tasks = [asyncio.create_task(subscriber(session, url, events, latencies, ready))
+                 for _ in range(subscribers)]
+        for _ in range(subscribers):
+            await ready.acquire()
+        while broker.subscriber_count < subscribers:
+            await asyncio.sleep(0.05)
+
+        start = time.perf_counter()
+        for i in range(events):
+            broker.publish('reading', encode({'seq': i, 'sent_at': time.perf_counter(),
+                                              'greenhouse_zone': 'Zone A'}), 'Zone A')
+            await asyncio.sleep(interval)
+        results = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=120)
+        elapsed = time.perf_counter() - start
+
+    complete = sum(1 for result in results if result is True)
+    latencies.sort()
+    return {
+        'complete': complete,
+        'p50': statistics.median(latencies) if latencies else float('nan'),
+        'p99': latencies[int(len(latencies) * 0.99) - 1] if latencies else float('nan'),
+        'events_per_sec': len(latencies) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', default='100,500,1000')
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=0.1, help='seconds between published events')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    # Short heartbeats let closed subscribers unwind quickly between levels
+    app.config['SSE_HEARTBEAT'] = 1
+    # Prime the latest-reading cache so subscribing never touches the database
+    latest_cache.get_all(lambda: [])
+    server = start_server()
+    url = f"http://127.0.0.1:{server.server_port}/stream?zone=Zone A"
+    cookies = session_cookie()
+
+    print(f"{'subscribers':>12}{'complete':>10}{'p50 ms':>10}{'p99 ms':>10}{'deliveries/s':>14}")
+    for level in (int(value) for value in args.levels.split(',')):
+        result = asyncio.run(run_level(url, cookies, level, args.events, args.interval))
+        print(f"{level:>12}{result['complete']:>10}{result['p50'] * 1000:>10.1f}"
+              f"{result['p99'] * 1000:>10.1f}{result['events_per_sec']:>14.0f}")
+        while broker.subscriber_count:
+            time.sleep(0.05)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
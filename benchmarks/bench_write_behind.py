@@ -0,0 +1,68 @@
+"""Compare synchronous and write-behind ingest on /receive_sensor_data.
+
+Posts the same readings from several client threads, first with every request
+committing before it answers, then with INGEST_WRITE_BEHIND queueing them for
+group commit. Write-behind time runs until the queue has fully drained, so both
+rows measure readings durably written. Commits are counted by the connection
+pool. Runs in-process against the configured database, for example:
+
+    DB_BACKEND=sqlite SQLITE_PATH=/tmp/bench.db python -m benchmarks.bench_write_behind --readings 5000
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+from app.utils.db_utils import pool_stats
+from benchmarks.bench_ingest import make_client, make_readings
+
+
+def run(readings, clients, write_behind):
+    app.config['INGEST_WRITE_BEHIND'] = write_behind
+    expected = 202 if write_behind else 201
+    commits = pool_stats()['commits']
+    chunks = [readings[i::clients] for i in range(clients)]
+
+    def post_all(chunk):
+        client = make_client()
+        refused = 0
+        for data in chunk:
+            while True:
+                response = client.post('/receive_sensor_data', json=data)
+                if response.status_code != 429:
+                    break
+                # Back off like a well-behaved gateway until the flusher catches up
+                refused += 1
+                time.sleep(0.01)
+            if response.status_code != expected:
+                raise RuntimeError(f"Ingest failed: {response.status_code} {response.get_data(as_text=True)}")
+        return refused
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        refused = sum(executor.map(post_all, chunks))
+    accepted = time.perf_counter() - start
+    if write_behind and not app.ingest_buffer.wait_idle(timeout=300):
+        raise RuntimeError("Write-behind queue did not drain")
+    elapsed = time.perf_counter() - start
+    return elapsed, accepted, pool_stats()['commits'] - commits, refused
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readings', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent posting threads')
+    args = parser.parse_args()
+
+    readings = make_readings(args.readings)
+
+    print(f"{'mode':<16}{'seconds':>10}{'readings/sec':>16}{'commits':>10}{'accept ms/req':>16}{'429s':>8}")
+    for label, write_behind in (('synchronous', False), ('write-behind', True)):
+        elapsed, accepted, commits, refused = run(readings, args.clients, write_behind)
+        print(f"{label:<16}{elapsed:>10.3f}{args.readings / elapsed:>16.0f}{commits:>10}"
+              f"{accepted / args.readings * args.clients * 1000:>16.2f}{refused:>8}")
+    app.ingest_buffer.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""Open-loop load generator for /receive_sensor_data.
+
+Replays one realistic stream per greenhouse zone: each zone starts from a
+simulate_sensor_data() reading and drifts by a small random walk. Requests
+are scheduled at a fixed aggregate rate regardless of how fast the server
+answers. Latency is measured from each request's scheduled send time, so a
+stalled server shows up in the percentiles instead of silently lowering the
+offered load.
+
+Against the app in this process (whatever database it is configured for):
+
+    python -m benchmarks.loadgen --rate 500 --concurrency 64 --duration 30 --zones 12
+
+or, with no database server at all:
+
+    DB_BACKEND=sqlite SQLITE_PATH=/tmp/loadgen.db python -m benchmarks.loadgen
+
+Against a running server, logging in with a real account:
+
+    python -m benchmarks.loadgen --url http://127.0.0.1:5000 --username bench --password secret123
+
+Add --output results.jsonl to append the summary for regression tracking.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+import aiohttp
+from werkzeug.serving import make_server
+
+from app import app
+from app.utils.db_utils import AnonymousUser, simulate_sensor_data
+from app.utils.user_cache import user_cache
+
+# Random-walk step per reading and the range each parameter is kept within
+DRIFT = {
+    'temperature': (0.2, 5, 50),
+    'pressure': (0.5, 970, 1050),
+    'light_intensity': (25, 0, 2000),
+    'humidity': (0.5, 5, 100),
+    'air_quality': (2, 0, 300),
+    'pH': (0.05, 3, 10),
+    'moisture': (0.5, 0, 100),
+}
+
+
+class ZoneStream:
+    """Successive readings for one zone, each a small step away from the last."""
+
+    def __init__(self, zone, rng):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.reading = simulate_sensor_data()
+        self.reading['greenhouse_zone'] = zone
+        self.rng = rng
+
+    def next(self):
+        reading = dict(self.reading)
+        for param, (step, low, high) in DRIFT.items():
+            value = reading[param] + self.rng.uniform(-step, step)
+            value = min(max(value, low), high)
+            reading[param] = round(value) if param in ('light_intensity', 'air_quality') else round(value, 2)
+        reading['timestamp'] = datetime.now().isoformat(timespec='milliseconds')
+        self.reading = reading
+        return reading
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return float('nan')
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def start_local_server():
+    """Serve the app from this process with CSRF off and a cached, never-expiring user."""
+    app.config['WTF_CSRF_ENABLED'] = False
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    user_cache.ttl = float('inf')
+    user_cache.put(AnonymousUser(0, 'loadgen', 'Manager'))
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    serializer = app.session_interface.get_signing_serializer(app)
+    cookies = {app.config.get('SESSION_COOKIE_NAME', 'session'): serializer.dumps({'_user_id': '0'})}
+    return server, f"http://127.0.0.1:{server.server_port}", cookies
+
+
+async def login(session, base_url, username, password):
+    """Log in through the form and return the CSRF token for the JSON posts."""
+    async with session.get(f"{base_url}/login") as response:
+        page = await response.text()
+    match = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', page)
+    token = match.group(1) if match else ''
+    form = {'identifier': username, 'password': password, 'csrf_token': token}
+    async with session.post(f"{base_url}/login", data=form, allow_redirects=False) as response:
+        if response.status != 302:
+            raise RuntimeError(f"Login failed with status {response.status}")
+    return token
+
+
+async def run(args, base_url, cookies):
+    rng = random.Random(args.seed)
+    zones = [ZoneStream(f"Zone {i + 1}", rng) for i in range(args.zones)]
+    url = f"{base_url}/receive_sensor_data"
+    if args.batch_size > 1:
+        url += '/batch'
+
+    latencies = []
+    statuses = {}
+    slots = asyncio.Semaphore(args.concurrency)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+
+    async with aiohttp.ClientSession(cookies=cookies, connector=connector, timeout=timeout) as session:
+        headers = {}
+        if args.username:
+            headers['X-CSRFToken'] = await login(session, base_url, args.username, args.password)
+
+        async def send(payload, scheduled):
+            async with slots:
+                try:
+                    async with session.post(url, json=payload, headers=headers) as response:
+                        await response.read()
+                        status = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status = type(e).__name__
+            statuses[status] = statuses.get(status, 0) + 1
+            # 202: queued by write-behind ingest or spooled during an outage, both accepted
+            if status in (201, 202, 207):
+                latencies.append(time.perf_counter() - scheduled)
+
+        interval = args.batch_size / args.rate
+        tasks = []
+        start = time.perf_counter()
+        deadline = start + args.duration
+        sent = 0
+        while True:
+            scheduled = start + sent * interval
+            if scheduled >= deadline:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            batch = [zones[(sent * args.batch_size + i) % len(zones)].next() for i in range(args.batch_size)]
+            tasks.append(asyncio.create_task(send(batch if args.batch_size > 1 else batch[0], scheduled)))
+            sent += 1
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ok = len(latencies)
+    return {
+        'url': url,
+        'rate': args.rate,
+        'concurrency': args.concurrency,
+        'zones': args.zones,
+        'batch_size': args.batch_size,
+        'requests': sent,
+        'ok': ok,
+        'errors': sent - ok,
+        'error_rate': (sent - ok) / sent if sent else 0.0,
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'elapsed': elapsed,
+        'readings_per_sec': ok * args.batch_size / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else float('nan'),
+    }
+
+
+def report(result):
+    print(f"{result['requests']} requests to {result['url']} in {result['elapsed']:.1f}s "
+          f"({result['zones']} zones, concurrency {result['concurrency']})")
+    print(f"throughput: {result['readings_per_sec']:.0f} readings/s (target {result['rate']})")
+    print(f"latency ms: p50 {result['p50_ms']:.1f}  p95 {result['p95_ms']:.1f}  "
+          f"p99 {result['p99_ms']:.1f}  max {result['max_ms']:.1f}")
+    print(f"errors: {result['errors']} ({result['error_rate']:.2%})  statuses: {result['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Base URL of a running server; default serves the app in-process')
+    parser.add_argument('--username', help='Log in as this user (required with --url)')
+    parser.add_argument('--password')
+    parser.add_argument('--rate', type=float, default=200, help='readings per second across all zones')
+    parser.add_argument('--concurrency', type=int, default=32, help='maximum requests in flight')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load')
+    parser.add_argument('--zones', type=int, default=6)
+    parser.add_argument('--batch-size', type=int, default=1, help='readings per request; >1 uses /batch')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='append the JSON summary to this file')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url, cookies = args.url.rstrip('/'), {}
+    else:
+        server, base_url, cookies = start_local_server()
+    try:
+        result = asyncio.run(run(args, base_url, cookies))
+    finally:
+        if server:
+            server.shutdown()
+
+    report(result)
+    if args.output:
+        result['recorded_at'] = datetime.now().isoformat(timespec='seconds')
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+-- Schema the application assumed before migrations were versioned.
+-- IF NOT EXISTS keeps this a no-op on databases created by hand.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(50) NOT NULL UNIQUE,
+    email VARCHAR(120) NOT NULL UNIQUE,
+    phone_number VARCHAR(20) NOT NULL UNIQUE,
+    password_hash VARCHAR(255) NOT NULL,
+    role VARCHAR(20) NOT NULL DEFAULT 'Employee'
+);
+
+CREATE TABLE IF NOT EXISTS greenhouses (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    location VARCHAR(255),
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS employee_assignments (
+    employee_id INT NOT NULL,
+    greenhouse_id INT NOT NULL,
+    PRIMARY KEY (employee_id, greenhouse_id),
+    FOREIGN KEY (employee_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (greenhouse_id) REFERENCES greenhouses (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    feedback_text TEXT NOT NULL,
+    related_table VARCHAR(50),
+    related_id INT,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS optimal_ranges (
+    parameter VARCHAR(50) PRIMARY KEY,
+    min_value DECIMAL(10, 2),
+    max_value DECIMAL(10, 2)
+);
+
+INSERT IGNORE INTO optimal_ranges (parameter, min_value, max_value) VALUES
+    ('temperature', 18, 40),
+    ('humidity', 30, 80),
+    ('light_intensity', 150, 1800),
+    ('pressure', 985, 1040),
+    ('air_quality', 0, 100),
+    ('pH', 6.0, 7.5),
+    ('moisture', 15, 55);
+
+CREATE TABLE IF NOT EXISTS sensor_readings (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    timestamp DATETIME NOT NULL,
+    temperature FLOAT,
+    pressure FLOAT,
+    light_intensity FLOAT,
+    humidity FLOAT,
+    air_quality FLOAT,
+    pH FLOAT,
+    moisture FLOAT,
+    greenhouse_zone VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    message VARCHAR(255),
+    timestamp DATETIME,
+    sensor_type VARCHAR(50),
+    reading_value FLOAT,
+    threshold_type VARCHAR(10),
+    threshold_value FLOAT,
+    status VARCHAR(20) DEFAULT 'Open',
+    alert_type VARCHAR(50),
+    description VARCHAR(255),
+    greenhouse_zone VARCHAR(100),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
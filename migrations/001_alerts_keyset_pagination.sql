@@ -0,0 +1,19 @@
+-- Keyset pagination for /alerts and the maintained open-alert count.
+
+-- Legacy checkers wrote 'Unresolved'; the lifecycle engine only uses 'Open'.
+UPDATE alerts SET status = 'Open' WHERE status = 'Unresolved';
+
+CREATE INDEX idx_alerts_status_ts ON alerts (status, timestamp, id);
+CREATE INDEX idx_alerts_zone_status_ts ON alerts (greenhouse_zone, status, timestamp, id);
+CREATE INDEX idx_alerts_sensor_status_ts ON alerts (sensor_type, status, timestamp, id);
+
+CREATE TABLE alert_counts (
+    greenhouse_zone VARCHAR(100) NOT NULL PRIMARY KEY,
+    open_count INT NOT NULL DEFAULT 0
+);
+
+INSERT INTO alert_counts (greenhouse_zone, open_count)
+SELECT COALESCE(greenhouse_zone, ''), COUNT(*)
+FROM alerts
+WHERE status = 'Open'
+GROUP BY COALESCE(greenhouse_zone, '');
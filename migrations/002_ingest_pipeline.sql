@@ -0,0 +1,32 @@
+-- Tables and columns used by the threshold cache, alert lifecycle and rollups.
+
+CREATE TABLE settings_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0
+);
+
+ALTER TABLE alerts
+    ADD COLUMN occurrences INT NOT NULL DEFAULT 1,
+    ADD COLUMN last_seen DATETIME NULL,
+    ADD COLUMN resolved_at DATETIME NULL;
+
+CREATE TABLE sensor_rollup_minute (
+    bucket_start DATETIME NOT NULL,
+    greenhouse_zone VARCHAR(100) NOT NULL,
+    reading_count INT NOT NULL DEFAULT 0,
+    temperature_count INT NOT NULL DEFAULT 0, temperature_sum DOUBLE NOT NULL DEFAULT 0, temperature_min FLOAT, temperature_max FLOAT,
+    pressure_count INT NOT NULL DEFAULT 0, pressure_sum DOUBLE NOT NULL DEFAULT 0, pressure_min FLOAT, pressure_max FLOAT,
+    light_intensity_count INT NOT NULL DEFAULT 0, light_intensity_sum DOUBLE NOT NULL DEFAULT 0, light_intensity_min FLOAT, light_intensity_max FLOAT,
+    humidity_count INT NOT NULL DEFAULT 0, humidity_sum DOUBLE NOT NULL DEFAULT 0, humidity_min FLOAT, humidity_max FLOAT,
+    air_quality_count INT NOT NULL DEFAULT 0, air_quality_sum DOUBLE NOT NULL DEFAULT 0, air_quality_min FLOAT, air_quality_max FLOAT,
+    pH_count INT NOT NULL DEFAULT 0, pH_sum DOUBLE NOT NULL DEFAULT 0, pH_min FLOAT, pH_max FLOAT,
+    moisture_count INT NOT NULL DEFAULT 0, moisture_sum DOUBLE NOT NULL DEFAULT 0, moisture_min FLOAT, moisture_max FLOAT,
+    PRIMARY KEY (bucket_start, greenhouse_zone),
+    KEY idx_rollup_minute_zone (greenhouse_zone, bucket_start)
+);
+
+CREATE TABLE sensor_rollup_hour LIKE sensor_rollup_minute;
+ALTER TABLE sensor_rollup_hour RENAME INDEX idx_rollup_minute_zone TO idx_rollup_hour_zone;
+
+CREATE TABLE sensor_rollup_day LIKE sensor_rollup_minute;
+ALTER TABLE sensor_rollup_day RENAME INDEX idx_rollup_minute_zone TO idx_rollup_day_zone;
@@ -0,0 +1,6 @@
+-- Indexes behind the dashboard, history, export and access-control queries.
+
+CREATE INDEX idx_readings_ts ON sensor_readings (timestamp);
+CREATE INDEX idx_readings_zone_ts ON sensor_readings (greenhouse_zone, timestamp);
+CREATE INDEX idx_users_role ON users (role);
+CREATE INDEX idx_assignments_greenhouse ON employee_assignments (greenhouse_id);
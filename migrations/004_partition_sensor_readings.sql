@@ -0,0 +1,12 @@
+-- Range-partition sensor_readings by month. Every unique key must contain the
+-- partitioning column, so the primary key becomes (id, timestamp).
+-- Monthly partitions are split off p_future by `flask partitions-maintain`.
+
+ALTER TABLE sensor_readings
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, timestamp);
+
+ALTER TABLE sensor_readings
+    PARTITION BY RANGE COLUMNS (timestamp) (
+        PARTITION p_future VALUES LESS THAN (MAXVALUE)
+    );
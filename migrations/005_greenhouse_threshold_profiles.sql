@@ -0,0 +1,27 @@
+-- Zones belong to greenhouses, and a greenhouse or a single zone can override
+-- optimal_ranges. A zone resolves its ranges zone first, then its greenhouse,
+-- then the global optimal_ranges row, parameter by parameter.
+
+CREATE TABLE greenhouse_zones (
+    greenhouse_zone VARCHAR(100) NOT NULL PRIMARY KEY,
+    greenhouse_id INT NOT NULL,
+    KEY idx_greenhouse_zones_greenhouse (greenhouse_id, greenhouse_zone),
+    FOREIGN KEY (greenhouse_id) REFERENCES greenhouses (id) ON DELETE CASCADE
+);
+
+CREATE TABLE greenhouse_ranges (
+    greenhouse_id INT NOT NULL,
+    parameter VARCHAR(50) NOT NULL,
+    min_value DECIMAL(10, 2),
+    max_value DECIMAL(10, 2),
+    PRIMARY KEY (greenhouse_id, parameter),
+    FOREIGN KEY (greenhouse_id) REFERENCES greenhouses (id) ON DELETE CASCADE
+);
+
+CREATE TABLE zone_ranges (
+    greenhouse_zone VARCHAR(100) NOT NULL,
+    parameter VARCHAR(50) NOT NULL,
+    min_value DECIMAL(10, 2),
+    max_value DECIMAL(10, 2),
+    PRIMARY KEY (greenhouse_zone, parameter)
+);
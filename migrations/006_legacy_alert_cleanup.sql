@@ -0,0 +1,30 @@
+-- Legacy alerts the lifecycle engine can never resolve, and the counts 001 seeded from them.
+
+-- The original checkers left timestamp NULL; keyset pagination orders and encodes cursors on it.
+UPDATE alerts SET timestamp = created_at WHERE timestamp IS NULL;
+
+-- Untyped rows (one per breaching reading) match no (sensor_type, threshold_type) tracker key.
+UPDATE alerts
+SET status = 'Resolved', resolved_at = COALESCE(last_seen, timestamp)
+WHERE status = 'Open' AND (sensor_type IS NULL OR threshold_type IS NULL);
+
+-- Typed duplicates collapse onto the newest open row per tracker key, which the tracker loads.
+UPDATE alerts a
+JOIN (
+    SELECT greenhouse_zone, sensor_type, threshold_type, MAX(id) AS keep_id
+    FROM alerts
+    WHERE status = 'Open'
+    GROUP BY greenhouse_zone, sensor_type, threshold_type
+) k ON a.greenhouse_zone <=> k.greenhouse_zone
+   AND a.sensor_type = k.sensor_type
+   AND a.threshold_type = k.threshold_type
+SET a.status = 'Resolved', a.resolved_at = COALESCE(a.last_seen, a.timestamp)
+WHERE a.status = 'Open' AND a.id < k.keep_id;
+
+DELETE FROM alert_counts;
+
+INSERT INTO alert_counts (greenhouse_zone, open_count)
+SELECT COALESCE(greenhouse_zone, ''), COUNT(*)
+FROM alerts
+WHERE status = 'Open'
+GROUP BY COALESCE(greenhouse_zone, '');
@@ -0,0 +1,163 @@
+-- Schema for the embedded SQLite backend: the MySQL migrations folded into one
+-- idempotent script. Keep it in step when adding a migration.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    phone_number TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'Employee'
+);
+CREATE INDEX IF NOT EXISTS idx_users_role ON users (role);
+
+CREATE TABLE IF NOT EXISTS greenhouses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    location TEXT,
+    description TEXT
+);
+
+CREATE TABLE IF NOT EXISTS employee_assignments (
+    employee_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    greenhouse_id INTEGER NOT NULL REFERENCES greenhouses (id) ON DELETE CASCADE,
+    PRIMARY KEY (employee_id, greenhouse_id)
+);
+CREATE INDEX IF NOT EXISTS idx_assignments_greenhouse ON employee_assignments (greenhouse_id);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    feedback_text TEXT NOT NULL,
+    related_table TEXT,
+    related_id INTEGER,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS optimal_ranges (
+    parameter TEXT PRIMARY KEY,
+    min_value REAL,
+    max_value REAL
+);
+
+INSERT OR IGNORE INTO optimal_ranges (parameter, min_value, max_value) VALUES
+    ('temperature', 18, 40),
+    ('humidity', 30, 80),
+    ('light_intensity', 150, 1800),
+    ('pressure', 985, 1040),
+    ('air_quality', 0, 100),
+    ('pH', 6.0, 7.5),
+    ('moisture', 15, 55);
+
+CREATE TABLE IF NOT EXISTS settings_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sensor_readings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp DATETIME NOT NULL,
+    temperature REAL,
+    pressure REAL,
+    light_intensity REAL,
+    humidity REAL,
+    air_quality REAL,
+    pH REAL,
+    moisture REAL,
+    greenhouse_zone TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_readings_ts ON sensor_readings (timestamp);
+CREATE INDEX IF NOT EXISTS idx_readings_zone_ts ON sensor_readings (greenhouse_zone, timestamp);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    message TEXT,
+    timestamp DATETIME,
+    sensor_type TEXT,
+    reading_value REAL,
+    threshold_type TEXT,
+    threshold_value REAL,
+    status TEXT DEFAULT 'Open',
+    alert_type TEXT,
+    description TEXT,
+    greenhouse_zone TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    occurrences INTEGER NOT NULL DEFAULT 1,
+    last_seen DATETIME,
+    resolved_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_status_ts ON alerts (status, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_alerts_zone_status_ts ON alerts (greenhouse_zone, status, timestamp, id);
+CREATE INDEX IF NOT EXISTS idx_alerts_sensor_status_ts ON alerts (sensor_type, status, timestamp, id);
+
+CREATE TABLE IF NOT EXISTS alert_counts (
+    greenhouse_zone TEXT NOT NULL PRIMARY KEY,
+    open_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sensor_rollup_minute (
+    bucket_start DATETIME NOT NULL,
+    greenhouse_zone TEXT NOT NULL,
+    reading_count INTEGER NOT NULL DEFAULT 0,
+    temperature_count INTEGER NOT NULL DEFAULT 0, temperature_sum REAL NOT NULL DEFAULT 0, temperature_min REAL, temperature_max REAL,
+    pressure_count INTEGER NOT NULL DEFAULT 0, pressure_sum REAL NOT NULL DEFAULT 0, pressure_min REAL, pressure_max REAL,
+    light_intensity_count INTEGER NOT NULL DEFAULT 0, light_intensity_sum REAL NOT NULL DEFAULT 0, light_intensity_min REAL, light_intensity_max REAL,
+    humidity_count INTEGER NOT NULL DEFAULT 0, humidity_sum REAL NOT NULL DEFAULT 0, humidity_min REAL, humidity_max REAL,
+    air_quality_count INTEGER NOT NULL DEFAULT 0, air_quality_sum REAL NOT NULL DEFAULT 0, air_quality_min REAL, air_quality_max REAL,
+    pH_count INTEGER NOT NULL DEFAULT 0, pH_sum REAL NOT NULL DEFAULT 0, pH_min REAL, pH_max REAL,
+    moisture_count INTEGER NOT NULL DEFAULT 0, moisture_sum REAL NOT NULL DEFAULT 0, moisture_min REAL, moisture_max REAL,
+    PRIMARY KEY (bucket_start, greenhouse_zone)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_minute_zone ON sensor_rollup_minute (greenhouse_zone, bucket_start);
+
+CREATE TABLE IF NOT EXISTS sensor_rollup_hour (
+    bucket_start DATETIME NOT NULL,
+    greenhouse_zone TEXT NOT NULL,
+    reading_count INTEGER NOT NULL DEFAULT 0,
+    temperature_count INTEGER NOT NULL DEFAULT 0, temperature_sum REAL NOT NULL DEFAULT 0, temperature_min REAL, temperature_max REAL,
+    pressure_count INTEGER NOT NULL DEFAULT 0, pressure_sum REAL NOT NULL DEFAULT 0, pressure_min REAL, pressure_max REAL,
+    light_intensity_count INTEGER NOT NULL DEFAULT 0, light_intensity_sum REAL NOT NULL DEFAULT 0, light_intensity_min REAL, light_intensity_max REAL,
+    humidity_count INTEGER NOT NULL DEFAULT 0, humidity_sum REAL NOT NULL DEFAULT 0, humidity_min REAL, humidity_max REAL,
+    air_quality_count INTEGER NOT NULL DEFAULT 0, air_quality_sum REAL NOT NULL DEFAULT 0, air_quality_min REAL, air_quality_max REAL,
+    pH_count INTEGER NOT NULL DEFAULT 0, pH_sum REAL NOT NULL DEFAULT 0, pH_min REAL, pH_max REAL,
+    moisture_count INTEGER NOT NULL DEFAULT 0, moisture_sum REAL NOT NULL DEFAULT 0, moisture_min REAL, moisture_max REAL,
+    PRIMARY KEY (bucket_start, greenhouse_zone)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_hour_zone ON sensor_rollup_hour (greenhouse_zone, bucket_start);
+
+CREATE TABLE IF NOT EXISTS sensor_rollup_day (
+    bucket_start DATETIME NOT NULL,
+    greenhouse_zone TEXT NOT NULL,
+    reading_count INTEGER NOT NULL DEFAULT 0,
+    temperature_count INTEGER NOT NULL DEFAULT 0, temperature_sum REAL NOT NULL DEFAULT 0, temperature_min REAL, temperature_max REAL,
+    pressure_count INTEGER NOT NULL DEFAULT 0, pressure_sum REAL NOT NULL DEFAULT 0, pressure_min REAL, pressure_max REAL,
+    light_intensity_count INTEGER NOT NULL DEFAULT 0, light_intensity_sum REAL NOT NULL DEFAULT 0, light_intensity_min REAL, light_intensity_max REAL,
+    humidity_count INTEGER NOT NULL DEFAULT 0, humidity_sum REAL NOT NULL DEFAULT 0, humidity_min REAL, humidity_max REAL,
+    air_quality_count INTEGER NOT NULL DEFAULT 0, air_quality_sum REAL NOT NULL DEFAULT 0, air_quality_min REAL, air_quality_max REAL,
+    pH_count INTEGER NOT NULL DEFAULT 0, pH_sum REAL NOT NULL DEFAULT 0, pH_min REAL, pH_max REAL,
+    moisture_count INTEGER NOT NULL DEFAULT 0, moisture_sum REAL NOT NULL DEFAULT 0, moisture_min REAL, moisture_max REAL,
+    PRIMARY KEY (bucket_start, greenhouse_zone)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_day_zone ON sensor_rollup_day (greenhouse_zone, bucket_start);
+
+CREATE TABLE IF NOT EXISTS greenhouse_zones (
+    greenhouse_zone TEXT NOT NULL PRIMARY KEY,
+    greenhouse_id INTEGER NOT NULL REFERENCES greenhouses (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_greenhouse_zones_greenhouse ON greenhouse_zones (greenhouse_id, greenhouse_zone);
+
+CREATE TABLE IF NOT EXISTS greenhouse_ranges (
+    greenhouse_id INTEGER NOT NULL REFERENCES greenhouses (id) ON DELETE CASCADE,
+    parameter TEXT NOT NULL,
+    min_value REAL,
+    max_value REAL,
+    PRIMARY KEY (greenhouse_id, parameter)
+);
+
+CREATE TABLE IF NOT EXISTS zone_ranges (
+    greenhouse_zone TEXT NOT NULL,
+    parameter TEXT NOT NULL,
+    min_value REAL,
+    max_value REAL,
+    PRIMARY KEY (greenhouse_zone, parameter)
+);
@@ -0,0 +1,46 @@
+"""Shared setup for tests that call the app through a logged-in test client."""
+import unittest
+
+from app import app
+from app.utils.db_utils import AnonymousUser
+from app.utils.threshold_cache import threshold_cache
+from app.utils.user_cache import user_cache
+
+# Config.SECRET_KEY only comes from the environment, and logging in through the session needs one
+if not app.config['SECRET_KEY']:
+    app.config['SECRET_KEY'] = 'test'
+
+
+def log_in(client, user_id, username='manager', role='Manager', greenhouse_ids=None):
+    """Sign client in; the user is cached, so requests do no user lookup."""
+    user_cache.put(AnonymousUser(user_id, username, role, greenhouse_ids))
+    set_session_user(client, user_id)
+
+
+def set_session_user(client, user_id):
+    """Sign client in as user_id without caching the user, so the first request loads it."""
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+
+
+class LoggedInTestCase(unittest.TestCase):
+    """self.client is logged in as user (None: not logged in), with CSRF off.
+
+    The threshold and user caches are cleared around every test. Subclasses
+    that override setUp/tearDown call super() first/last.
+    """
+
+    user = (1, 'manager', 'Manager')
+
+    def setUp(self):
+        app.config['WTF_CSRF_ENABLED'] = False
+        threshold_cache.invalidate()
+        user_cache.clear()
+        self.client = app.test_client()
+        if self.user is not None:
+            log_in(self.client, *self.user)
+
+    def tearDown(self):
+        app.config['WTF_CSRF_ENABLED'] = True
+        threshold_cache.invalidate()
+        user_cache.clear()
@@ -0,0 +1,68 @@
+import unittest
+from app.utils.alert_engine import ThresholdIndex, compile_thresholds, evaluate, evaluate_zones, count_by_reading
+
+RANGES = {
+    'temperature': {'parameter': 'temperature', 'min_value': 18, 'max_value': 40},
+    'pH': {'parameter': 'pH', 'min_value': 6.0, 'max_value': 7.5},
+    'moisture': {'parameter': 'moisture', 'min_value': 15, 'max_value': None},
+}
+
+
+class AlertEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.compiled = compile_thresholds(RANGES)
+
+    def test_missing_bounds_never_fire(self):
+        alerts = evaluate([{'temperature': 25, 'moisture': 99, 'humidity': 1000}], self.compiled)
+        self.assertEqual(alerts, [])
+
+    def test_alerts_ordered_by_reading_then_parameter(self):
+        readings = [
+            {'temperature': 45, 'pH': 5.0, 'timestamp': 't0', 'greenhouse_zone': 'Zone A'},
+            {'temperature': 20, 'moisture': 10, 'timestamp': 't1', 'greenhouse_zone': 'Zone B'},
+            {'temperature': 10, 'pH': 8.0, 'timestamp': 't2', 'greenhouse_zone': 'Zone A'},
+        ]
+
+        alerts = evaluate(readings, self.compiled)
+
+        self.assertEqual(
+            [(a['index'], a['sensor_type'], a['threshold_type']) for a in alerts],
+            [(0, 'temperature', 'max'), (0, 'pH', 'min'), (1, 'moisture', 'min'),
+             (2, 'temperature', 'min'), (2, 'pH', 'max')]
+        )
+        self.assertEqual(alerts[0]['message'], 'temperature too high (45 > 40)')
+        self.assertEqual(alerts[2]['greenhouse_zone'], 'Zone B')
+        self.assertEqual(count_by_reading(alerts, 3), [2, 1, 2])
+
+    def test_batch_matches_single_evaluation(self):
+        readings = [{'temperature': t, 'pH': 7.0} for t in (10, 20, 50, 18, 40)]
+
+        batch = evaluate(readings, self.compiled)
+        single = []
+        for i, reading in enumerate(readings):
+            for alert in evaluate([reading], self.compiled):
+                alert['index'] = i
+                single.append(alert)
+
+        strip = lambda alerts: [{k: v for k, v in a.items() if k != 'timestamp'} for a in alerts]
+        self.assertEqual(strip(batch), strip(single))
+
+    def test_zones_use_their_own_profile(self):
+        cool = compile_thresholds(dict(RANGES, temperature={'min_value': 5, 'max_value': 20}))
+        index = ThresholdIndex(self.compiled, {'Zone B': cool})
+        readings = [{'temperature': 30, 'pH': 5.0, 'timestamp': 't0', 'greenhouse_zone': 'Zone A'},
+                    {'temperature': 30, 'pH': 5.0, 'timestamp': 't0', 'greenhouse_zone': 'Zone B'},
+                    {'temperature': 10, 'timestamp': 't1', 'greenhouse_zone': 'Zone A'},
+                    {'temperature': 10, 'timestamp': 't1', 'greenhouse_zone': 'Zone B'}]
+
+        alerts = evaluate_zones(readings, index)
+
+        self.assertEqual([(a['index'], a['sensor_type'], a['threshold_type']) for a in alerts],
+                         [(0, 'pH', 'min'), (1, 'temperature', 'max'), (1, 'pH', 'min'), (2, 'temperature', 'min')])
+        self.assertEqual(alerts[1]['threshold_value'], 20)
+        self.assertEqual(evaluate_zones(readings, self.compiled), evaluate(readings, self.compiled))
+
+
+if __name__ == '__main__':
+    unittest.main()
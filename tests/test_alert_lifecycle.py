@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.utils.alert_engine import compile_thresholds
+from app.utils.alert_lifecycle import AlertTracker
+
+
+class AlertTrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.compiled = compile_thresholds({'temperature': {'min_value': 18, 'max_value': 40}})
+        self.tracker = AlertTracker(hysteresis=0.1, min_dwell=60)
+        self.cursor = MagicMock()
+        self.cursor.fetchall.return_value = []
+        self.cursor.lastrowid = 7
+
+    def reading(self, temperature, minute, zone='Zone A'):
+        return {'temperature': temperature, 'greenhouse_zone': zone,
+                'timestamp': f'2025-04-20T10:{minute:02d}:00'}
+
+    def statements(self, keyword):
+        calls = self.cursor.execute.call_args_list + self.cursor.executemany.call_args_list
+        return [c for c in calls if keyword in c[0][0]]
+
+    def test_sustained_breach_opens_one_alert(self):
+        _, opened = self.tracker.process(self.cursor, [self.reading(42, 0)], self.compiled)
+        alerts, repeated = self.tracker.process(
+            self.cursor, [self.reading(42, m) for m in range(1, 10)], self.compiled)
+
+        self.assertEqual([t['event'] for t in opened], ['opened'])
+        self.assertEqual(self.statements('INSERT INTO alert_counts')[0][0][1], [('Zone A', 1)])
+        self.assertEqual(repeated, [])
+        self.assertEqual(len(alerts), 9)
+        self.assertEqual(len(self.statements('INSERT INTO alerts')), 1)
+        bumps = self.statements('occurrences = occurrences + %s')
+        self.assertEqual(len(bumps), 1)
+        self.assertEqual(bumps[0][0][1], [(9, datetime(2025, 4, 20, 10, 9), 42.0, 7)])
+
+    def test_value_inside_hysteresis_band_keeps_alert_open(self):
+        # Band is 10% of the 18-40 range, so the alert only clears at or below 37.8
+        readings = [self.reading(42, 0), self.reading(39, 1), self.reading(39, 5), self.reading(41, 6)]
+        _, transitions = self.tracker.process(self.cursor, readings, self.compiled)
+
+        self.assertEqual([t['event'] for t in transitions], ['opened'])
+        self.assertEqual(len(self.statements("status = %s, resolved_at")), 0)
+
+    def test_resolves_after_dwell_time(self):
+        readings = [self.reading(42, 0), self.reading(30, 1), self.reading(30, 1), self.reading(30, 2)]
+        _, transitions = self.tracker.process(self.cursor, readings, self.compiled)
+
+        self.assertEqual([t['event'] for t in transitions], ['opened', 'resolved'])
+        self.assertEqual(len(self.statements("status = %s, resolved_at")), 1)
+        # Opened and resolved in one batch: the zone's open count nets out
+        self.assertEqual(self.statements('INSERT INTO alert_counts'), [])
+
+        _, transitions = self.tracker.process(self.cursor, [self.reading(45, 3)], self.compiled)
+        self.assertEqual([t['event'] for t in transitions], ['opened'])
+
+    def test_warm_loads_open_alerts(self):
+        self.cursor.fetchall.return_value = [
+            {'id': 3, 'greenhouse_zone': 'Zone A', 'sensor_type': 'temperature',
+             'threshold_type': 'max', 'last_seen': None}
+        ]
+        alerts, transitions = self.tracker.process(self.cursor, [self.reading(42, 0)], self.compiled)
+
+        self.assertEqual(transitions, [])
+        self.assertEqual(alerts[0]['alert_id'], 3)
+        self.assertEqual(len(self.statements('INSERT INTO alerts')), 0)
+
+    def test_rollback_reloads_only_the_batch_zones(self):
+        self.tracker.process(self.cursor, [self.reading(42, 0), self.reading(42, 0, 'Zone B')], self.compiled)
+        # Zone B is back in range and part way through its dwell
+        self.tracker.process(self.cursor, [self.reading(30, 1, 'Zone B')], self.compiled)
+        zone_b = self.tracker._open['Zone B']
+
+        batch = [self.reading(42, 2)]
+        checkpoint = self.tracker.checkpoint(batch)
+        self.tracker.process(self.cursor, batch, self.compiled)
+        self.tracker.rollback(checkpoint)
+        self.cursor.reset_mock()
+        self.cursor.fetchall.return_value = [
+            {'id': 7, 'greenhouse_zone': 'Zone A', 'sensor_type': 'temperature',
+             'threshold_type': 'max', 'last_seen': datetime(2025, 4, 20, 10, 0)}
+        ]
+        _, transitions = self.tracker.process(self.cursor, batch, self.compiled)
+
+        self.assertEqual(transitions, [])
+        reload = self.statements('FROM alerts WHERE status')
+        self.assertEqual(len(reload), 1)
+        self.assertEqual(reload[0][0][1], ['Open', 'Zone A'])
+        self.assertIs(self.tracker._open['Zone B'], zone_b)
+        self.assertEqual(zone_b[('temperature', 'max')].clear_since, datetime(2025, 4, 20, 10, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from app.utils.alert_engine import compile_thresholds
+from app.utils.alert_lifecycle import AlertTracker
+from app.utils.anomaly import AnomalyDetector
+
+START = datetime(2025, 4, 20)
+
+
+def readings(values, zone='Zone A', param='pH', minutes=5, offset=0):
+    return [{'timestamp': (START + timedelta(minutes=minutes * (offset + i))).isoformat(),
+             'greenhouse_zone': zone, param: value} for i, value in enumerate(values)]
+
+
+class AnomalyDetectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.detector = AnomalyDetector(window=200, alpha=0.1, drift_limit=4.0, spike_limit=6.0, min_samples=50)
+
+    def noise(self, count, level=6.8, sigma=0.05):
+        return [self.rng.gauss(level, sigma) for _ in range(count)]
+
+    def test_stationary_noise_raises_nothing(self):
+        self.assertEqual(self.detector.observe(readings(self.noise(3000))), [])
+
+    def test_slow_drift_is_caught_before_the_hard_limit(self):
+        self.detector.observe(readings(self.noise(300)))
+        # pH creeping down 0.005 per reading (0.06/h), with the same noise; the hard minimum is 6.0
+        creep = [value - 0.005 * i for i, value in enumerate(self.noise(150))]
+
+        alerts = self.detector.observe(readings(creep, offset=300))
+
+        self.assertTrue(alerts)
+        first = alerts[0]
+        self.assertEqual(first['threshold_type'], 'drift')
+        self.assertIn('pH drifting down', first['message'])
+        self.assertGreater(first['reading_value'], 6.5)
+        self.assertLess(self.detector.state('Zone A', 'pH').rate, 0)
+
+    def test_spike_after_warm_up_only(self):
+        early = self.detector.observe(readings(self.noise(10) + [9.5]))
+        self.detector.observe(readings(self.noise(100), offset=11))
+
+        alerts = self.detector.observe(readings([9.5], offset=111))
+
+        self.assertEqual(early, [])
+        self.assertEqual([(a['index'], a['threshold_type']) for a in alerts], [(0, 'spike')])
+        self.assertGreater(alerts[0]['threshold_value'], 6.8)
+
+    def test_state_is_constant_per_series(self):
+        batch = [dict(reading, temperature=20.0) for reading in readings(self.noise(1000))]
+        self.detector.observe(batch + readings(self.noise(1000), zone='Zone B'))
+
+        self.assertEqual(len(self.detector), 3)
+        state = self.detector.state('Zone A', 'pH')
+        self.assertEqual(state.count, 1000)
+        self.assertAlmostEqual(state.mean, 6.8, places=1)
+        self.assertAlmostEqual(state.variance ** 0.5, 0.05, places=2)
+
+    def test_rate_of_change_per_hour(self):
+        self.detector.observe(readings([20 + i / 12 for i in range(100)], param='temperature'))
+
+        self.assertAlmostEqual(self.detector.state('Zone A', 'temperature').rate, 1.0, places=3)
+
+    def test_restore_undoes_a_rolled_back_batch(self):
+        self.detector.observe(readings(self.noise(100)))
+        before = self.detector.state('Zone A', 'pH').mean
+        batch = readings(self.noise(20), offset=100) + readings([20.0], zone='Zone B', param='temperature')
+
+        saved = self.detector.snapshot(batch)
+        self.detector.observe(batch)
+        self.detector.restore(saved)
+        # The replay after a rollback counts the batch once
+        self.detector.observe(batch)
+
+        self.assertEqual(self.detector.state('Zone A', 'pH').count, 120)
+        self.assertEqual(self.detector.state('Zone B', 'temperature').count, 1)
+        self.detector.restore(saved)
+        self.assertEqual(self.detector.state('Zone A', 'pH').mean, before)
+        self.assertIsNone(self.detector.state('Zone B', 'temperature'))
+
+
+class AnomalyLifecycleTest(unittest.TestCase):
+
+    def test_drift_opens_one_alert_and_resolves_after_dwell(self):
+        rng = random.Random(3)
+        tracker = AlertTracker(min_dwell=600, detector=AnomalyDetector(window=200, min_samples=50))
+        cursor = MagicMock()
+        cursor.fetchall.return_value = []
+        cursor.lastrowid = 11
+        compiled = compile_thresholds({'pH': {'min_value': 6.0, 'max_value': 7.5}})
+        tracker.process(cursor, readings([rng.gauss(6.8, 0.05) for _ in range(300)]), compiled)
+
+        drift = readings([rng.gauss(6.8, 0.05) - 0.005 * i for i in range(120)], offset=300)
+        _, opened = tracker.process(cursor, drift, compiled)
+        # Back to the old level and held there: the detector stops, then the dwell passes
+        _, resolved = tracker.process(cursor, readings([rng.gauss(6.8, 0.05) for _ in range(60)], offset=420),
+                                      compiled)
+
+        self.assertEqual([(t['event'], t['threshold_type']) for t in opened], [('opened', 'drift')])
+        self.assertEqual([(t['event'], t['threshold_type']) for t in resolved], [('resolved', 'drift')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import math
+import unittest
+from app.utils.downsample import lttb, minmax, downsample
+
+
+class DownsampleTest(unittest.TestCase):
+
+    def series(self, n):
+        xs = list(range(n))
+        ys = [math.sin(x / 50.0) * 10 for x in xs]
+        ys[500] = 100.0  # spike that must survive downsampling
+        return xs, ys
+
+    def test_lttb_keeps_endpoints_and_spike(self):
+        xs, ys = self.series(10000)
+        indices = lttb(xs, ys, 200)
+
+        self.assertEqual(len(indices), 200)
+        self.assertEqual((indices[0], indices[-1]), (0, 9999))
+        self.assertEqual(indices, sorted(indices))
+        self.assertIn(500, indices)
+
+    def test_minmax_keeps_extremes(self):
+        xs, ys = self.series(10000)
+        indices = minmax(xs, ys, 200)
+
+        self.assertLessEqual(len(indices), 200)
+        self.assertIn(500, indices)
+        self.assertEqual(indices, sorted(indices))
+
+    def test_small_series_untouched(self):
+        self.assertEqual(lttb([1, 2, 3], [1, 2, 3], 500), [0, 1, 2])
+
+    def test_downsample_drops_gaps(self):
+        t, v = downsample([1, 2, 3, 4], [1.0, None, 3.0, 4.0], 10)
+        self.assertEqual((t, v), ([1, 3, 4], [1.0, 3.0, 4.0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from app.utils import db_utils, storage
+from app.utils.db_utils import write_readings
+from app.utils.export import COLUMNS, export_readings, iter_chunks, read_columnar
+from app.utils.pool import InstrumentedPool
+from helpers import LoggedInTestCase, log_in
+
+
+class ExportTest(LoggedInTestCase):
+    """Exports from the embedded SQLite backend, which runs the same query as MySQL."""
+
+    def setUp(self):
+        super().setUp()
+        self.previous = (db_utils.connection_pool, storage.dialect)
+        storage.dialect = storage.SQLITE
+        db_utils.connection_pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 2)
+        self.conn = db_utils.get_db_connection()
+        readings = []
+        for n in range(7):
+            readings.append({'timestamp': f"2025-04-{20 + n // 3}T10:00:{n:02d}.250000", 'temperature': 20.5 + n,
+                             'pressure': 1010.0, 'light_intensity': 800, 'humidity': None, 'air_quality': 40,
+                             'pH': 6.5, 'moisture': 30.0, 'greenhouse_zone': f"Zone {'AB'[n % 2]}"})
+        write_readings(self.conn.cursor(), readings)
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        db_utils.connection_pool, storage.dialect = self.previous
+        super().tearDown()
+
+    def export(self, fmt, zones=None, chunk_size=3):
+        return b''.join(export_readings(self.conn, fmt, datetime(2025, 4, 20), datetime(2025, 4, 22),
+                                        zones, chunk_size))
+
+    def test_chunks_are_bounded_and_ordered(self):
+        chunks = list(iter_chunks(self.conn, datetime(2025, 4, 20), datetime(2025, 4, 23), chunk_size=3))
+
+        self.assertEqual([len(rows) for rows in chunks], [3, 3, 1])
+        stamps = [row[1] for rows in chunks for row in rows]
+        self.assertEqual(stamps, sorted(stamps))
+
+    def test_csv_has_header_and_range_rows(self):
+        rows = list(csv.reader(io.StringIO(self.export('csv').decode())))
+
+        self.assertEqual(tuple(rows[0]), COLUMNS)
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[1][1], '2025-04-20 10:00:00.250000')
+        self.assertEqual(rows[1][COLUMNS.index('humidity')], '')
+
+    def test_ndjson_filters_zones(self):
+        lines = [json.loads(line) for line in self.export('ndjson', zones=['Zone B']).splitlines()]
+
+        self.assertEqual([line['greenhouse_zone'] for line in lines], ['Zone B'] * 3)
+        self.assertEqual(lines[0]['temperature'], 21.5)
+        self.assertIsNone(lines[0]['humidity'])
+
+    def test_columnar_round_trip(self):
+        groups = list(read_columnar(io.BytesIO(self.export('columnar'))))
+
+        self.assertEqual([len(group['id']) for group in groups], [3, 3])
+        self.assertEqual(groups[0]['timestamp'][0], datetime(2025, 4, 20, 10, 0, 0, 250000))
+        self.assertEqual(groups[1]['temperature'], [23.5, 24.5, 25.5])
+        self.assertEqual(groups[1]['humidity'], [None] * 3)
+        self.assertEqual(groups[1]['greenhouse_zone'], ['Zone B', 'Zone A', 'Zone B'])
+
+    def test_columnar_is_smaller_than_csv(self):
+        self.assertLess(len(self.export('columnar', chunk_size=100)), len(self.export('csv')))
+
+    def test_abandoned_stream_drains_unbuffered_result(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchmany.return_value = [(1,)]
+        stream = iter_chunks(conn, datetime(2025, 4, 20), datetime(2025, 4, 21))
+        next(stream)
+        stream.close()
+
+        conn.consume_results.assert_called_once()
+        conn.cursor.assert_called_once_with(buffered=False)
+
+    def test_export_endpoint_streams_download(self):
+        response = self.client.get('/api/export?start=2025-04-21&end=2025-04-22&format=ndjson&zone=Zone+A')
+        bad = self.client.get('/api/export?format=xlsx')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertIn('readings_20250421_20250423.ndjson', response.headers['Content-Disposition'])
+        self.assertEqual(len(response.get_data().splitlines()), 2)
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(db_utils.connection_pool.stats()['in_use'], 1)
+
+    @patch('app.routes.threshold_cache.zones', side_effect=RuntimeError('pool exhausted'))
+    def test_export_answers_json_when_the_zone_lookup_fails(self, mock_zones):
+        log_in(self.client, 2, 'employee', 'Employee', frozenset({1}))
+
+        response = self.client.get('/api/export')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.get_json(), {'error': 'Failed to start export'})
+
+
+if __name__ == '__main__':
+    unittest.main()
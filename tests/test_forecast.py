@@ -0,0 +1,135 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+from app.utils import db_utils, storage
+from app.utils.alert_engine import compile_thresholds
+from app.utils.alert_lifecycle import alert_tracker
+from app.utils.forecast import Forecaster, TrendState, forecaster
+from app.utils.pool import InstrumentedPool
+from helpers import LoggedInTestCase
+
+START = datetime(2025, 4, 20)
+READING = {'temperature': 25.0, 'pressure': 1010.0, 'light_intensity': 800, 'humidity': 50.0,
+           'air_quality': 40, 'pH': 6.5}
+
+
+def readings(values, zone='Zone A', param='moisture', minutes=10, offset=0):
+    return [{'timestamp': (START + timedelta(minutes=minutes * (offset + i))).isoformat(),
+             'greenhouse_zone': zone, param: value} for i, value in enumerate(values)]
+
+
+class ForecasterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.forecaster = Forecaster(half_life=6.0, season_alpha=0.0)
+        self.loader = MagicMock(return_value=[])
+        self.compiled = compile_thresholds({'moisture': {'min_value': 30, 'max_value': 80}})
+        # Prime from an empty rollup table so updates are folded in from here on
+        self.forecast()
+
+    def forecast(self, zone='Zone A', horizon=24):
+        return self.forecaster.forecast(self.loader, zone, self.compiled, ['moisture'], horizon)
+
+    def test_linear_decline_reaches_min(self):
+        # Moisture falling 1.5 per hour from 50: the last reading is at 46.25, 10.83h above the min
+        self.forecaster.update(readings([50 - 0.25 * i for i in range(16)]))
+
+        moisture = self.forecast()['moisture']
+
+        self.assertAlmostEqual(moisture['trend_per_hour'], -1.5, places=3)
+        self.assertAlmostEqual(moisture['value'], 46.25, places=2)
+        self.assertEqual(moisture['hours_to_min'], 11.0)
+        self.assertIsNone(moisture['hours_to_max'])
+        self.assertEqual(len(moisture['forecast']), 24)
+        self.assertEqual(moisture['samples'], 16)
+        self.assertIsNone(self.forecast(horizon=8)['moisture']['hours_to_min'])
+
+    def test_cached_until_the_zones_next_reading(self):
+        self.forecaster.update(readings([50, 49, 48]) + readings([60, 61], zone='Zone B'))
+        first = self.forecast()
+
+        self.assertIs(self.forecast(), first)
+        self.forecaster.update(readings([62], zone='Zone B', offset=2))
+        self.assertIs(self.forecast(), first)
+        self.forecaster.update(readings([47], offset=3))
+        self.assertIsNot(self.forecast(), first)
+        self.loader.assert_called_once_with()
+
+    def test_primed_from_hourly_rollups(self):
+        self.forecaster.clear()
+        self.forecaster.update(readings([10, 20]))
+        self.loader.return_value = [
+            {'bucket_start': START + timedelta(hours=h), 'greenhouse_zone': 'Zone A',
+             'moisture': 70.0 - 2 * h, 'pH': None}
+            for h in range(6)]
+
+        moisture = self.forecast()['moisture']
+
+        self.assertAlmostEqual(moisture['trend_per_hour'], -2.0, places=6)
+        self.assertEqual(moisture['at'], '2025-04-20T05:30:00')
+        self.assertEqual(self.forecaster.zones(self.loader), ['Zone A'])
+        self.assertIsNone(self.forecast('Zone B')['moisture'])
+
+    def test_listing_zones_primes(self):
+        fresh = Forecaster()
+        loader = MagicMock(return_value=[{'bucket_start': START, 'greenhouse_zone': 'Zone C', 'moisture': 40.0}])
+        fresh.update(readings([10, 20]))
+
+        self.assertEqual(fresh.zones(loader), ['Zone C'])
+        fresh.update(readings([10, 20]))
+        self.assertEqual(fresh.zones(loader), ['Zone A', 'Zone C'])
+        loader.assert_called_once_with()
+
+    def test_old_readings_fade_and_origin_moves(self):
+        state = TrendState(0.0)
+        for i in range(2000):
+            t = 480000.0 + i / 6
+            state.add(t, 20.0 + (0.5 if i % 2 else -0.5) + (i >= 1000) * 0.1 * (t - 480000.0 - 1000 / 6), 6.0, 0.0)
+
+        _, slope = state.line()
+
+        self.assertAlmostEqual(slope, 0.1, places=2)
+        self.assertLess(state.last - state.origin, 24.0 + 1e-9)
+        self.assertEqual(state.count, 2000)
+
+
+class ForecastRouteTest(LoggedInTestCase):
+    """Ingest and forecasts against the embedded SQLite backend."""
+
+    def setUp(self):
+        super().setUp()
+        self.previous = (db_utils.connection_pool, storage.dialect)
+        storage.dialect = storage.SQLITE
+        db_utils.connection_pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 2)
+        alert_tracker.reset()
+        forecaster.clear()
+
+    def tearDown(self):
+        forecaster.clear()
+        alert_tracker.reset()
+        db_utils.connection_pool, storage.dialect = self.previous
+        super().tearDown()
+
+    def test_rejects_unknown_parameters_and_horizon(self):
+        self.assertEqual(self.client.get('/api/forecast?parameters=moisture,wind').status_code, 400)
+        self.assertEqual(self.client.get('/api/forecast?horizon=1000').status_code, 400)
+
+    def test_unscoped_forecast_lists_ingested_zones(self):
+        # Moisture falling 2 per hour over the last six hours; nothing has asked for one zone first
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        batch = [dict(READING, greenhouse_zone=zone, moisture=60.0 - 2 * h,
+                      timestamp=(now - timedelta(hours=6 - h)).isoformat())
+                 for zone in ('Zone A', 'Zone B') for h in range(6)]
+        self.assertEqual(self.client.post('/receive_sensor_data/batch', json=batch).status_code, 201)
+
+        response = self.client.get('/api/forecast?parameters=moisture&horizon=12')
+
+        self.assertEqual(response.status_code, 200)
+        zones = response.get_json()['zones']
+        self.assertEqual(sorted(zones), ['Zone A', 'Zone B'])
+        self.assertAlmostEqual(zones['Zone A']['moisture']['trend_per_hour'], -2.0, places=3)
+        self.assertEqual(zones['Zone B']['moisture']['samples'], 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from app.utils.latest_cache import LatestReadingCache, latest_cache
+from helpers import LoggedInTestCase
+
+
+def reading(zone, minute, temperature=20.0):
+    return {'greenhouse_zone': zone, 'timestamp': f'2025-04-20T10:{minute:02d}:00',
+            'temperature': temperature, 'pH': 6.5}
+
+
+class LatestReadingCacheTest(unittest.TestCase):
+
+    def test_primes_once_and_keeps_newest_per_zone(self):
+        cache = LatestReadingCache()
+        loader = MagicMock(return_value=[reading('Zone A', 5)])
+
+        cache.update([reading('Zone A', 7, 30.0), reading('Zone A', 6, 25.0), reading('Zone B', 1)])
+        zone_a, _ = cache.get(loader, 'Zone A')
+        newest, _ = cache.get(loader)
+
+        loader.assert_called_once()
+        self.assertEqual(zone_a['temperature'], 30.0)
+        self.assertEqual(newest['greenhouse_zone'], 'Zone A')
+
+    def test_etag_changes_only_with_content(self):
+        cache = LatestReadingCache()
+        loader = MagicMock(return_value=[])
+
+        cache.update([reading('Zone A', 1)])
+        _, first = cache.get(loader, 'Zone A')
+        cache.update([reading('Zone B', 2)])
+        _, unchanged = cache.get(loader, 'Zone A')
+        cache.update([reading('Zone A', 3)])
+        _, changed = cache.get(loader, 'Zone A')
+
+        self.assertEqual(first, unchanged)
+        self.assertNotEqual(first, changed)
+
+
+class LatestSensorDataRouteTest(LoggedInTestCase):
+    user = (1, 'employee', 'Employee', frozenset({1}))
+
+    def setUp(self):
+        super().setUp()
+        latest_cache.clear()
+        zone_map = patch('app.routes.threshold_cache.zones', return_value=['Zone A', 'Zone B'])
+        zone_map.start()
+        self.addCleanup(zone_map.stop)
+
+    @patch('app.routes.get_latest_readings')
+    def test_conditional_get_returns_304(self, mock_loader):
+        mock_loader.return_value = [reading('Zone A', 1), reading('Zone B', 2)]
+
+        first = self.client.get('/latest_sensor_data?zone=Zone A')
+        second = self.client.get('/latest_sensor_data?zone=Zone A',
+                                 headers={'If-None-Match': first.headers['ETag']})
+        everything = self.client.get('/latest_sensor_data?zone=all')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.get_json()['greenhouse_zone'], 'Zone A')
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(sorted(everything.get_json()), ['Zone A', 'Zone B'])
+        mock_loader.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
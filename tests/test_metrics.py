@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app import app
+from app.routes import after_ingest
+from app.utils import db_utils, storage
+from app.utils.metrics import Counter, Histogram, Registry, TimedCursor, db_query_seconds, readings_ingested, \
+    alert_transitions, statement_name
+from app.utils.pool import InstrumentedPool
+from helpers import LoggedInTestCase, log_in
+
+
+class RegistryTest(unittest.TestCase):
+
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = Registry()
+        latency = registry.histogram('req_seconds', 'Request time.', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value, 'a"b')
+
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP req_seconds Request time.',
+            '# TYPE req_seconds histogram',
+            'req_seconds_bucket{route="a\\"b",le="0.1"} 2',
+            'req_seconds_bucket{route="a\\"b",le="1.0"} 3',
+            'req_seconds_bucket{route="a\\"b",le="+Inf"} 4',
+            'req_seconds_sum{route="a\\"b"} 3.65',
+            'req_seconds_count{route="a\\"b"} 4',
+        ])
+
+    def test_counters_and_collectors(self):
+        registry = Registry()
+        readings = registry.counter('readings_total', 'Readings.', ('zone',))
+        readings.inc('Zone A', amount=3)
+        readings.inc('Zone A')
+        registry.collector(lambda: [('queue_depth', 'gauge', 'Queued.', 7)])
+
+        text = registry.render()
+
+        self.assertIn('readings_total{zone="Zone A"} 4\n', text)
+        self.assertIn('# TYPE queue_depth gauge\nqueue_depth 7\n', text)
+
+    def test_statement_names(self):
+        self.assertEqual(statement_name("SELECT id, updated_at FROM sensor_readings WHERE id = %s"),
+                         'select_sensor_readings')
+        self.assertEqual(statement_name("\n  INSERT INTO alert_counts (greenhouse_zone) VALUES (%s) "
+                                        "ON DUPLICATE KEY UPDATE open_count = open_count + 1"), 'insert_alert_counts')
+        self.assertEqual(statement_name("UPDATE alerts SET status = %s"), 'update_alerts')
+        self.assertEqual(statement_name("SELECT COUNT(*) AS n FROM (SELECT 1 FROM alerts) t"), 'select_alerts')
+        self.assertEqual(statement_name("COMMIT"), 'commit')
+
+
+class QueryTimingTest(unittest.TestCase):
+
+    def test_pool_cursors_record_statement_timings(self):
+        pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 1, wrap_cursor=TimedCursor)
+        conn = pool.get_connection()
+        before = db_query_seconds.count('select_greenhouses')
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT id FROM greenhouses WHERE id = %s", (1,))
+
+            self.assertEqual(cursor.fetchall(), [])
+            self.assertEqual(db_query_seconds.count('select_greenhouses'), before + 1)
+        finally:
+            conn.close()
+
+    def test_failed_statements_are_timed_too(self):
+        cursor = TimedCursor(MagicMock(**{'execute.side_effect': RuntimeError('gone')}))
+        before = db_query_seconds.count('delete_alerts')
+
+        with self.assertRaises(RuntimeError):
+            cursor.execute("DELETE FROM alerts")
+        self.assertEqual(db_query_seconds.count('delete_alerts'), before + 1)
+
+
+class MetricsRouteTest(LoggedInTestCase):
+    user = None
+
+    def test_scrape_needs_token_or_manager(self):
+        with patch.dict(app.config, {'METRICS_TOKEN': 's3cret'}):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+
+        with patch.dict(app.config, {'METRICS_TOKEN': None}):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            log_in(self.client, 1)
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    @patch('app.routes.notify_transitions')
+    @patch('app.routes.forecaster')
+    @patch('app.routes.latest_cache')
+    def test_ingest_and_request_metrics(self, mock_latest, mock_forecaster, mock_notify):
+        mock_latest.update.return_value = []
+        before = readings_ingested.value('Zone M'), alert_transitions.value('opened', 'pH')
+
+        after_ingest([{'greenhouse_zone': 'Zone M'}] * 3,
+                     [{'event': 'opened', 'sensor_type': 'pH', 'greenhouse_zone': 'Zone M'}])
+        with patch.dict(app.config, {'METRICS_TOKEN': 's3cret'}):
+            self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+            text = self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).get_data(as_text=True)
+
+        self.assertEqual(readings_ingested.value('Zone M'), before[0] + 3)
+        self.assertEqual(alert_transitions.value('opened', 'pH'), before[1] + 1)
+        self.assertIn('greenhouse_http_request_duration_seconds_count{endpoint="metrics",method="GET",status="200"}',
+                      text)
+        self.assertIn('greenhouse_ingest_queue_depth ', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from app import app
+from app.utils import db_utils, migrations, storage
+from app.utils.pool import InstrumentedPool
+
+
+class MigrationRunnerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        for filename, sql in {
+            '000_baseline.sql': "-- base\nCREATE TABLE a (id INT);\nCREATE TABLE b (id INT);\n",
+            '001_add_index.sql': "CREATE INDEX idx_a ON a (id);",
+            '002_more.sql': "ALTER TABLE b ADD COLUMN x INT;",
+            'README.txt': "not a migration",
+        }.items():
+            with open(os.path.join(self.dir.name, filename), 'w') as f:
+                f.write(sql)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def make_conn(self, applied):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchone.return_value = (1,)
+        cursor.fetchall.return_value = [(version,) for version in applied]
+        return conn, cursor
+
+    def executed(self, cursor):
+        return [c.args[0] for c in cursor.execute.call_args_list]
+
+    def test_discover_orders_by_version(self):
+        self.assertEqual([(v, n) for v, n, _ in migrations.discover(self.dir.name)],
+                         [(0, 'baseline'), (1, 'add_index'), (2, 'more')])
+
+    def test_repo_migrations_are_numbered_uniquely(self):
+        versions = [v for v, _, _ in migrations.discover()]
+        self.assertEqual(versions, sorted(set(versions)))
+        self.assertEqual(versions[0], 0)
+
+    def test_split_statements_drops_comments(self):
+        self.assertEqual(migrations.split_statements("-- note\nCREATE TABLE a (id INT);\n\nSELECT 1;"),
+                         ["CREATE TABLE a (id INT)", "SELECT 1"])
+
+    def test_migrate_applies_only_pending_in_order(self):
+        conn, cursor = self.make_conn(applied=[0])
+        applied = migrations.migrate(conn, directory=self.dir.name)
+
+        self.assertEqual(applied, [1, 2])
+        statements = self.executed(cursor)
+        self.assertNotIn("CREATE TABLE a (id INT)", statements)
+        self.assertLess(statements.index("CREATE INDEX idx_a ON a (id)"),
+                        statements.index("ALTER TABLE b ADD COLUMN x INT"))
+        self.assertEqual(conn.commit.call_count, 2)
+        self.assertIn("RELEASE_LOCK", statements[-1])
+
+    def test_migrate_stops_at_target(self):
+        conn, _ = self.make_conn(applied=[])
+        self.assertEqual(migrations.migrate(conn, directory=self.dir.name, target=1), [0, 1])
+
+    def test_failed_migration_is_not_recorded(self):
+        conn, cursor = self.make_conn(applied=[0])
+
+        def execute(sql, params=None):
+            if sql.startswith("CREATE INDEX"):
+                raise RuntimeError("boom")
+        cursor.execute.side_effect = execute
+
+        with self.assertRaises(RuntimeError):
+            migrations.migrate(conn, directory=self.dir.name)
+        self.assertFalse(any("INSERT INTO schema_migrations" in sql for sql in self.executed(cursor)))
+        conn.commit.assert_not_called()
+
+
+class QueryPlanCheckTest(unittest.TestCase):
+    def check(self, plan):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchall.return_value = plan
+        return migrations.check_query_plans(conn, {'q': lambda c: c.execute("SELECT 1", None)})
+
+    def test_full_scan_is_reported(self):
+        problems = self.check([{'table': 'sensor_readings', 'type': 'ALL', 'rows': 100000, 'possible_keys': None}])
+        self.assertIn('full scan of sensor_readings', problems['q'][0])
+
+    def test_index_ranges_derived_and_small_tables_pass(self):
+        self.assertEqual(self.check([
+            {'table': 'sensor_readings', 'type': 'range', 'rows': 10},
+            {'table': '<derived2>', 'type': 'ALL', 'rows': 4},
+            {'table': 'alert_counts', 'type': 'ALL', 'rows': 4},
+        ]), {})
+
+    def test_hot_queries_record_real_sql(self):
+        conn = MagicMock()
+        conn.cursor.return_value.fetchall.return_value = []
+        migrations.check_query_plans(conn)
+        explained = [c.args[0] for c in conn.cursor.return_value.execute.call_args_list]
+        self.assertTrue(all(sql.startswith("EXPLAIN ") for sql in explained))
+        self.assertTrue(any("FROM alerts" in sql for sql in explained))
+        self.assertTrue(any("sensor_rollup_hour" in sql for sql in explained))
+
+
+class SchemaCheckTest(unittest.TestCase):
+    """Startup refuses a database that lacks what the code reads and writes."""
+
+    def setUp(self):
+        self.previous = db_utils.connection_pool
+        db_utils.connection_pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 1)
+
+    def tearDown(self):
+        db_utils.connection_pool = self.previous
+
+    def execute(self, statement):
+        conn = db_utils.get_db_connection()
+        conn.cursor().execute(statement)
+        conn.commit()
+        conn.close()
+
+    def test_current_schema_passes(self):
+        db_utils.check_schema(app)
+
+    def test_missing_settings_versions(self):
+        self.execute("DROP TABLE settings_versions")
+
+        with self.assertRaisesRegex(RuntimeError, r"settings_versions .* 002_ingest_pipeline"):
+            db_utils.check_schema(app)
+
+    def test_missing_alert_lifecycle_columns(self):
+        self.execute("ALTER TABLE alerts DROP COLUMN resolved_at")
+
+        with self.assertRaisesRegex(RuntimeError, r"alerts \(occurrences, last_seen, resolved_at\)"):
+            db_utils.check_schema(app)
+
+    def test_missing_rollup_table(self):
+        self.execute("DROP TABLE sensor_rollup_hour")
+
+        with self.assertRaisesRegex(RuntimeError, r"sensor_rollup_hour"):
+            db_utils.check_schema(app)
+
+
+if __name__ == '__main__':
+    unittest.main()
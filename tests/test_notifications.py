@@ -0,0 +1,86 @@
+import threading
+import unittest
+from app.utils.notifications import SmsDispatcher, build_digest
+
+
+class FakeMessages:
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def create(self, body, from_, to):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError('503 Service Unavailable')
+            self.sent.append((to, body))
+
+
+class FakeTwilioClient:
+
+    def __init__(self, failures=0):
+        self.messages = FakeMessages(failures)
+
+
+class SmsDispatcherTest(unittest.TestCase):
+
+    def make_dispatcher(self, client, **kwargs):
+        self.loads = 0
+
+        def recipients():
+            self.loads += 1
+            return ['+441234567890', '+441234567891']
+
+        options = dict(coalesce_window=0.2, rate_limit=1000, backoff=0.01)
+        options.update(kwargs)
+        return SmsDispatcher(client, '+10000000000', recipients, **options)
+
+    def test_coalesces_burst_into_one_digest_per_manager(self):
+        client = FakeTwilioClient()
+        dispatcher = self.make_dispatcher(client)
+
+        for message in ['temperature too high (45 > 40)', 'pH too low (5.0 < 6)', 'moisture too low (10 < 15)']:
+            self.assertTrue(dispatcher.enqueue(message))
+        dispatcher.stop()
+
+        self.assertEqual(len(client.messages.sent), 2)
+        self.assertEqual({to for to, _ in client.messages.sent}, {'+441234567890', '+441234567891'})
+        self.assertTrue(client.messages.sent[0][1].startswith('🚨 3 ALERTS: temperature too high'))
+
+    def test_recipients_are_cached(self):
+        client = FakeTwilioClient()
+        dispatcher = self.make_dispatcher(client, coalesce_window=0.01)
+
+        dispatcher.enqueue('first')
+        dispatcher.stop()
+        dispatcher.enqueue('second')
+        dispatcher.stop()
+
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(len(client.messages.sent), 4)
+
+    def test_retries_with_backoff(self):
+        client = FakeTwilioClient(failures=2)
+        dispatcher = self.make_dispatcher(client, workers=1, max_retries=3)
+
+        dispatcher.enqueue('temperature too high (45 > 40)')
+        dispatcher.stop()
+
+        self.assertEqual(len(client.messages.sent), 2)
+        self.assertEqual(dispatcher.stats['retried'], 2)
+        self.assertEqual(dispatcher.stats['failed'], 0)
+
+    def test_disabled_without_client(self):
+        dispatcher = self.make_dispatcher(None)
+        self.assertFalse(dispatcher.enqueue('ignored'))
+
+    def test_digest_is_truncated(self):
+        body = build_digest(['x' * 1000, 'y' * 1000])
+        self.assertEqual(len(body), 1600)
+        self.assertTrue(body.endswith('...'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import math
+import unittest
+
+from app.utils.db_utils import validate_reading
+from app.utils.packed import HEADER, RECORD, decode_packed, encode_packed
+
+
+def reading(**overrides):
+    data = {'timestamp': '2025-04-20T10:00:00.125', 'temperature': 25.5, 'pressure': 1010.0,
+            'light_intensity': 800, 'humidity': 50.0, 'air_quality': 40, 'pH': 6.5,
+            'moisture': 30.0, 'greenhouse_zone': 'Zone A'}
+    data.update(overrides)
+    return data
+
+
+class PackedPayloadTest(unittest.TestCase):
+    def test_round_trip_matches_json_representation(self):
+        sent = [reading(), reading(greenhouse_zone='Zone B', timestamp='2025-04-20T10:00:01Z'), reading()]
+        body = encode_packed(sent)
+
+        decoded = decode_packed(body)
+
+        self.assertEqual(len(body), HEADER.size + 2 * 7 + 3 * RECORD.size)
+        self.assertEqual(decoded[0], dict(sent[0]))
+        self.assertEqual(decoded[1]['timestamp'], '2025-04-20T10:00:01.000')
+        self.assertEqual([r['greenhouse_zone'] for r in decoded], ['Zone A', 'Zone B', 'Zone A'])
+        self.assertIsNone(validate_reading(decoded[1]))
+
+    def test_missing_value_fails_validation(self):
+        decoded = decode_packed(encode_packed([reading(pH=math.nan)]))
+
+        self.assertTrue(math.isnan(decoded[0]['pH']))
+        self.assertEqual(validate_reading(decoded[0]), "Field pH must be numeric")
+
+    def test_rejects_malformed_bodies(self):
+        body = encode_packed([reading()])
+        for bad in (b'GR', b'XX' + body[2:], body[:-1], body + b'\0'):
+            with self.assertRaises(ValueError):
+                decode_packed(bad)
+        bad_zone = bytearray(body)
+        bad_zone[-1] = 3
+        with self.assertRaises(ValueError):
+            decode_packed(bytes(bad_zone))
+        for millis in (2 ** 63 - 1, -2 ** 63, 300000000000000):
+            far = bytearray(body)
+            far[-RECORD.size:-RECORD.size + 8] = millis.to_bytes(8, 'little', signed=True)
+            with self.assertRaises(ValueError):
+                decode_packed(bytes(far))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import csv
+import gzip
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from app.utils import partitions
+
+
+def partition_rows(*bounds):
+    return [{'name': name, 'bound': bound} for name, bound in bounds]
+
+
+class PartitionLayoutTest(unittest.TestCase):
+    def test_add_months_crosses_years(self):
+        self.assertEqual(partitions.add_months(datetime(2025, 11, 1), 3), datetime(2026, 2, 1))
+        self.assertEqual(partitions.add_months(datetime(2025, 1, 1), -1), datetime(2024, 12, 1))
+
+    def test_ensure_partitions_extends_from_last_bound(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = partition_rows(
+            ('p202509', "'2025-10-01 00:00:00'"), ('p_future', 'MAXVALUE'))
+
+        created = partitions.ensure_partitions(cursor, datetime(2025, 10, 15), months_ahead=1)
+
+        self.assertEqual(created, ['p202510', 'p202511'])
+        sql = cursor.execute.call_args.args[0]
+        self.assertIn("REORGANIZE PARTITION p_future INTO", sql)
+        self.assertIn("PARTITION p202511 VALUES LESS THAN ('2025-12-01')", sql)
+        self.assertTrue(sql.rstrip(')').endswith("PARTITION p_future VALUES LESS THAN (MAXVALUE"))
+
+    def test_first_run_starts_at_oldest_reading(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = partition_rows(('p_future', 'MAXVALUE'))
+        cursor.fetchone.return_value = {'oldest': datetime(2025, 8, 20, 13, 0)}
+
+        created = partitions.ensure_partitions(cursor, datetime(2025, 9, 2), months_ahead=0)
+
+        self.assertEqual(created, ['p202508', 'p202509'])
+
+    def test_nothing_to_create_when_far_enough_ahead(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = partition_rows(
+            ('p202512', "'2026-01-01 00:00:00'"), ('p_future', 'MAXVALUE'))
+
+        self.assertEqual(partitions.ensure_partitions(cursor, datetime(2025, 10, 1), months_ahead=2), [])
+        cursor.execute.assert_called_once()
+
+    def test_expired_partitions_respect_cutoff(self):
+        cursor = MagicMock()
+        cursor.fetchall.return_value = partition_rows(
+            ('p202501', "'2025-02-01 00:00:00'"), ('p202502', "'2025-03-01 00:00:00'"),
+            ('p202503', "'2025-04-01 00:00:00'"), ('p_future', 'MAXVALUE'))
+
+        expired = partitions.expired_partitions(cursor, datetime(2025, 5, 10), retention_months=2)
+
+        self.assertEqual(expired, [
+            ('p202501', datetime(2025, 1, 1), datetime(2025, 2, 1)),
+            ('p202502', datetime(2025, 2, 1), datetime(2025, 3, 1)),
+        ])
+
+
+class RetentionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_archive_partition_streams_gzip_csv(self):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.column_names = ('id', 'timestamp', 'temperature')
+        cursor.fetchmany.side_effect = [[(1, '2025-01-01 00:00:00', 20.5), (2, '2025-01-01 00:01:00', 21.0)], []]
+
+        path, rows = partitions.archive_partition(conn, 'p202501', self.dir.name)
+
+        self.assertEqual(rows, 2)
+        self.assertEqual(os.listdir(self.dir.name), ['sensor_readings_p202501.csv.gz'])
+        with gzip.open(path, 'rt', newline='') as f:
+            self.assertEqual(list(csv.reader(f))[0], ['id', 'timestamp', 'temperature'])
+
+    @patch('app.utils.partitions.rebuild_rollups')
+    @patch('app.utils.partitions.archive_partition', return_value=('x.csv.gz', 3))
+    def test_retention_rolls_up_before_archiving_and_dropping(self, archive, rebuild):
+        conn = MagicMock()
+        cursor = conn.cursor.return_value
+        cursor.fetchall.return_value = partition_rows(
+            ('p202501', "'2025-02-01 00:00:00'"), ('p_future', 'MAXVALUE'))
+        # 3 raw rows but only 2 rolled up
+        cursor.fetchone.side_effect = [{'total': 3}, {'total': 2}]
+
+        dropped = partitions.apply_retention(conn, datetime(2025, 6, 1), 3, self.dir.name)
+
+        self.assertEqual(dropped, ['p202501'])
+        rebuild.assert_called_once_with(cursor, datetime(2025, 1, 1), datetime(2025, 1, 31))
+        archive.assert_called_once_with(conn, 'p202501', self.dir.name)
+        self.assertEqual(cursor.execute.call_args.args[0], "ALTER TABLE sensor_readings DROP PARTITION p202501")
+
+
+if __name__ == '__main__':
+    unittest.main()
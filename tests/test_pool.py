@@ -0,0 +1,72 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from mysql.connector import Error
+
+from app.utils.pool import InstrumentedPool, PoolTimeout
+
+
+class InstrumentedPoolTest(unittest.TestCase):
+    def make_pool(self, size=2, **kwargs):
+        raw = MagicMock()
+        raw.get_connection.side_effect = lambda: MagicMock()
+        return InstrumentedPool(raw, size, **kwargs), raw
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool, _ = self.make_pool(size=1, checkout_timeout=0.05)
+        pool.get_connection()
+
+        with self.assertRaises(PoolTimeout):
+            pool.get_connection()
+        self.assertEqual(pool.stats()['exhausted'], 1)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_double_close_releases_slot_once(self):
+        pool, _ = self.make_pool(size=1, checkout_timeout=0.05)
+        conn = pool.get_connection()
+        conn.close()
+        conn.close()
+
+        stats = pool.stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['available'], 1)
+        self.assertFalse(conn.is_connected())
+        pool.get_connection()
+        with self.assertRaises(PoolTimeout):
+            pool.get_connection()
+
+    def test_waiting_borrower_gets_released_connection(self):
+        pool, _ = self.make_pool(size=1, checkout_timeout=2)
+        held = pool.get_connection()
+        threading.Timer(0.05, held.close).start()
+
+        pool.get_connection()
+
+        stats = pool.stats()
+        self.assertEqual(stats['waited'], 1)
+        self.assertGreater(stats['wait_seconds_max'], 0.03)
+        self.assertEqual(stats['peak_in_use'], 1)
+
+    def test_borrow_pings_with_reconnect(self):
+        pool, _ = self.make_pool()
+        conn = pool.get_connection()
+        conn.ping.assert_called_once_with(reconnect=True, attempts=2, delay=0)
+
+    def test_failed_health_check_frees_the_slot(self):
+        pool, raw = self.make_pool(size=1)
+        broken = MagicMock()
+        broken.ping.side_effect = Error("server has gone away")
+        raw.get_connection.side_effect = [broken]
+
+        with self.assertRaises(Error):
+            pool.get_connection()
+        stats = pool.stats()
+        self.assertEqual(stats['health_check_failures'], 1)
+        self.assertEqual(stats['in_use'], 0)
+        broken.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
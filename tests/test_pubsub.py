@@ -0,0 +1,109 @@
+import unittest
+from unittest.mock import patch
+from app.utils.latest_cache import latest_cache
+from app.utils.pubsub import Broker, broker
+from app.utils import db_utils, storage
+from app.utils.pool import InstrumentedPool
+from helpers import LoggedInTestCase
+
+
+class BrokerTest(unittest.TestCase):
+
+    def test_zone_filter(self):
+        hub = Broker()
+        zone_a = hub.subscribe(['Zone A'])
+        everyone = hub.subscribe()
+
+        hub.publish('reading', '{"zone": "A"}', 'Zone A')
+        hub.publish('reading', '{"zone": "B"}', 'Zone B')
+
+        self.assertEqual(zone_a.get(0), ('reading', '{"zone": "A"}'))
+        self.assertIsNone(zone_a.get(0))
+        self.assertEqual([everyone.get(0)[1], everyone.get(0)[1]], ['{"zone": "A"}', '{"zone": "B"}'])
+
+    def test_slow_subscriber_drops_oldest(self):
+        hub = Broker(max_queue=2)
+        subscription = hub.subscribe()
+        for i in range(5):
+            hub.publish('reading', str(i))
+
+        self.assertEqual(subscription.dropped, 3)
+        self.assertEqual([subscription.get(0)[1], subscription.get(0)[1]], ['3', '4'])
+
+    def test_unsubscribe(self):
+        hub = Broker()
+        subscription = hub.subscribe()
+        hub.unsubscribe(subscription)
+        hub.publish('reading', 'x')
+
+        self.assertEqual(hub.subscriber_count, 0)
+        self.assertIsNone(subscription.get(0))
+
+
+class StreamRouteTest(LoggedInTestCase):
+    user = (1, 'employee', 'Employee', frozenset({1}))
+
+    def setUp(self):
+        super().setUp()
+        latest_cache.clear()
+        zone_map = patch('app.routes.threshold_cache.zones', return_value=['Zone A', 'Zone B'])
+        zone_map.start()
+        self.addCleanup(zone_map.stop)
+
+    @patch('app.routes.get_latest_readings')
+    def test_stream_sends_snapshot_then_events(self, mock_loader):
+        mock_loader.return_value = [
+            {'greenhouse_zone': 'Zone A', 'timestamp': '2025-04-20T10:00:00', 'temperature': 21.5},
+            {'greenhouse_zone': 'Zone B', 'timestamp': '2025-04-20T10:00:00', 'temperature': 19.0},
+        ]
+        response = self.client.get('/stream?zone=Zone A', buffered=False)
+        chunks = iter(response.response)
+
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(next(chunks), b'retry: 5000\n\n')
+        self.assertIn(b'"temperature": 21.5', next(chunks))
+
+        broker.publish('alert', '{"event": "opened"}', 'Zone B')
+        broker.publish('alert', '{"event": "opened", "zone": "A"}', 'Zone A')
+        self.assertEqual(next(chunks), b'event: alert\ndata: {"event": "opened", "zone": "A"}\n\n')
+        response.close()
+        self.assertEqual(broker.subscriber_count, 0)
+
+
+class StreamConnectionTest(LoggedInTestCase):
+    """An open stream must not hold a pooled connection."""
+
+    user = (1, 'employee', 'Employee', frozenset({1}))
+
+    def setUp(self):
+        super().setUp()
+        self.previous = (db_utils.connection_pool, storage.dialect)
+        storage.dialect = storage.SQLITE
+        db_utils.connection_pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 2)
+        latest_cache.clear()
+        conn = db_utils.get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO greenhouses (id, name) VALUES (1, 'Lettuce')")
+        cursor.execute("INSERT INTO greenhouse_zones (greenhouse_zone, greenhouse_id) VALUES ('Zone A', 1)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        db_utils.connection_pool, storage.dialect = self.previous
+        latest_cache.clear()
+        super().tearDown()
+
+    def test_stream_releases_request_connection(self):
+        response = self.client.get('/stream', buffered=False)
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b'retry: 5000\n\n')
+
+        stats = db_utils.pool_stats()
+        self.assertEqual(stats['in_use'], 0)
+        self.assertGreater(stats['checkouts'], 1)
+        response.close()
+        self.assertEqual(db_utils.pool_stats()['in_use'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
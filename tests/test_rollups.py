@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+from app.utils.rollups import aggregate, apply_rollups
+
+
+class RollupsTest(unittest.TestCase):
+
+    def readings(self):
+        return [
+            {'timestamp': '2025-04-20T10:15:30', 'greenhouse_zone': 'Zone A', 'temperature': 20.0, 'pH': 6.5},
+            {'timestamp': '2025-04-20T10:15:50', 'greenhouse_zone': 'Zone A', 'temperature': 30.0, 'pH': None},
+            {'timestamp': '2025-04-20T11:05:00', 'greenhouse_zone': 'Zone A', 'temperature': 25.0, 'pH': 7.0},
+            {'timestamp': '2025-04-20T11:05:00', 'greenhouse_zone': 'Zone B', 'temperature': 10.0, 'pH': 7.0},
+        ]
+
+    def test_aggregates_per_bucket_and_zone(self):
+        buckets = aggregate(self.readings())
+
+        minute = buckets[('minute', datetime(2025, 4, 20, 10, 15), 'Zone A')]
+        self.assertEqual(minute['reading_count'], 2)
+        self.assertEqual(minute['temperature_sum'], 50.0)
+        self.assertEqual((minute['temperature_min'], minute['temperature_max']), (20.0, 30.0))
+        self.assertEqual(minute['pH_count'], 1)
+
+        day = buckets[('day', datetime(2025, 4, 20), 'Zone A')]
+        self.assertEqual(day['reading_count'], 3)
+        self.assertEqual(day['temperature_sum'], 75.0)
+        self.assertEqual(len([key for key in buckets if key[0] == 'hour']), 3)
+
+    def test_one_upsert_per_table(self):
+        cursor = MagicMock()
+        apply_rollups(cursor, self.readings())
+
+        self.assertEqual(cursor.executemany.call_count, 3)
+        day_call = [c for c in cursor.executemany.call_args_list if 'sensor_rollup_day' in c[0][0]][0]
+        self.assertIn('ON DUPLICATE KEY UPDATE', day_call[0][0])
+        self.assertEqual(len(day_call[0][1]), 2)
+
+    def test_upserts_in_key_order(self):
+        cursor = MagicMock()
+        apply_rollups(cursor, list(reversed(self.readings())))
+
+        for call in cursor.executemany.call_args_list:
+            keys = [row[:2] for row in call[0][1]]
+            self.assertEqual(keys, sorted(keys))
+
+
+if __name__ == '__main__':
+    unittest.main()
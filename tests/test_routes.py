@@ -1,13 +1,19 @@
+import json
 import unittest
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 from app import app
+from app.utils.threshold_cache import threshold_cache, fetch_version
+from app.utils.alert_lifecycle import alert_tracker
+from app.utils.user_cache import user_cache
+from app.utils.packed import encode_packed, MIMETYPE as PACKED_MIMETYPE
+from app.utils import db_utils, storage
+from app.utils.pool import InstrumentedPool
+from helpers import LoggedInTestCase, set_session_user
 
-class SettingsTest(unittest.TestCase):
+class SettingsTest(LoggedInTestCase):
 
-    def setUp(self):
-        self.client = app.test_client()
-
-    @patch('app.routes.get_db_connection')
+    @patch('app.utils.db_utils.get_db_connection')
     def test_update_thresholds(self, mock_db):
         # Fake DB connection and cursor
         mock_conn = MagicMock()
@@ -40,5 +46,376 @@ class SettingsTest(unittest.TestCase):
         mock_conn.commit.assert_called_once()
         self.assertEqual(response.status_code, 302)
 
+class BatchIngestTest(LoggedInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        alert_tracker.reset()
+
+    def reading(self, **overrides):
+        data = {
+            'timestamp': '2025-04-20T10:00:00', 'temperature': 25.0, 'pressure': 1010.0,
+            'light_intensity': 800, 'humidity': 50.0, 'air_quality': 40, 'pH': 6.5,
+            'moisture': 30.0, 'greenhouse_zone': 'Zone A'
+        }
+        data.update(overrides)
+        return data
+
+    def mock_connection(self, mock_db):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        ranges = [{'parameter': 'temperature', 'min_value': 18, 'max_value': 40}]
+        mock_cursor.fetchall.side_effect = lambda: (
+            ranges if 'optimal_ranges' in mock_cursor.execute.call_args[0][0] else []
+        )
+        mock_conn.cursor.return_value = mock_cursor
+        mock_conn.is_connected.return_value = True
+        mock_db.return_value = mock_conn
+        return mock_conn, mock_cursor
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_json_array_single_transaction(self, mock_db):
+        mock_conn, mock_cursor = self.mock_connection(mock_db)
+        batch = [self.reading(), self.reading(temperature=45.0), self.reading(temperature=10.0)]
+
+        response = self.client.post('/receive_sensor_data/batch', json=batch)
+
+        self.assertEqual(response.status_code, 201)
+        body = response.get_json()
+        self.assertEqual(body['accepted'], 3)
+        self.assertEqual([r['alerts_triggered'] for r in body['results']], [0, 1, 1])
+        # One multi-row insert for readings; each breach opens its own alert
+        reading_inserts = [c for c in mock_cursor.executemany.call_args_list
+                           if 'INSERT INTO sensor_readings' in c[0][0]]
+        self.assertEqual(len(reading_inserts), 1)
+        self.assertEqual(len(reading_inserts[0][0][1]), 3)
+        alert_inserts = [c for c in mock_cursor.execute.call_args_list if 'INSERT INTO alerts' in c[0][0]]
+        self.assertEqual(len(alert_inserts), 2)
+        mock_conn.commit.assert_called_once()
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_ndjson_partial_batch(self, mock_db):
+        mock_conn, mock_cursor = self.mock_connection(mock_db)
+        lines = [json.dumps(self.reading()), '{not json', json.dumps(self.reading(pH='low'))]
+
+        response = self.client.post('/receive_sensor_data/batch', data='\n'.join(lines),
+                                    content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, 207)
+        results = response.get_json()['results']
+        self.assertEqual([r['status'] for r in results], ['accepted', 'rejected', 'rejected'])
+        self.assertEqual(len(mock_cursor.executemany.call_args_list[0][0][1]), 1)
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_packed_binary_batch(self, mock_db):
+        mock_conn, mock_cursor = self.mock_connection(mock_db)
+        body = encode_packed([self.reading(), self.reading(temperature=45.0, greenhouse_zone='Zone B')])
+
+        response = self.client.post('/receive_sensor_data/batch', data=body, content_type=PACKED_MIMETYPE)
+        malformed = self.client.post('/receive_sensor_data/batch', data=body[:-3], content_type=PACKED_MIMETYPE)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['alerts_triggered'], 1)
+        rows = mock_cursor.executemany.call_args_list[0][0][1]
+        self.assertEqual([row[-1] for row in rows], ['Zone A', 'Zone B'])
+        self.assertEqual(malformed.status_code, 400)
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_rejects_unstorable_readings_per_item(self, mock_db):
+        mock_conn, mock_cursor = self.mock_connection(mock_db)
+        batch = [self.reading(), self.reading(timestamp='yesterday'), self.reading(greenhouse_zone='Z' * 101),
+                 self.reading(moisture=float('inf')), self.reading(timestamp='2025-04-20T10:00:00Z')]
+
+        response = self.client.post('/receive_sensor_data/batch', json=batch)
+
+        self.assertEqual(response.status_code, 207)
+        results = response.get_json()['results']
+        self.assertEqual([r['status'] for r in results], ['accepted', 'rejected', 'rejected', 'rejected', 'accepted'])
+        self.assertIn('ISO 8601', results[1]['error'])
+        self.assertIn('finite', results[3]['error'])
+        self.assertEqual(len(mock_cursor.executemany.call_args_list[0][0][1]), 2)
+        mock_conn.commit.assert_called_once()
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_rejects_batch_without_valid_readings(self, mock_db):
+        response = self.client.post('/receive_sensor_data/batch', json=[{'temperature': 20}])
+
+        self.assertEqual(response.status_code, 400)
+        mock_db.assert_not_called()
+
+
+class WriteBehindIngestTest(LoggedInTestCase):
+    reading = BatchIngestTest.reading
+    mock_connection = BatchIngestTest.mock_connection
+
+    def setUp(self):
+        super().setUp()
+        alert_tracker.reset()
+        app.config['INGEST_WRITE_BEHIND'] = True
+
+    def tearDown(self):
+        app.ingest_buffer.stop()
+        app.config['INGEST_WRITE_BEHIND'] = False
+        super().tearDown()
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_queued_readings_are_group_committed(self, mock_db):
+        mock_conn, mock_cursor = self.mock_connection(mock_db)
+
+        first = self.client.post('/receive_sensor_data', json=self.reading())
+        second = self.client.post('/receive_sensor_data/batch', json=[self.reading(temperature=45.0), {'pH': 7}])
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(second.get_json()['accepted'], 1)
+        self.assertTrue(app.ingest_buffer.wait_idle(2))
+        inserted = sum(len(c[0][1]) for c in mock_cursor.executemany.call_args_list
+                       if 'INSERT INTO sensor_readings' in c[0][0])
+        self.assertEqual(inserted, 2)
+        self.assertLessEqual(mock_conn.commit.call_count, 2)
+
+    def test_invalid_single_reading_is_rejected_before_queueing(self):
+        response = self.client.post('/receive_sensor_data', json=self.reading(temperature='hot'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(app.ingest_buffer.depth(), 0)
+
+    @patch.object(app.ingest_buffer, 'submit', return_value=False)
+    def test_full_queue_answers_429(self, mock_submit):
+        response = self.client.post('/receive_sensor_data', json=self.reading())
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+
+class AlertsApiTest(LoggedInTestCase):
+
+    def mock_connection(self, mock_db, rows, total):
+        mock_conn = MagicMock()
+        mock_cursor = MagicMock()
+        mock_cursor.fetchall.return_value = rows
+        mock_cursor.fetchone.return_value = {'total': total}
+        mock_conn.cursor.return_value = mock_cursor
+        mock_db.return_value = mock_conn
+        return mock_cursor
+
+    def rows(self, count):
+        start = datetime(2025, 4, 20, 12, 0)
+        return [{'id': 100 - i, 'timestamp': start - timedelta(minutes=i), 'sensor_type': 'temperature',
+                 'reading_value': 45.0, 'threshold_type': 'max', 'threshold_value': 40.0,
+                 'status': 'Open', 'message': 'temperature too high (45 > 40)', 'greenhouse_zone': 'Zone A'}
+                for i in range(count)]
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_first_page_returns_cursor_and_maintained_total(self, mock_db):
+        mock_cursor = self.mock_connection(mock_db, self.rows(3), 42)
+
+        response = self.client.get('/alerts?limit=2')
+
+        body = response.get_json()
+        self.assertEqual(len(body['alerts']), 2)
+        self.assertEqual(body['total_alerts'], 42)
+        self.assertIsNotNone(body['next_cursor'])
+        query, params = mock_cursor.execute.call_args_list[0][0]
+        self.assertIn('ORDER BY timestamp DESC, id DESC', query)
+        self.assertEqual(params, ['Open', 3])
+        self.assertIn('FROM alert_counts', mock_cursor.execute.call_args_list[1][0][0])
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_cursor_continues_after_last_row(self, mock_db):
+        mock_cursor = self.mock_connection(mock_db, self.rows(3), 3)
+        next_cursor = self.client.get('/alerts?limit=2').get_json()['next_cursor']
+
+        self.client.get(f'/alerts?limit=2&zone=Zone A&sensor_type=pH&cursor={next_cursor}')
+
+        query, params = mock_cursor.execute.call_args_list[2][0]
+        self.assertIn('(timestamp < %s OR (timestamp = %s AND id < %s))', query)
+        self.assertEqual(params, ['Open', 'Zone A', 'pH', datetime(2025, 4, 20, 11, 59),
+                                  datetime(2025, 4, 20, 11, 59), 99, 3])
+        self.assertIn('COUNT(*)', mock_cursor.execute.call_args_list[3][0][0])
+
+    def test_rejects_malformed_cursor(self):
+        response = self.client.get('/alerts?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+
+class HistoryApiTest(LoggedInTestCase):
+    user = (1, 'employee', 'Employee')
+
+    @patch('app.routes.get_series')
+    def test_rejects_fewer_than_three_points(self, mock_series):
+        for points in (-5, 0, 2):
+            response = self.client.get(f'/api/history?points={points}')
+            self.assertEqual(response.status_code, 400)
+        mock_series.assert_not_called()
+
+
+class HistoryPageTest(LoggedInTestCase):
+    """/history's default range, whose bounds are bare dates, on the embedded SQLite backend."""
+
+    reading = BatchIngestTest.reading
+
+    def setUp(self):
+        super().setUp()
+        self.previous = (db_utils.connection_pool, storage.dialect)
+        storage.dialect = storage.SQLITE
+        db_utils.connection_pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 2)
+
+    def tearDown(self):
+        db_utils.connection_pool, storage.dialect = self.previous
+        super().tearDown()
+
+    def test_default_range_includes_today(self):
+        conn = db_utils.get_db_connection()
+        db_utils.write_readings(conn.cursor(), [self.reading(temperature=21.25, timestamp=datetime.now().isoformat())])
+        conn.commit()
+        conn.close()
+
+        page = self.client.get('/history').get_data(as_text=True)
+
+        self.assertNotIn('No historical data', page)
+        self.assertIn('<td>21.25</td>', page)
+
+
+class RequestConnectionTest(LoggedInTestCase):
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_connection_released_once_per_request(self, mock_db):
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.fetchall.return_value = []
+        mock_conn.cursor.return_value.fetchone.return_value = {'total': 0}
+        mock_db.return_value = mock_conn
+
+        self.client.get('/alerts')
+
+        mock_db.assert_called_once()
+        mock_conn.close.assert_called_once()
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_connection_released_when_route_fails(self, mock_db):
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.execute.side_effect = RuntimeError("boom")
+        mock_db.return_value = mock_conn
+
+        response = self.client.get('/alerts')
+
+        self.assertEqual(response.status_code, 500)
+        mock_conn.rollback.assert_called_once()
+        mock_conn.close.assert_called_once()
+
+    def test_pool_stats_endpoint(self):
+        body = self.client.get('/api/db/stats').get_json()
+        for key in ('in_use', 'checkouts', 'exhausted', 'wait_seconds_max', 'size'):
+            self.assertIn(key, body)
+
+
+class ThresholdProfileTest(LoggedInTestCase):
+    """Greenhouse zone map and threshold overrides, against the embedded SQLite backend."""
+
+    def setUp(self):
+        super().setUp()
+        self.previous = (db_utils.connection_pool, storage.dialect)
+        storage.dialect = storage.SQLITE
+        db_utils.connection_pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 2)
+        self.conn = db_utils.get_db_connection()
+        cursor = self.conn.cursor()
+        cursor.execute("INSERT INTO greenhouses (name) VALUES (%s)", ('Lettuce',))
+        self.greenhouse_id = cursor.lastrowid
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        db_utils.connection_pool, storage.dialect = self.previous
+        super().tearDown()
+
+    def test_override_resolves_per_zone(self):
+        added = self.client.post(f'/api/greenhouses/{self.greenhouse_id}/zones', json={'zone': 'Zone A'})
+        unknown = self.client.post('/api/greenhouses/999/zones', json={'zone': 'Zone B'})
+        saved = self.client.put('/api/thresholds', json={'greenhouse_id': self.greenhouse_id,
+                                                         'parameter': 'humidity', 'min_value': 60, 'max_value': 90})
+        bad = self.client.put('/api/thresholds', json={'zone': 'Zone A', 'parameter': 'humidity',
+                                                       'min_value': 90, 'max_value': 60})
+
+        ranges = self.client.get(f'/api/thresholds?greenhouse={self.greenhouse_id}').get_json()
+        other = self.client.get('/api/thresholds?zone=Zone+B').get_json()
+
+        self.assertEqual((added.status_code, unknown.status_code, saved.status_code, bad.status_code),
+                         (201, 404, 200, 400))
+        self.assertEqual(list(ranges), ['Zone A'])
+        self.assertEqual(ranges['Zone A']['humidity'], {'min_value': 60, 'max_value': 90})
+        self.assertEqual(other['Zone B']['humidity'], {'min_value': 30, 'max_value': 80})
+
+        self.client.delete('/api/thresholds', json={'greenhouse_id': self.greenhouse_id, 'parameter': 'humidity'})
+        ranges = self.client.get(f'/api/thresholds?greenhouse={self.greenhouse_id}').get_json()
+        self.assertEqual(ranges['Zone A']['humidity'], {'min_value': 30, 'max_value': 80})
+
+    def test_settings_post_bumps_version_and_invalidates_cache(self):
+        cursor = self.conn.cursor(dictionary=True)
+        before = fetch_version(cursor)
+        self.assertEqual(threshold_cache.get_compiled(cursor).for_zone('Zone A').bounds('humidity'), (30, 80))
+
+        response = self.client.post('/settings', data={'humidity_min': '45', 'humidity_max': '85'})
+        self.conn.commit()
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(fetch_version(cursor), before + 1)
+        self.assertEqual(threshold_cache.get_compiled(cursor).for_zone('Zone A').bounds('humidity'), (45, 85))
+
+
+class AccessScopeTest(LoggedInTestCase):
+    """Employees only read the zones of their assigned greenhouses."""
+
+    # Users are loaded from the database, with their assignments
+    user = None
+
+    def setUp(self):
+        super().setUp()
+        self.previous = (db_utils.connection_pool, storage.dialect)
+        storage.dialect = storage.SQLITE
+        db_utils.connection_pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 2)
+        self.conn = db_utils.get_db_connection()
+        cursor = self.conn.cursor()
+        cursor.executemany("INSERT INTO users (id, username, email, phone_number, password_hash, role) "
+                           "VALUES (%s, %s, %s, %s, 'x', %s)",
+                           [(1, 'mgr', 'm@x.io', '+10000000001', 'Manager'), (5, 'ann', 'a@x.io', '+10000000005', 'Employee')])
+        cursor.executemany("INSERT INTO greenhouses (id, name) VALUES (%s, %s)", [(1, 'Lettuce'), (2, 'Tomatoes')])
+        cursor.executemany("INSERT INTO greenhouse_zones (greenhouse_zone, greenhouse_id) VALUES (%s, %s)",
+                           [('Zone A', 1), ('Zone B', 2)])
+        cursor.executemany("INSERT INTO employee_assignments (employee_id, greenhouse_id) VALUES (%s, %s)", [(5, 1)])
+        cursor.executemany("INSERT INTO alerts (message, timestamp, sensor_type, status, greenhouse_zone) "
+                           "VALUES ('m', '2025-04-20 10:00:00', 'temperature', 'Open', %s)", [('Zone A',), ('Zone B',)])
+        cursor.executemany("INSERT INTO alert_counts (greenhouse_zone, open_count) VALUES (%s, 1)",
+                           [('Zone A',), ('Zone B',)])
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+        db_utils.connection_pool, storage.dialect = self.previous
+        super().tearDown()
+
+    def alert_zones(self, user_id, query=''):
+        set_session_user(self.client, user_id)
+        body = self.client.get(f'/alerts?status=Open{query}').get_json()
+        return sorted(alert['greenhouse_zone'] for alert in body['alerts']), body['total_alerts']
+
+    def test_employee_reads_are_limited_to_assigned_greenhouses(self):
+        self.assertEqual(self.alert_zones(5), (['Zone A'], 1))
+        self.assertEqual(user_cache.get(5).greenhouse_ids, frozenset({1}))
+        self.assertEqual(self.alert_zones(5, '&greenhouse=2'), ([], 0))
+        self.assertEqual(self.alert_zones(5, '&zone=Zone+B'), ([], 0))
+        self.assertEqual(self.alert_zones(1), (['Zone A', 'Zone B'], 2))
+        self.assertEqual(self.alert_zones(1, '&greenhouse=2'), (['Zone B'], 1))
+
+    def test_assignment_change_refreshes_access(self):
+        self.assertEqual(self.alert_zones(5), (['Zone A'], 1))
+
+        set_session_user(self.client, 1)
+        response = self.client.post('/assignments?greenhouse_id=2', data={'employees': ['5']})
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIsNone(user_cache.get(5))
+        self.assertEqual(self.alert_zones(5), (['Zone A', 'Zone B'], 2))
+
+
 if __name__ == '__main__':
     unittest.main()
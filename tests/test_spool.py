@@ -0,0 +1,216 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from app import app
+from app.utils import db_utils, storage
+from app.utils.alert_lifecycle import alert_tracker
+from app.utils.db_utils import database_unavailable
+from app.utils.latest_cache import latest_cache
+from app.utils.pool import InstrumentedPool, PoolTimeout
+from app.utils.spool import Spool, SpoolReplayer
+from helpers import LoggedInTestCase
+
+
+class SpoolTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.replayed = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith('.seg'))
+
+    def test_replays_in_order_across_segments(self):
+        spool = Spool(self.directory, segment_bytes=100)
+        for i in range(20):
+            spool.append([{'n': 2 * i}, {'n': 2 * i + 1}])
+        self.assertGreater(len(self.segments()), 1)
+
+        count = spool.replay(self.replayed.extend, max_readings=7)
+
+        self.assertEqual(count, 40)
+        self.assertEqual([r['n'] for r in self.replayed], list(range(40)))
+        self.assertFalse(spool.pending())
+        self.assertEqual(spool.size(), 0)
+        spool.append([{'n': 40}])
+        self.assertTrue(spool.pending())
+
+    def test_torn_record_is_cut_when_reopened(self):
+        spool = Spool(self.directory)
+        spool.append([{'n': 0}])
+        spool.append([{'n': 1}])
+        spool.close()
+        with open(os.path.join(self.directory, self.segments()[-1]), 'ab') as f:
+            f.write(b'\x40\x00\x00\x00\x01\x02\x03\x04{"n"')
+
+        spool = Spool(self.directory)
+        spool.append([{'n': 2}])
+        spool.replay(self.replayed.extend)
+
+        self.assertEqual(self.replayed, [{'n': 0}, {'n': 1}, {'n': 2}])
+
+    def test_refuses_readings_beyond_quota(self):
+        spool = Spool(self.directory, max_bytes=60)
+
+        self.assertTrue(spool.append([{'n': 0}]))
+        self.assertFalse(spool.append([{'n': 1, 'padding': 'x' * 40}]))
+        self.assertEqual(spool.stats['refused'], 1)
+
+    def test_dead_letters_count_against_quota(self):
+        spool = Spool(self.directory, max_bytes=100)
+        spool.append([{'n': 'bad', 'padding': 'x' * 30}])
+        spool.replay(lambda readings: None, validate=lambda reading: "not numeric")
+        dead_bytes = os.path.getsize(os.path.join(self.directory, 'rejected.ndjson'))
+
+        self.assertFalse(spool.pending())
+        self.assertEqual(spool.size(), dead_bytes)
+        self.assertFalse(spool.append([{'n': 1, 'padding': 'x' * 50}]))
+        spool.close()
+        # Reopening counts the dead-letter file again
+        self.assertEqual(Spool(self.directory, max_bytes=100).size(), dead_bytes)
+
+    def test_failed_replay_resumes_after_last_checkpoint(self):
+        spool = Spool(self.directory)
+        for i in range(6):
+            spool.append([{'n': i}])
+
+        def flaky(readings):
+            if readings[0]['n'] >= 4:
+                raise PoolTimeout("pool exhausted")
+            self.replayed.extend(readings)
+
+        with self.assertRaises(PoolTimeout):
+            spool.replay(flaky, max_readings=2)
+        spool.close()
+        # A restarted process picks up from the checkpoint, without replaying what was committed
+        Spool(self.directory).replay(self.replayed.extend, max_readings=2)
+
+        self.assertEqual([r['n'] for r in self.replayed], list(range(6)))
+
+    def test_unretryable_readings_are_dead_lettered(self):
+        spool = Spool(self.directory)
+        spool.append([{'n': 0}])
+        spool.append([{'n': 'bad'}])
+        spool.append([{'n': 2}])
+
+        def handler(readings):
+            if readings[0]['n'] == 'bad':
+                raise ValueError("rejected by the database")
+            self.replayed.extend(readings)
+
+        spool.replay(handler, max_readings=1, retryable=lambda error: not isinstance(error, ValueError))
+
+        self.assertEqual(self.replayed, [{'n': 0}, {'n': 2}])
+        with open(os.path.join(self.directory, 'rejected.ndjson')) as f:
+            self.assertEqual(f.read(), '{"n": "bad"}\n')
+
+    def test_invalid_reading_does_not_hold_back_its_chunk(self):
+        spool = Spool(self.directory)
+        spool.append([{'n': 0}, {'n': 'bad'}])
+        spool.append([{'n': 2}])
+
+        replayed = spool.replay(self.replayed.extend, max_readings=10,
+                                validate=lambda reading: None if isinstance(reading['n'], int) else "not numeric")
+
+        self.assertEqual(replayed, 2)
+        self.assertEqual(self.replayed, [{'n': 0}, {'n': 2}])
+        self.assertEqual(spool.stats['dead_lettered'], 1)
+        with open(os.path.join(self.directory, 'rejected.ndjson')) as f:
+            self.assertEqual(f.read(), '{"n": "bad"}\n')
+
+    def test_concurrent_appends_share_fsyncs(self):
+        spool = Spool(self.directory)
+        threads = [threading.Thread(target=lambda: [spool.append([{'n': 0}]) for _ in range(50)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(spool.stats['appended'], 400)
+        self.assertLessEqual(spool.stats['fsyncs'], 400)
+        self.assertEqual(spool.replay(lambda readings: None), 400)
+
+
+class OutageRecoveryTest(LoggedInTestCase):
+    """Ingest through a database outage, then measure replay into an embedded database."""
+
+    READINGS = 3000
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.previous = (db_utils.connection_pool, storage.dialect, app.spool, app.spool_replayer)
+        storage.dialect = storage.SQLITE
+        db_utils.connection_pool = InstrumentedPool(storage.SQLiteBackend(':memory:'), 4)
+        app.spool = Spool(self.directory)
+        app.spool_replayer = SpoolReplayer(app.spool, self.commit, database_unavailable, retry_interval=0.05)
+        alert_tracker.reset()
+        latest_cache.clear()
+        self.down = True
+        self.replay_seconds = 0.0
+
+    def tearDown(self):
+        app.spool_replayer.stop()
+        db_utils.connection_pool, storage.dialect, app.spool, app.spool_replayer = self.previous
+        alert_tracker.reset()
+        latest_cache.clear()
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def commit(self, readings):
+        from app.routes import commit_readings
+        start = time.perf_counter()
+        commit_readings(readings)
+        self.replay_seconds += time.perf_counter() - start
+
+    def connect(self, original):
+        def get_connection():
+            if self.down:
+                raise PoolTimeout("No database connection available after 5s")
+            return original()
+        return get_connection
+
+    def reading(self, n):
+        return {'timestamp': f"2025-04-20T10:{n // 60 % 60:02d}:{n % 60:02d}.{n:06d}", 'temperature': 25.0,
+                'pressure': 1010.0, 'light_intensity': 800, 'humidity': 50.0, 'air_quality': 40, 'pH': 6.5,
+                'moisture': 30.0, 'greenhouse_zone': f"Zone {n % 3}"}
+
+    def test_readings_survive_outage_and_replay_in_order(self):
+        sent = [self.reading(n) for n in range(self.READINGS)]
+        with patch('app.utils.db_utils.get_db_connection', self.connect(db_utils.get_db_connection)):
+            statuses = [self.client.post('/receive_sensor_data', json=data).status_code for data in sent[:100]]
+            for i in range(100, self.READINGS, 100):
+                statuses.append(self.client.post('/receive_sensor_data/batch', json=sent[i:i + 100]).status_code)
+            self.assertEqual(set(statuses), {202})
+            self.assertEqual(app.spool.stats['appended'], self.READINGS)
+
+            self.down = False
+            outage_ended = time.perf_counter()
+            app.spool_replayer.notify()
+            while app.spool.pending() and time.perf_counter() - outage_ended < 30:
+                time.sleep(0.01)
+            recovery = time.perf_counter() - outage_ended
+
+            with db_utils.db_cursor(dictionary=False) as cursor:
+                cursor.execute("SELECT timestamp FROM sensor_readings ORDER BY id")
+                stored = [row[0] for row in cursor.fetchall()]
+
+        self.assertFalse(app.spool.pending())
+        self.assertEqual(stored, [datetime.fromisoformat(data['timestamp']) for data in sent])
+        throughput = self.READINGS / self.replay_seconds
+        # Generous bounds for slow CI; a laptop replays well over 10k readings/s
+        self.assertLess(recovery, 10)
+        self.assertGreater(throughput, 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+import threading
+import unittest
+from datetime import datetime
+
+from app.utils import storage
+from app.utils.alert_lifecycle import AlertTracker
+from app.utils.alerts_utils import count_alerts, list_alerts
+from app.utils.db_utils import write_readings
+from app.utils.rollups import get_daily_averages, get_series, rebuild_rollups
+from app.utils.threshold_cache import ThresholdCache, assign_zone, bump_version, fetch_version, save_range
+
+
+def reading(timestamp, zone='Zone A', **overrides):
+    data = {'timestamp': timestamp, 'temperature': 25.0, 'pressure': 1010.0, 'light_intensity': 800,
+            'humidity': 50.0, 'air_quality': 40, 'pH': 6.5, 'moisture': 30.0, 'greenhouse_zone': zone}
+    data.update(overrides)
+    return data
+
+
+class TranslateTest(unittest.TestCase):
+    def test_placeholders_and_escaped_percent(self):
+        self.assertEqual(storage.translate("DATE_FORMAT(t, '%%Y-%%m-%%d %%H:%%i:%%s') = %s AND id < %s"),
+                         "DATE_FORMAT(t, '%Y-%m-%d %H:%i:%s') = ? AND id < ?")
+
+
+class SQLiteBackendTest(unittest.TestCase):
+    """The app's MySQL query set, run unchanged against the embedded SQLite backend."""
+
+    def setUp(self):
+        self.previous_dialect = storage.dialect
+        storage.dialect = storage.SQLITE
+        self.backend = storage.SQLiteBackend(':memory:')
+        self.conn = self.backend.get_connection()
+        self.cursor = self.conn.cursor(dictionary=True)
+
+    def tearDown(self):
+        self.conn.close()
+        storage.dialect = self.previous_dialect
+
+    def ingest(self, readings, tracker):
+        write_readings(self.cursor, readings)
+        result = tracker.process(self.cursor, readings, ThresholdCache(ttl=0).get_compiled(self.cursor))
+        self.conn.commit()
+        return result
+
+    def test_ingest_rollups_and_history(self):
+        self.ingest([reading('2025-04-20T10:00:05', temperature=20.0),
+                     reading('2025-04-20T10:00:40Z', temperature=30.0),
+                     reading('2025-04-20T11:30:00', zone='Zone B', temperature=22.0)], AlertTracker())
+
+        hourly = get_series(self.cursor, 'hour', datetime(2025, 4, 20), datetime(2025, 4, 21), ['temperature'])
+        self.assertEqual([(row['bucket_start'], row['temperature']) for row in hourly],
+                         [(datetime(2025, 4, 20, 10), 25.0), (datetime(2025, 4, 20, 11), 22.0)])
+        daily = get_daily_averages(self.cursor, datetime(2025, 4, 20), datetime(2025, 4, 20, 23, 59))
+        self.assertAlmostEqual(daily[0]['avg_temp'], 24.0)
+
+        self.cursor.execute("SELECT temperature_min, temperature_max, reading_count FROM sensor_rollup_minute "
+                            "WHERE greenhouse_zone = %s", ('Zone A',))
+        self.assertEqual(self.cursor.fetchone(), {'temperature_min': 20.0, 'temperature_max': 30.0,
+                                                  'reading_count': 2})
+
+    def test_rebuild_matches_ingest_time_rollups(self):
+        self.ingest([reading('2025-04-20T10:00:05', temperature=20.0),
+                     reading('2025-04-20T23:59:59', temperature=26.0)], AlertTracker())
+        self.cursor.execute("SELECT * FROM sensor_rollup_day")
+        before = self.cursor.fetchall()
+
+        rebuild_rollups(self.cursor, datetime(2025, 4, 20), datetime(2025, 4, 20))
+        self.cursor.execute("SELECT * FROM sensor_rollup_day")
+
+        self.assertEqual(self.cursor.fetchall(), before)
+
+    def test_alert_lifecycle_and_keyset_pages(self):
+        tracker = AlertTracker(min_dwell=0)
+        _, opened = self.ingest([reading('2025-04-20T10:00:00', temperature=45.0, pH=9.0)], tracker)
+        self.assertEqual([t['event'] for t in opened], ['opened', 'opened'])
+        self.ingest([reading('2025-04-20T10:01:00', temperature=46.0)], tracker)
+
+        # pH went back in range on the second reading and resolved
+        page, next_cursor = list_alerts(self.cursor, limit=1, status='all')
+        self.assertIsNotNone(next_cursor)
+        self.assertIsInstance(page[0]['timestamp'], datetime)
+        rest, _ = list_alerts(self.cursor, after=(page[0]['timestamp'], page[0]['id']), limit=5, status='all')
+        self.assertEqual(len(rest), 1)
+        self.assertEqual(count_alerts(self.cursor), 1)
+        self.assertEqual(count_alerts(self.cursor, status='all'), 2)
+        self.cursor.execute("SELECT occurrences FROM alerts WHERE sensor_type = %s", ('temperature',))
+        self.assertEqual(self.cursor.fetchone()['occurrences'], 2)
+
+    def test_greenhouse_profiles_and_scoped_reads(self):
+        self.cursor.execute("INSERT INTO greenhouses (name) VALUES (%s)", ('Tomatoes',))
+        greenhouse_id = self.cursor.lastrowid
+        assign_zone(self.cursor, 'Zone B', greenhouse_id)
+        assign_zone(self.cursor, 'Zone C', greenhouse_id)
+        save_range(self.cursor, 'temperature', 10, 22, greenhouse_id=greenhouse_id)
+        save_range(self.cursor, 'temperature', 10, 24, greenhouse_id=greenhouse_id)
+        save_range(self.cursor, 'temperature', None, 30, zone='Zone C')
+        zones = ThresholdCache(ttl=0).zones(lambda: self.cursor, [greenhouse_id])
+
+        self.ingest([reading('2025-04-20T10:00:00', temperature=26.0),
+                     reading('2025-04-20T10:00:00', zone='Zone B', temperature=26.0),
+                     reading('2025-04-20T10:00:00', zone='Zone C', temperature=26.0)], AlertTracker())
+
+        self.assertEqual(zones, ['Zone B', 'Zone C'])
+        alerts, _ = list_alerts(self.cursor, zones=zones)
+        self.assertEqual([(a['greenhouse_zone'], a['threshold_value']) for a in alerts], [('Zone B', 24)])
+        self.assertEqual(count_alerts(self.cursor), 1)
+        self.assertEqual(count_alerts(self.cursor, zones=zones), 1)
+        self.assertEqual(count_alerts(self.cursor, zone='Zone A', zones=zones), 0)
+        self.assertEqual(list_alerts(self.cursor, zones=[])[0], [])
+        daily = get_daily_averages(self.cursor, datetime(2025, 4, 20), datetime(2025, 4, 20, 23, 59), ['Zone A'])
+        self.assertEqual(daily[0]['avg_temp'], 26.0)
+        self.assertEqual(get_series(self.cursor, 'hour', datetime(2025, 4, 20), datetime(2025, 4, 21),
+                                    ['temperature'], zones=[]), [])
+
+    def test_settings_version_upsert(self):
+        bump_version(self.cursor)
+        bump_version(self.cursor)
+        self.assertEqual(fetch_version(self.cursor), 2)
+
+    def test_connections_share_the_in_memory_database(self):
+        write_readings(self.cursor, [reading('2025-04-20T10:00:00')])
+        self.conn.commit()
+        other = self.backend.get_connection()
+        cursor = other.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sensor_readings")
+        self.assertEqual(cursor.fetchone(), (1,))
+        other.close()
+
+    def test_concurrent_writers_wait_instead_of_failing(self):
+        errors = []
+
+        def writer(zone):
+            conn = self.backend.get_connection()
+            try:
+                cursor = conn.cursor()
+                for i in range(20):
+                    write_readings(cursor, [reading(f'2025-04-20T10:{i:02d}:00', zone=zone)])
+                    conn.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                conn.close()
+
+        threads = [threading.Thread(target=writer, args=(f'Zone {n}',)) for n in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.cursor.execute("SELECT COUNT(*) AS n FROM sensor_readings")
+        self.assertEqual(self.cursor.fetchone()['n'], 120)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from math import inf
+from unittest.mock import patch, MagicMock
+from app.utils.threshold_cache import ThresholdCache
+
+
+class ThresholdCacheTest(unittest.TestCase):
+
+    def make_cursor(self, version=1, tables=None):
+        tables = dict(tables or {})
+        tables.setdefault('optimal_ranges', [{'parameter': 'temperature', 'min_value': 18, 'max_value': 40}])
+        cursor = MagicMock()
+        cursor.fetchone.return_value = {'version': version}
+        cursor.fetchall.side_effect = lambda: next(
+            (rows for table, rows in tables.items() if f"FROM {table}" in cursor.execute.call_args[0][0]), [])
+        return cursor
+
+    def range_queries(self, cursor):
+        return [c for c in cursor.execute.call_args_list if 'FROM optimal_ranges' in c[0][0]]
+
+    def test_loads_once_within_ttl(self):
+        cache = ThresholdCache(ttl=60)
+        cursor = self.make_cursor()
+
+        first = cache.get(cursor)
+        second = cache.get(cursor)
+
+        self.assertIs(first, second)
+        self.assertEqual(first['temperature']['max_value'], 40)
+        # version, optimal_ranges, then the zone map and the two profile tables
+        self.assertEqual(cursor.execute.call_count, 5)
+
+    def test_invalidate_forces_reload(self):
+        cache = ThresholdCache(ttl=60)
+        cursor = self.make_cursor()
+
+        cache.get(cursor)
+        cache.invalidate()
+        cache.get(cursor)
+
+        self.assertEqual(len(self.range_queries(cursor)), 2)
+
+    @patch('app.utils.threshold_cache.time.monotonic')
+    def test_expired_ttl_only_reloads_on_version_change(self, mock_time):
+        cache = ThresholdCache(ttl=30)
+        cursor = self.make_cursor(version=1)
+
+        mock_time.return_value = 0
+        cache.get(cursor)
+        mock_time.return_value = 31
+        cache.get(cursor)
+        self.assertEqual(len(self.range_queries(cursor)), 1)
+
+        cursor.fetchone.return_value = {'version': 2}
+        mock_time.return_value = 62
+        cache.get(cursor)
+        self.assertEqual(len(self.range_queries(cursor)), 2)
+
+    def test_zone_profile_overrides_greenhouse_and_global(self):
+        cursor = self.make_cursor(tables={
+            'optimal_ranges': [{'parameter': 'temperature', 'min_value': 18, 'max_value': 40},
+                               {'parameter': 'humidity', 'min_value': 30, 'max_value': 80}],
+            'greenhouse_zones': [{'greenhouse_zone': 'Zone A', 'greenhouse_id': 1},
+                                 {'greenhouse_zone': 'Zone B', 'greenhouse_id': 1},
+                                 {'greenhouse_zone': 'Zone C', 'greenhouse_id': 2}],
+            'greenhouse_ranges': [{'greenhouse_id': 1, 'parameter': 'temperature', 'min_value': 10, 'max_value': 25}],
+            'zone_ranges': [{'greenhouse_zone': 'Zone B', 'parameter': 'humidity', 'min_value': None,
+                             'max_value': 95}],
+        })
+        index = ThresholdCache(ttl=60).get_compiled(cursor)
+
+        self.assertEqual(index.for_zone('Zone A').bounds('temperature'), (10, 25))
+        self.assertEqual(index.for_zone('Zone A').bounds('humidity'), (30, 80))
+        self.assertEqual(index.for_zone('Zone B').bounds('temperature'), (10, 25))
+        self.assertEqual(index.for_zone('Zone B').bounds('humidity'), (-inf, 95))
+        self.assertIs(index.for_zone('Zone C'), index.default)
+        self.assertIs(index.for_zone('Unmapped'), index.default)
+        self.assertEqual(index.zones(1), ['Zone A', 'Zone B'])
+        self.assertEqual(index.zones(3), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.utils.db_utils import AnonymousUser, load_user, set_user_role
+from app.utils.user_cache import UserCache, user_cache
+from helpers import LoggedInTestCase, log_in
+
+
+class UserCacheTest(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = UserCache(max_size=2, ttl=60)
+        cache.put(AnonymousUser(1, 'a', 'Employee'))
+        cache.put(AnonymousUser(2, 'b', 'Employee'))
+        cache.get('1')
+        cache.put(AnonymousUser(3, 'c', 'Employee'))
+
+        self.assertIsNotNone(cache.get(1))
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(len(cache), 2)
+
+    @patch('app.utils.user_cache.time.monotonic')
+    def test_entries_expire_after_ttl(self, monotonic):
+        cache = UserCache(ttl=30)
+        monotonic.return_value = 100
+        cache.put(AnonymousUser(1, 'a', 'Employee'))
+        monotonic.return_value = 129
+        self.assertIsNotNone(cache.get(1))
+        monotonic.return_value = 130
+        self.assertIsNone(cache.get(1))
+        self.assertEqual(len(cache), 0)
+
+
+class LoadUserTest(LoggedInTestCase):
+    user = None
+
+    def mock_connection(self, mock_db, row):
+        mock_conn = MagicMock()
+        mock_conn.cursor.return_value.fetchone.return_value = row
+        mock_db.return_value = mock_conn
+        return mock_conn
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_second_load_is_served_from_cache(self, mock_db):
+        self.mock_connection(mock_db, {'id': 5, 'username': 'ann', 'role': 'Employee'})
+
+        first = load_user('5')
+        second = load_user('5')
+
+        self.assertIs(first, second)
+        mock_db.assert_called_once()
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_role_change_invalidates_cached_user(self, mock_db):
+        user_cache.put(AnonymousUser(5, 'ann', 'Employee'))
+        self.mock_connection(mock_db, {'id': 5, 'username': 'ann', 'role': 'Manager'})
+
+        set_user_role(5, 'Manager')
+
+        self.assertEqual(load_user('5').role, 'Manager')
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_authenticated_request_does_no_user_lookup(self, mock_db):
+        log_in(self.client, 7, 'mgr', 'Manager')
+
+        response = self.client.get('/api/db/stats')
+
+        self.assertEqual(response.status_code, 200)
+        mock_db.assert_not_called()
+
+    @patch('app.utils.db_utils.get_db_connection')
+    def test_role_comes_from_user_not_session(self, mock_db):
+        log_in(self.client, 8, 'emp', 'Employee')
+        with self.client.session_transaction() as sess:
+            sess['role'] = 'Manager'
+
+        self.assertEqual(self.client.get('/api/db/stats').status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import time
+import unittest
+
+from app.utils.write_behind import FlushRefused, WriteBehindBuffer
+
+
+class WriteBehindBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.buffer = None
+
+    def tearDown(self):
+        if self.buffer:
+            self.buffer.stop()
+
+    def make_buffer(self, flush=None, **kwargs):
+        self.buffer = WriteBehindBuffer(flush or self.batches.append, **kwargs)
+        return self.buffer
+
+    def test_group_commits_by_size_without_waiting_for_interval(self):
+        buffer = self.make_buffer(batch_size=3, flush_interval=10)
+        start = time.monotonic()
+        buffer.submit([1])
+        buffer.submit([2, 3])
+        buffer.submit([4, 5, 6])
+
+        self.assertTrue(buffer.wait_idle(1))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.batches, [[1, 2, 3], [4, 5, 6]])
+        self.assertEqual(buffer.stats['commits'], 2)
+        self.assertEqual(buffer.stats['flushed'], 6)
+
+    def test_flushes_partial_batch_after_interval(self):
+        buffer = self.make_buffer(batch_size=100, flush_interval=0.05)
+        start = time.monotonic()
+        buffer.submit(['a', 'b'])
+
+        self.assertTrue(buffer.wait_idle(1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        self.assertEqual(self.batches, [['a', 'b']])
+
+    def test_refuses_readings_beyond_capacity(self):
+        gate = threading.Event()
+        buffer = self.make_buffer(lambda batch: gate.wait(1), max_queue=3, batch_size=1, flush_interval=0)
+        buffer.submit([1])
+        time.sleep(0.05)
+
+        self.assertTrue(buffer.submit([2, 3]))
+        self.assertFalse(buffer.submit([4, 5]))
+        self.assertEqual(buffer.stats['rejected'], 2)
+        self.assertEqual(buffer.depth(), 3)
+        gate.set()
+
+    def test_stop_drains_queue_without_waiting_for_interval(self):
+        buffer = self.make_buffer(batch_size=2, flush_interval=10)
+        buffer.submit([1, 2, 3])
+        start = time.monotonic()
+        buffer.stop()
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.batches, [[1, 2], [3]])
+        self.assertEqual(buffer.depth(), 0)
+
+    def test_failed_flush_is_counted_and_flusher_keeps_going(self):
+        def flush(batch):
+            if batch == ['bad']:
+                raise RuntimeError("database down")
+            self.batches.append(batch)
+
+        buffer = self.make_buffer(flush, flush_interval=0)
+        buffer.submit(['bad'])
+        buffer.wait_idle(1)
+        buffer.submit(['good'])
+
+        self.assertTrue(buffer.wait_idle(1))
+        self.assertEqual(self.batches, [['good']])
+        self.assertEqual(buffer.stats['failed'], 1)
+
+    def test_bad_reading_is_isolated_from_its_batch(self):
+        def flush(batch):
+            if 'bad' in batch:
+                raise ValueError("Incorrect datetime value")
+            self.batches.append(batch)
+
+        buffer = self.make_buffer(flush, batch_size=8, flush_interval=10)
+        buffer.submit([1, 2, 3, 'bad', 5, 6, 7, 8])
+
+        self.assertTrue(buffer.wait_idle(1))
+        self.assertEqual(sorted(item for batch in self.batches for item in batch), [1, 2, 3, 5, 6, 7, 8])
+        self.assertEqual(buffer.stats['failed'], 1)
+        self.assertEqual(buffer.stats['flushed'], 7)
+
+    def test_refused_batch_is_not_split(self):
+        calls = []
+
+        def flush(batch):
+            calls.append(batch)
+            raise FlushRefused("database down, spool full")
+
+        buffer = self.make_buffer(flush, batch_size=4, flush_interval=10)
+        buffer.submit([1, 2, 3, 4])
+
+        self.assertTrue(buffer.wait_idle(1))
+        self.assertEqual(calls, [[1, 2, 3, 4]])
+        self.assertEqual(buffer.stats['failed'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()